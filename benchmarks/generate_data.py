@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Generates synthetic grocery catalogs and transaction files for benchmarking.
+
+The output is fully determined by the seed, so benchmark runs on different machines or
+commits are comparable. Transactions are written in date order with realistic shapes:
+a few products sell far more often than the rest, weekends and evenings are busier, and
+most sales are of one to three items.
+
+Run it from the repository root:
+    python3 -m benchmarks.generate_data --rows 1000000 --groceries 500 --out-dir /tmp/bench
+"""
+import argparse
+import bisect
+import csv
+import itertools
+import os
+import random
+from datetime import date, timedelta
+
+
+BASE_NAMES = [
+    'Apple', 'Potato', 'Lettuce', 'Milk', 'Cheese', 'Eggs', 'Chicken breast', 'Whole chicken',
+    'Ground beef', 'Bacon', 'Sausages', 'Rice', 'Pasta', 'Bread', 'Cereal', 'Toilet rolls', 'Yam',
+    'Orange', 'Banana', 'Tomato', 'Onion', 'Carrot', 'Butter', 'Yoghurt', 'Coffee', 'Tea', 'Sugar',
+    'Flour', 'Salt', 'Olive oil', 'Beans', 'Tuna', 'Salmon', 'Grapes', 'Pepper', 'Garlic', 'Juice',
+]
+VARIANTS = ['', 'Organic', 'Value', 'Premium', 'Family size', 'Mini', 'Fresh', 'Frozen']
+
+# Relative number of sales per weekday (Monday first) and per opening hour (8 AM to 9 PM).
+WEEKDAY_WEIGHTS = [0.9, 0.85, 0.9, 1.0, 1.25, 1.5, 1.1]
+HOUR_WEIGHTS = [0.4, 0.7, 0.9, 1.0, 1.2, 1.1, 0.9, 0.9, 1.1, 1.4, 1.5, 1.2, 0.7, 0.3]
+OPENING_HOUR = 8
+DEFAULT_START = date(2022, 1, 1)
+DEFAULT_END = date(2024, 12, 31)
+QUANTITY_WEIGHTS = [40, 25, 14, 8, 5, 3, 2, 1, 1, 1]
+
+
+def generate_catalog(count, rng):
+    """
+    Generates a grocery catalog.
+    Args:
+        count (int): The number of grocery items.
+        rng (random.Random): The seeded random generator.
+    Returns:
+        list of dict: Grocery items with 'id', 'name', 'price' and 'stock', IDs starting at 1.
+    """
+    names = (
+        f"{variant} {name}".strip() if round_number == 0 else f"{variant} {name} {round_number + 1}".strip()
+        for round_number in itertools.count()
+        for variant in VARIANTS
+        for name in BASE_NAMES
+    )
+    return [
+        {
+            'id': str(grocery_id),
+            'name': name,
+            'price': round(min(max(rng.lognormvariate(1.8, 0.7), 0.2), 150.0), 1),
+            'stock': rng.randint(10, 500),
+        }
+        for grocery_id, name in zip(range(1, count + 1), names)
+    ]
+
+def _format_time(seconds):
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{(hours % 12) or 12}:{minutes:02d}:{seconds:02d} {'PM' if hours >= 12 else 'AM'}"
+
+def generate_transactions(catalog, rows, start_date, end_date, rng):
+    """
+    Generates transaction rows in date and time order.
+    Product popularity follows a Zipf-like distribution; days are weighted by weekday and
+    times by opening hour.
+    Args:
+        catalog (list of dict): The grocery catalog, as returned by generate_catalog.
+        rows (int): The number of transactions.
+        start_date (date): The first day of the period.
+        end_date (date): The last day of the period.
+        rng (random.Random): The seeded random generator.
+    Yields:
+        list: [date, time, id, quantity, payment] rows, formatted as in transactions.csv.
+    """
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    day_weights = [WEEKDAY_WEIGHTS[day.weekday()] for day in days]
+    total_weight = sum(day_weights)
+
+    product_weights = list(itertools.accumulate(1 / (rank + 1) ** 1.1 for rank in range(len(catalog))))
+    products = catalog[:]
+    rng.shuffle(products)
+    hours = list(range(OPENING_HOUR, OPENING_HOUR + len(HOUR_WEIGHTS)))
+    quantities = list(range(1, len(QUANTITY_WEIGHTS) + 1))
+
+    # Share the rows out over the days in proportion to their weight, keeping the exact total
+    produced, cumulative = 0, 0.0
+    for day, weight in zip(days, day_weights):
+        cumulative += weight
+        day_rows = round(rows * cumulative / total_weight) - produced
+        produced += day_rows
+        if day_rows <= 0:
+            continue
+        day_text = day.strftime("%d/%m/%Y")
+        times = sorted(
+            hour * 3600 + rng.randrange(3600)
+            for hour in rng.choices(hours, weights=HOUR_WEIGHTS, k=day_rows)
+        )
+        for seconds in times:
+            grocery = products[bisect.bisect_left(product_weights, rng.random() * product_weights[-1])]
+            quantity = rng.choices(quantities, weights=QUANTITY_WEIGHTS)[0]
+            yield [day_text, _format_time(seconds), grocery['id'], quantity,
+                   round(quantity * grocery['price'], 2)]
+
+def write_dataset(out_dir, rows, groceries=19, seed=42, start_date=None, end_date=None):
+    """
+    Writes a catalog and a transaction file to a directory.
+    Args:
+        out_dir (str): The output directory, created if missing.
+        rows (int): The number of transactions.
+        groceries (int, optional): The number of grocery items. Defaults to 19, like the sample catalog.
+        seed (int, optional): The random seed. Defaults to 42.
+        start_date (date, optional): The first day of sales. Defaults to 1 January 2022.
+        end_date (date, optional): The last day of sales. Defaults to 31 December 2024.
+    Returns:
+        tuple: (grocery file path, transaction file path).
+    """
+    rng = random.Random(seed)
+    start_date = start_date or DEFAULT_START
+    end_date = end_date or DEFAULT_END
+    os.makedirs(out_dir, exist_ok=True)
+    grocery_file = os.path.join(out_dir, 'groceries.csv')
+    transaction_file = os.path.join(out_dir, 'transactions.csv')
+
+    catalog = generate_catalog(groceries, rng)
+    with open(grocery_file, mode='w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=['id', 'name', 'price', 'stock'])
+        writer.writeheader()
+        writer.writerows(catalog)
+
+    with open(transaction_file, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['date', 'time', 'id', 'quantity', 'payment'])
+        rows_iter = generate_transactions(catalog, rows, start_date, end_date, rng)
+        # Write in chunks so memory use stays flat for very large files
+        while True:
+            chunk = list(itertools.islice(rows_iter, 100000))
+            if not chunk:
+                break
+            writer.writerows(chunk)
+    return grocery_file, transaction_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic grocery catalog and transaction file.")
+    parser.add_argument('--rows', type=int, default=10000, help="number of transactions (default: 10000)")
+    parser.add_argument('--groceries', type=int, default=19, help="number of grocery items (default: 19)")
+    parser.add_argument('--seed', type=int, default=42, help="random seed (default: 42)")
+    parser.add_argument('--start', default='01/01/2022', help="first day of sales, DD/MM/YYYY (default: 01/01/2022)")
+    parser.add_argument('--end', default='31/12/2024', help="last day of sales, DD/MM/YYYY (default: 31/12/2024)")
+    parser.add_argument('--out-dir', default='bench_data', help="output directory (default: bench_data)")
+    args = parser.parse_args(argv)
+
+    def parse(value):
+        day, month, year = (int(part) for part in value.split('/'))
+        return date(year, month, day)
+
+    grocery_file, transaction_file = write_dataset(
+        args.out_dir, args.rows, args.groceries, args.seed,
+        parse(args.start), parse(args.end))
+    print(f"Wrote {args.groceries} grocery items to '{grocery_file}' and {args.rows} transactions to '{transaction_file}'.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Times loading, searches and reports on synthetic datasets of several sizes.
+
+For every size a dataset is generated once with benchmarks.generate_data (and kept in the
+data directory for later runs). Then each case is timed: loading, each search and each
+sales report. Reports are timed without plotting. For each case the best and median wall
+time are reported, along with throughput in transactions per second and peak traced
+Python memory. The report result cache is turned off, so every repetition is computed.
+
+Run it from the repository root:
+    python3 -m benchmarks.run_benchmarks --sizes 10000,100000,1000000 --json results.json
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from benchmarks.generate_data import write_dataset
+from utils.display_transactions import (hourly_sales_summary, monthly_sales_summary, product_sales_summary,
+                                        top_products_summary, total_sales_summary)
+from utils.grocery_operations import load_grocery_data
+from utils.report_cache import configure_report_cache
+from utils.search_transanctions import find_by_date, find_by_name, find_by_name_and_date
+from utils.snapshot import SNAPSHOT_SUFFIX
+from utils.transaction_operations import load_transaction_data
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def _dataset(data_dir, rows, groceries, seed):
+    out_dir = os.path.join(data_dir, f"rows{rows}_groceries{groceries}_seed{seed}")
+    grocery_file = os.path.join(out_dir, 'groceries.csv')
+    transaction_file = os.path.join(out_dir, 'transactions.csv')
+    if not (os.path.exists(grocery_file) and os.path.exists(transaction_file)):
+        print(f"Generating {rows} transactions in '{out_dir}'...", file=sys.stderr)
+        write_dataset(out_dir, rows, groceries, seed)
+    return grocery_file, transaction_file
+
+def _remove_snapshot(transaction_file):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(transaction_file + SNAPSHOT_SUFFIX)
+
+def _last_row(transaction_file):
+    with open(transaction_file, mode='rb') as file:
+        file.seek(max(0, os.path.getsize(transaction_file) - 4096))
+        return next(csv.reader([file.read().decode('utf-8').splitlines()[-1]]))
+
+def _cases(grocery_file, transaction_file):
+    """
+    Returns the benchmark cases as (name, setup, run) tuples. ``setup`` runs untimed before
+    each repetition; ``run`` is the timed call.
+    """
+    groceries = load_grocery_data(grocery_file)
+    store = load_transaction_data(transaction_file, snapshot=True)
+
+    # Query the latest day, the year to date and the best selling product, like a manager would
+    last_date = _last_row(transaction_file)[0]
+    _, month, year = last_date.split('/')
+    year_start = f"01/01/{year}"
+    month_start = f"{month}/{year}"
+    year_first_month = f"01/{year}"
+    popular_id = max(store.product_index.positions, key=lambda gid: len(store.product_index.positions[gid]))
+    popular_name = groceries[str(popular_id)]['name']
+
+    def nothing():
+        pass
+
+    return [
+        ('load csv (list)', nothing, lambda: load_transaction_data(transaction_file)),
+        ('load csv (columnar)', nothing, lambda: load_transaction_data(transaction_file, columnar=True)),
+        ('load snapshot (cold)', lambda: _remove_snapshot(transaction_file),
+         lambda: load_transaction_data(transaction_file, snapshot=True)),
+        ('load snapshot (warm)', nothing, lambda: load_transaction_data(transaction_file, snapshot=True)),
+        ('search by date', nothing, lambda: find_by_date(store, last_date)),
+        ('search by name', nothing, lambda: find_by_name(store, groceries, popular_name)),
+        ('search by name and date', nothing,
+         lambda: find_by_name_and_date(store, groceries, popular_name, year_start, last_date)),
+        ('monthly sales', nothing, lambda: monthly_sales_summary(store, year_first_month, month_start)),
+        ('product sales', nothing,
+         lambda: product_sales_summary(store, str(popular_id), year_first_month, month_start)),
+        ('total sales', nothing, lambda: total_sales_summary(store, groceries, year_start, last_date)),
+        ('hourly sales', nothing, lambda: hourly_sales_summary(store, year_start, last_date)),
+        ('top 20 products', nothing, lambda: top_products_summary(store, groceries, year_start, last_date)),
+    ]
+
+def _measure(setup, run, repeat):
+    times = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    # Memory is traced in a separate run, as tracing slows the code down
+    setup()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), statistics.median(times), peak
+
+def run_benchmarks(sizes, groceries=200, seed=42, repeat=3, data_dir='bench_data'):
+    """
+    Runs every benchmark case at every size.
+    Args:
+        sizes (list of int): The numbers of transactions to benchmark with.
+        groceries (int, optional): The number of grocery items in the catalogs. Defaults to 200.
+        seed (int, optional): The random seed of the datasets. Defaults to 42.
+        repeat (int, optional): The number of timed repetitions of each case. Defaults to 3.
+        data_dir (str, optional): Where datasets are generated and kept. Defaults to 'bench_data'.
+    Returns:
+        list of dict: One result per size and case, with 'rows', 'case', 'best_s', 'median_s',
+                      'rows_per_s' and 'peak_bytes'.
+    """
+    # Time the reports themselves rather than cache lookups
+    configure_report_cache(0)
+    results = []
+    for rows in sizes:
+        grocery_file, transaction_file = _dataset(data_dir, rows, groceries, seed)
+        # The functions under test report problems with print; keep the results table readable
+        with contextlib.redirect_stdout(sys.stderr):
+            cases = _cases(grocery_file, transaction_file)
+            for name, setup, run in cases:
+                best, median, peak = _measure(setup, run, repeat)
+                results.append({
+                    'rows': rows,
+                    'case': name,
+                    'best_s': best,
+                    'median_s': median,
+                    'rows_per_s': rows / best if best > 0 else None,
+                    'peak_bytes': peak,
+                })
+                print(f"  {rows:>10}  {name:<24} {best:.4f}s", file=sys.stderr)
+    return results
+
+def _format_table(results):
+    lines = [f"{'Rows':>10}  {'Case':<24}{'Best (s)':>10}{'Median (s)':>12}{'Rows/s':>14}{'Peak MiB':>10}"]
+    lines.append('-' * len(lines[0]))
+    for r in results:
+        rate = f"{r['rows_per_s']:,.0f}" if r['rows_per_s'] else '-'
+        lines.append(f"{r['rows']:>10}  {r['case']:<24}{r['best_s']:>10.4f}{r['median_s']:>12.4f}"
+                     f"{rate:>14}{r['peak_bytes'] / 2 ** 20:>10.1f}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loading, searches and reports on synthetic data.")
+    parser.add_argument('--sizes', default='10000,100000,1000000',
+                        help="comma-separated transaction counts (default: 10000,100000,1000000)")
+    parser.add_argument('--groceries', type=int, default=200, help="number of grocery items (default: 200)")
+    parser.add_argument('--seed', type=int, default=42, help="random seed (default: 42)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed repetitions per case (default: 3)")
+    parser.add_argument('--data-dir', default='bench_data', help="dataset directory (default: bench_data)")
+    parser.add_argument('--json', metavar='FILE', help="also write the results to FILE as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(',')]
+    except ValueError:
+        parser.error("--sizes must be a comma-separated list of integers")
+
+    results = run_benchmarks(sizes, args.groceries, args.seed, args.repeat, args.data_dir)
+    print(_format_table(results))
+    max_rss_mib = None
+    if resource is not None:
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        max_rss_mib = max_rss / 2 ** 20 if sys.platform == 'darwin' else max_rss / 2 ** 10
+        print(f"\nPeak resident memory of the run: {max_rss_mib:.1f} MiB")
+
+    if args.json:
+        with open(args.json, mode='w') as file:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'groceries': args.groceries,
+                'seed': args.seed,
+                'repeat': args.repeat,
+                'max_rss_mib': max_rss_mib,
+                'results': results,
+            }, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,10 +2,16 @@
 
 import sys
 import json
-from utils.display_transactions import display_monthly_sales, display_product_sales, display_total_sales
-from utils.grocery_operations import load_grocery_data, edit_grocery_item, add_new_grocery_item
+from utils.date_normalization import month_start, parse_date, parse_month
+from utils.display_transactions import (display_hourly_sales, display_monthly_sales, display_product_sales,
+                                        display_top_products, display_total_sales)
+from utils.grocery_operations import load_grocery_data, edit_grocery_item, add_new_grocery_item, compact_stock_journal
+from utils.ingest_validation import check_grocery_references
+from utils.profiling import configure_profiling_from_argv, menu_action
 from utils.search_transanctions import search_by_date, search_by_name, search_by_name_and_date
-from utils.transaction_operations import load_transaction_data, record_sales_transaction
+from utils.transaction_operations import load_transaction_data, record_sales_transaction, record_basket_transaction
+from utils.transaction_partitions import is_partitioned
+from utils.transaction_store import TransactionStore
 from utils.users_load import load_user_data
 
 
@@ -57,11 +63,60 @@ def authenticate_user(users):
         print(f"Unexpected error: {e}")
         return False, None, None
 
+def load_range_transactions(transaction_file, transaction_data, start, end, months=False):
+    """
+    Returns the transactions to search or report on for a date range.
+    Loaded transaction data is used as it is. A directory of monthly partitions is not
+    loaded up front, so only the partitions of the months overlapping the range are loaded.
+    Args:
+        transaction_file (str): The path to the transaction CSV file or partition directory.
+        transaction_data (TransactionStore): The loaded transactions, or None if none are loaded yet.
+        start (str): The first date (dd/mm/yyyy) or, with ``months``, month (mm/yyyy) of the range.
+        end (str): The last date or month of the range.
+        months (bool, optional): If True, ``start`` and ``end`` are months.
+    Returns:
+        TransactionStore: The transactions, at least those of the range. If the range is
+            invalid no partition is loaded, and the search or report reports the invalid input.
+    """
+    if transaction_data is not None:
+        return transaction_data
+    try:
+        if months:
+            start_ordinal = month_start(parse_month(start))
+            end_ordinal = month_start(parse_month(end) + 1) - 1
+        else:
+            start_ordinal, end_ordinal = parse_date(start), parse_date(end)
+    except ValueError:
+        empty = TransactionStore()
+        empty.build_indexes()
+        return empty
+    return load_transaction_data(transaction_file, snapshot=True, start_ordinal=start_ordinal, end_ordinal=end_ordinal)
+
+def prompt_transaction_limit():
+    """
+    Asks how many transactions a search should show.
+    Returns:
+        int or None: The number entered, or None to show every match if nothing was entered.
+    Raises:
+        ValueError: If the input is not a positive integer.
+    """
+    limit = input("Number of transactions to show [all]: ").strip()
+    if not limit:
+        return None
+    if not limit.isdigit() or int(limit) == 0:
+        raise ValueError(f"the number of transactions must be a positive integer, not '{limit}'")
+    return int(limit)
+
 def main(grocery_file, transaction_file, user_file):
+    grocery_data = None
     try:
         try:
-            grocery_data = load_grocery_data(grocery_file)
-            transaction_data = load_transaction_data(transaction_file)
+            grocery_data = load_grocery_data(grocery_file, snapshot=True)
+            # Monthly partitions are loaded when a search or report needs them
+            transaction_data = None
+            if not is_partitioned(transaction_file):
+                transaction_data = load_transaction_data(transaction_file, snapshot=True)
+                check_grocery_references(transaction_data, grocery_data)
             user_data = load_user_data(user_file)
         except FileNotFoundError as e:
             print(f"Error: {e}. Please check that the file paths are correct.")
@@ -89,49 +144,78 @@ def main(grocery_file, transaction_file, user_file):
                 print("7. Display monthly sales")
                 print("8. Display grocery sales")
                 print("9. Display total sales")
-                print("10. Exit\n")
+                print("10. Enter basket checkout")
+                print("11. Display sales by weekday and hour")
+                print("12. Display best and worst selling items")
+                print("13. Exit\n")
                 choice = input("Select an option: ")
 
-                try:
-                    if choice == '1':
-                        record_sales_transaction(grocery_data, transaction_file, grocery_file)
-                    elif choice == '2':
-                        add_new_grocery_item(grocery_file, grocery_data)
-                    elif choice == '3':
-                        edit_grocery_item(grocery_file, grocery_data)
-                    elif choice == '4':
-                        search_date = input("\nEnter date (dd/mm/yyyy): ")
-                        search_by_date(transaction_data, search_date)
-                    elif choice == "5":
-                        search_name = input("\nEnter grocery name: ")
-                        search_by_name(transaction_data, grocery_data, search_name)
-                    elif choice == "6":
-                        search_name = input("\nEnter product name: ")
-                        start_date = input("Enter start date (dd/mm/yyyy): ")
-                        end_date = input("Enter end date (dd/mm/yyyy): ")
-                        search_by_name_and_date(transaction_data, grocery_data, search_name, start_date, end_date)
-                    elif choice == "7":
-                        start_month = input("\nEnter start month (mm/yyyy): ")
-                        end_month = input("Enter end month (mm/yyyy): ")
-                        display_monthly_sales(transaction_data, start_month, end_month)
-                    elif choice == "8":
-                        grocery_id = input("\nEnter grocery ID between 1 - 19: ")
-                        start_month = input("Enter start month (mm/yyyy): ")
-                        end_month = input("Enter end month (mm/yyyy): ")
-                        display_product_sales(transaction_data, grocery_data, grocery_id, start_month, end_month)
-                    elif choice == "9":
-                        start_date = input("\nEnter start date (dd/mm/yyyy): ")
-                        end_date = input("Enter end date (dd/mm/yyyy): ")
-                        display_total_sales(transaction_data, grocery_data, start_date, end_date)
-                    elif choice == '10':
-                        print("\nExiting program")
-                        break
-                    else:
-                        print("\nInvalid selection. Please try again.")
-                except ValueError as e:
-                    print(f"Invalid input: {e}")
-                except Exception as e:
-                    print(f"An error occurred: {e}")
+                with menu_action(choice, user_type):
+                    try:
+                        if choice == '1':
+                            record_sales_transaction(grocery_data, transaction_file, grocery_file, transaction_data)
+                        elif choice == '2':
+                            add_new_grocery_item(grocery_file, grocery_data)
+                        elif choice == '3':
+                            edit_grocery_item(grocery_file, grocery_data)
+                        elif choice == '4':
+                            search_date = input("\nEnter date (dd/mm/yyyy): ")
+                            limit = prompt_transaction_limit()
+                            search_by_date(load_range_transactions(transaction_file, transaction_data, search_date, search_date),
+                                           search_date, limit)
+                        elif choice == "5":
+                            search_name = input("\nEnter grocery name: ")
+                            limit = prompt_transaction_limit()
+                            if transaction_data is None:
+                                transaction_data = load_transaction_data(transaction_file, snapshot=True)
+                            search_by_name(transaction_data, grocery_data, search_name, limit)
+                        elif choice == "6":
+                            search_name = input("\nEnter product name: ")
+                            start_date = input("Enter start date (dd/mm/yyyy): ")
+                            end_date = input("Enter end date (dd/mm/yyyy): ")
+                            limit = prompt_transaction_limit()
+                            search_by_name_and_date(load_range_transactions(transaction_file, transaction_data, start_date, end_date),
+                                                    grocery_data, search_name, start_date, end_date, limit)
+                        elif choice == "7":
+                            start_month = input("\nEnter start month (mm/yyyy): ")
+                            end_month = input("Enter end month (mm/yyyy): ")
+                            display_monthly_sales(load_range_transactions(transaction_file, transaction_data, start_month, end_month, months=True),
+                                                  start_month, end_month)
+                        elif choice == "8":
+                            grocery_id = input("\nEnter grocery ID between 1 - 19: ")
+                            start_month = input("Enter start month (mm/yyyy): ")
+                            end_month = input("Enter end month (mm/yyyy): ")
+                            display_product_sales(load_range_transactions(transaction_file, transaction_data, start_month, end_month, months=True),
+                                                  grocery_data, grocery_id, start_month, end_month)
+                        elif choice == "9":
+                            start_date = input("\nEnter start date (dd/mm/yyyy): ")
+                            end_date = input("Enter end date (dd/mm/yyyy): ")
+                            display_total_sales(load_range_transactions(transaction_file, transaction_data, start_date, end_date),
+                                                grocery_data, start_date, end_date)
+                        elif choice == '10':
+                            record_basket_transaction(grocery_data, transaction_file, grocery_file, transaction_data)
+                        elif choice == '11':
+                            start_date = input("\nEnter start date (dd/mm/yyyy): ")
+                            end_date = input("Enter end date (dd/mm/yyyy): ")
+                            display_hourly_sales(load_range_transactions(transaction_file, transaction_data, start_date, end_date),
+                                                 start_date, end_date)
+                        elif choice == '12':
+                            start_date = input("\nEnter start date (dd/mm/yyyy): ")
+                            end_date = input("Enter end date (dd/mm/yyyy): ")
+                            metric = input("Rank by value, quantity or count [value]: ").strip().lower() or 'value'
+                            limit = input("Number of items to show [20]: ").strip() or 20
+                            bottom = input("Show the worst selling items instead? (y/n) [n]: ").strip().lower() == 'y'
+                            display_top_products(load_range_transactions(transaction_file, transaction_data, start_date, end_date),
+                                                 grocery_data, start_date, end_date, metric, limit, bottom)
+                        elif choice == '13':
+                            print("\nExiting program")
+                            break
+                        else:
+                            print("\nInvalid selection. Please try again.")
+                    except ValueError as e:
+                        print(f"Invalid input: {e}")
+                    except Exception as e:
+                        print(f"An error occurred: {e}")
 
             elif user_type == 'cashier':
                 print("Menu:")
@@ -139,32 +223,43 @@ def main(grocery_file, transaction_file, user_file):
                 print("2. Search transactions by date")
                 print("3. Search transactions by product name")
                 print("4. Search transactions by product name and date range")
-                print("5. Exit\n")
+                print("5. Enter basket checkout")
+                print("6. Exit\n")
                 choice = input("Select an option: ")
 
-                try:
-                    if choice == '1':
-                        record_sales_transaction(grocery_data, transaction_file, grocery_file)
-                    elif choice == '2':
-                        search_date = input("\nEnter date (dd/mm/yyyy): ")
-                        search_by_date(transaction_data, search_date)
-                    elif choice == "3":
-                        search_name = input("\nEnter grocery name: ")
-                        search_by_name(transaction_data, grocery_data, search_name)
-                    elif choice == "4":
-                        search_name = input("\nEnter product name: ")
-                        start_date = input("Enter start date (dd/mm/yyyy): ")
-                        end_date = input("Enter end date (dd/mm/yyyy): ")
-                        search_by_name_and_date(transaction_data, grocery_data, search_name, start_date, end_date)
-                    elif choice == '5':
-                        print("\nExiting program")
-                        break
-                    else:
-                        print("\nInvalid selection. Please try again.")
-                except ValueError as e:
-                    print(f"Invalid input: {e}")
-                except Exception as e:
-                    print(f"An error occurred: {e}")
+                with menu_action(choice, user_type):
+                    try:
+                        if choice == '1':
+                            record_sales_transaction(grocery_data, transaction_file, grocery_file, transaction_data)
+                        elif choice == '2':
+                            search_date = input("\nEnter date (dd/mm/yyyy): ")
+                            limit = prompt_transaction_limit()
+                            search_by_date(load_range_transactions(transaction_file, transaction_data, search_date, search_date),
+                                           search_date, limit)
+                        elif choice == "3":
+                            search_name = input("\nEnter grocery name: ")
+                            limit = prompt_transaction_limit()
+                            if transaction_data is None:
+                                transaction_data = load_transaction_data(transaction_file, snapshot=True)
+                            search_by_name(transaction_data, grocery_data, search_name, limit)
+                        elif choice == "4":
+                            search_name = input("\nEnter product name: ")
+                            start_date = input("Enter start date (dd/mm/yyyy): ")
+                            end_date = input("Enter end date (dd/mm/yyyy): ")
+                            limit = prompt_transaction_limit()
+                            search_by_name_and_date(load_range_transactions(transaction_file, transaction_data, start_date, end_date),
+                                                    grocery_data, search_name, start_date, end_date, limit)
+                        elif choice == '5':
+                            record_basket_transaction(grocery_data, transaction_file, grocery_file, transaction_data)
+                        elif choice == '6':
+                            print("\nExiting program")
+                            break
+                        else:
+                            print("\nInvalid selection. Please try again.")
+                    except ValueError as e:
+                        print(f"Invalid input: {e}")
+                    except Exception as e:
+                        print(f"An error occurred: {e}")
 
             else:
                 print("\nInvalid user type.")
@@ -173,10 +268,59 @@ def main(grocery_file, transaction_file, user_file):
         print("\nProgram interrupted. Exiting.")
     except Exception as e:
         print(f"Unexpected error: {e}")
+    finally:
+        # Fold the stock changes journalled during the session into the grocery file
+        if grocery_data is not None:
+            compact_stock_journal(grocery_file, grocery_data)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("\nUsage: python grocery_store.py <transaction_file> <grocery_file> <user_file>")
+    # --profile and --profile-action may be given in any mode
+    argv = [sys.argv[0]] + configure_profiling_from_argv(sys.argv[1:])
+
+    if len(argv) > 1 and argv[1] == 'report':
+        from utils.report_cli import run_report_cli
+        sys.exit(run_report_cli(argv[2:]))
+
+    if len(argv) > 1 and argv[1] in ('serve', 'connect'):
+        from utils.store_server import run_client_cli, run_server_cli
+        sys.exit(run_server_cli(argv[2:]) if argv[1] == 'serve' else run_client_cli(argv[2:]))
+
+    if len(argv) == 4 and argv[1] == 'partition':
+        from utils.transaction_partitions import migrate_to_partitions
+        migrated = migrate_to_partitions(argv[2], argv[3])
+        if migrated is None:
+            sys.exit(1)
+        print(f"Moved {migrated} transactions into monthly partitions in '{argv[3]}'.")
+        sys.exit(0)
+
+    if len(argv) == 6 and argv[1] == 'to-sqlite':
+        from utils.storage import copy_to_database
+        copied = copy_to_database(argv[2], argv[3], argv[4], argv[5])
+        if copied is None:
+            sys.exit(1)
+        print(f"Copied the groceries, users and {copied} transactions into '{argv[5]}'.")
+        sys.exit(0)
+
+    if len(argv) in (3, 4) and argv[1] == 'compact' and argv[3:] in ([], ['--dedupe']):
+        from utils.transaction_compaction import compact_transaction_file
+        dedupe = argv[3:] == ['--dedupe']
+        compacted = compact_transaction_file(argv[2], dedupe)
+        if compacted is None:
+            sys.exit(1)
+        if dedupe:
+            print(f"Compacted '{argv[2]}': kept {compacted[0]} transactions, removed {compacted[1]} duplicates.")
+        else:
+            print(f"Compacted '{argv[2]}': kept {compacted[0]} transactions.")
+        sys.exit(0)
+
+    if len(argv) != 4:
+        print("\nUsage: python grocery_store.py <transaction_file> <grocery_file> <user_file> [--profile[=FILE]] [--profile-action=OPTION]")
+        print("       python grocery_store.py report <grocery_file> <transaction_file> QUERY... [--format json|csv|table]")
+        print("       python grocery_store.py partition <transaction_file> <transaction_directory>")
+        print("       python grocery_store.py compact <transaction_file> [--dedupe]")
+        print("       python grocery_store.py to-sqlite <grocery_file> <transaction_file> <user_file> <database>")
+        print("       python grocery_store.py serve <grocery_file> <transaction_file> <user_file> [--socket PATH | --port PORT]")
+        print("       python grocery_store.py connect [--socket PATH | --port PORT]")
         sys.exit(1)
 
-    main(sys.argv[1], sys.argv[2], sys.argv[3])
\ No newline at end of file
+    main(argv[1], argv[2], argv[3])
\ No newline at end of file
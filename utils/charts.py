@@ -0,0 +1,188 @@
+import atexit
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from utils.profiling import profiled
+from utils.report_cache import REPORT_CACHE_SIZE, LRUCache
+
+
+# Chart settings, overridable with configure_charts or the environment variables below.
+_settings = {
+    'output_dir': os.environ.get('GROCERY_STORE_CHART_DIR', '.'),
+    'show': None,
+}
+_executor = None
+# Chart path -> (chart type, data, background render future) of the charts rendered in this session
+_rendered = LRUCache(REPORT_CACHE_SIZE)
+# Suffix of the file saved next to a chart with the hash of the data it was drawn from.
+DATA_HASH_SUFFIX = '.datahash'
+
+
+def configure_charts(output_dir=None, show=None):
+    """
+    Configures where and how charts are rendered.
+    Args:
+        output_dir (str, optional): The directory chart images are saved to. Defaults to the
+            GROCERY_STORE_CHART_DIR environment variable, or the current working directory.
+        show (bool, optional): If True, charts are drawn in this process and also shown in a
+            window, which blocks the menu until it is closed. If False, charts are rendered
+            off-screen with the Agg backend in a background process and only saved to disk.
+            Defaults to the GROCERY_STORE_SHOW_CHARTS environment variable, or to False.
+    """
+    if output_dir is not None:
+        _settings['output_dir'] = output_dir
+    if show is not None:
+        _settings['show'] = show
+
+def is_headless():
+    """
+    Returns True if charts are rendered without showing a window, the default on every platform.
+    """
+    if _settings['show'] is not None:
+        return not _settings['show']
+    return os.environ.get('GROCERY_STORE_SHOW_CHARTS', '').strip().lower() not in ('1', 'true', 'yes')
+
+def chart_path(file_name):
+    """
+    Returns the path a chart is saved to, adding the '.png' extension if there is none.
+    """
+    if not os.path.splitext(file_name)[1]:
+        file_name += '.png'
+    return os.path.join(_settings['output_dir'], file_name)
+
+def _data_hash(chart_type, args):
+    return hashlib.blake2b(repr((chart_type, args)).encode('utf-8'), digest_size=16).hexdigest()
+
+def _read_data_hash(path):
+    try:
+        with open(path + DATA_HASH_SUFFIX, mode='r') as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+def _pyplot(headless):
+    # matplotlib is only imported once a chart is drawn, so sessions without charts never pay for it
+    import matplotlib
+    if headless:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+def _draw_bar_chart(plt, grocery_names, sales_values):
+    plt.figure(figsize=(10, 6))
+    plt.barh(grocery_names, sales_values, color='skyblue')
+    plt.xlabel("Total Sales Value")
+    plt.title("Total Sales by Product")
+    plt.gca().invert_yaxis()  # To display the highest sales at the top
+
+def _draw_line_chart(plt, months, sales_values, sales_counts, sales_quantity, title):
+    fig, ax = plt.subplots()
+    ax.plot(months, sales_values, label="Monthly Sales Value", color='b', marker='o')
+    ax.plot(months, sales_counts, label='Number of Sales', color='g', marker='x')
+    ax.plot(months, sales_quantity, label="Number of Items Sold", color="r", marker="*")
+    ax.set_title(title)
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Sales Value / Count")
+    ax.legend()
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+
+def _draw_heatmap(plt, row_labels, column_labels, grids, title):
+    fig, axes = plt.subplots(len(grids), 1, figsize=(12, 3.5 * len(grids)), squeeze=False)
+    axes = [row[0] for row in axes]
+    for ax, (label, grid) in zip(axes, grids):
+        image = ax.imshow(grid, aspect='auto', cmap='YlOrRd')
+        ax.set_title(label)
+        ax.set_yticks(range(len(row_labels)))
+        ax.set_yticklabels(row_labels)
+        ax.set_xticks(range(len(column_labels)))
+        ax.set_xticklabels(column_labels)
+        fig.colorbar(image, ax=ax)
+    axes[-1].set_xlabel("Hour of day")
+    fig.suptitle(title)
+    plt.tight_layout()
+
+CHART_TYPES = {
+    'bar': _draw_bar_chart,
+    'line': _draw_line_chart,
+    'heatmap': _draw_heatmap,
+}
+
+
+def _render(chart_type, args, path, headless):
+    """
+    Draws a chart and saves it, with the hash of its data next to it once the image is
+    complete. Runs in the background worker process in headless mode.
+    """
+    plt = _pyplot(headless)
+    CHART_TYPES[chart_type](plt, *args)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # An image that is being replaced must not be taken for one drawn from its old data
+    if os.path.exists(path + DATA_HASH_SUFFIX):
+        os.remove(path + DATA_HASH_SUFFIX)
+    plt.savefig(path)
+    with open(path + DATA_HASH_SUFFIX, mode='w') as file:
+        file.write(_data_hash(chart_type, args))
+    if headless:
+        plt.close('all')
+    else:
+        plt.show()
+    return path
+
+def _report_failure(future):
+    error = future.exception()
+    if error is not None:
+        print(f"\nError: An error occurred while rendering a chart in the background: {error}")
+
+def _is_unchanged(chart_type, args, path):
+    """
+    Returns True if the chart saved at a path, or still being rendered to it in this
+    session, was drawn from the same data. Charts saved by earlier sessions are recognised
+    by the data hash saved next to them.
+    """
+    previous = _rendered.get(path)
+    if previous is not None and not previous[2].done():
+        return previous[:2] == (chart_type, args)
+    return os.path.exists(path) and _read_data_hash(path) == _data_hash(chart_type, args)
+
+def _shutdown_executor():
+    if _executor is not None:
+        # Let charts that are still rendering finish writing their files
+        _executor.shutdown(wait=True)
+
+@profiled
+def render_chart(chart_type, args, file_name):
+    """
+    Renders a chart to a PNG file.
+    By default the chart is drawn by a background worker process and this function
+    returns immediately, so the menu stays responsive while the file is written; if the
+    same chart was already saved to the same file from the same data, in this or an earlier
+    session, the saved file is reused instead. Only when showing charts was asked for with
+    configure_charts or GROCERY_STORE_SHOW_CHARTS is the chart drawn in this process and
+    shown in a window.
+    Args:
+        chart_type (str): A key of CHART_TYPES.
+        args (tuple): The plain data the chart is drawn from.
+        file_name (str): The name of the image file, saved in the configured output directory.
+    Returns:
+        str: The path the chart is (or will be) saved to.
+    """
+    global _executor
+    path = chart_path(file_name)
+    if not is_headless():
+        return _render(chart_type, args, path, False)
+
+    if _is_unchanged(chart_type, args, path):
+        print(f"\nThe chart is unchanged; reusing '{path}'.")
+        return path
+
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=1)
+        atexit.register(_shutdown_executor)
+    future = _executor.submit(_render, chart_type, args, path, True)
+    _rendered.put(path, (chart_type, args, future))
+    future.add_done_callback(_report_failure)
+    print(f"\nRendering chart in the background to '{path}'.")
+    return path
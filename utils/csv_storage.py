@@ -0,0 +1,369 @@
+import csv
+import io
+import os
+import uuid
+from utils.date_normalization import parse_date, parse_time
+from utils.file_lock import file_lock
+from utils.grocery_catalog import GroceryCatalog
+from utils.ingest_validation import InvalidRecord, Quarantine, validate_grocery
+from utils.name_index import NameIndex
+from utils.report_cache import bump_data_version
+from utils.snapshot import (load_transaction_snapshot, note_transaction_append, read_grocery_snapshot,
+                            write_grocery_snapshot)
+from utils.stock_journal import (COMPACT_THRESHOLD_BYTES, COMPACTING_SUFFIX, append_stock_deltas, apply_stock_deltas,
+                                 commit_stock_deltas, journal_path, journal_size, read_stock_deltas,
+                                 read_stock_deltas_since, truncate_stock_journal)
+from utils.storage_backend import StorageBackend
+from utils.transaction_compaction import iter_sorted_range
+from utils.transaction_partitions import group_by_partition, is_partitioned, list_partitions, partition_path
+from utils.transaction_store import (TRANSACTION_FIELDS, TransactionStore, build_transaction_store,
+                                     load_transaction_store, parse_cents, typed_transaction)
+
+
+GROCERY_FIELDS = ['id', 'name', 'price', 'stock']
+
+
+def _catalog_state(grocery_file):
+    try:
+        st = os.stat(grocery_file)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class CSVBackend(StorageBackend):
+    """
+    Keeps the groceries, transactions and users in CSV files, the default.
+    Stock changes of sales are appended to a stock journal next to the grocery file and
+    compacted into it once the journal grows large. Transactions can also be kept in a
+    directory of monthly partition files, one CSV file per month.
+    """
+
+    def load_groceries(self, path, snapshot=False):
+        with file_lock(path):
+            grocery_data = read_grocery_snapshot(path) if snapshot else None
+            if grocery_data is None:
+                grocery_data, complete = self._read_groceries(path)
+                if snapshot and complete:
+                    write_grocery_snapshot(path, grocery_data)
+
+            # Stock changes of recorded sales live in the journal until they are compacted into the CSV file
+            recovered = self._recover_interrupted_compaction(path, grocery_data)
+            deltas, offset = read_stock_deltas_since(journal_path(path), 0)
+            apply_stock_deltas(grocery_data, deltas)
+            grocery_data = GroceryCatalog(grocery_data, _catalog_state(path), offset)
+            if recovered:
+                self.save_groceries(path, grocery_data)
+        return grocery_data
+
+    def refresh_groceries(self, path, grocery_data):
+        if not isinstance(grocery_data, GroceryCatalog):
+            return False
+        journal_file = journal_path(path)
+        state = _catalog_state(path)
+        if state == grocery_data.catalog_state and journal_size(path) >= grocery_data.journal_offset:
+            deltas, grocery_data.journal_offset = read_stock_deltas_since(journal_file, grocery_data.journal_offset)
+            apply_stock_deltas(grocery_data, deltas)
+            return False
+
+        fresh, complete = self._read_groceries(path)
+        if not complete:
+            print("Warning: Keeping the loaded grocery data, as the grocery file could not be re-read.")
+            return False
+        deltas, offset = read_stock_deltas_since(journal_file, 0)
+        apply_stock_deltas(fresh, deltas)
+        grocery_data.clear()
+        grocery_data.update(fresh)
+        grocery_data.catalog_state = state
+        grocery_data.journal_offset = offset
+        grocery_data.name_index = NameIndex(grocery_data)
+        return True
+
+    def _read_groceries(self, path):
+        """
+        Parses a grocery CSV file.
+        Returns:
+            tuple: (grocery data, True if the file was read to the end).
+        """
+        grocery_data = {}
+        try:
+            with open(path, mode='r') as file:
+                reader = csv.DictReader(file)
+                if reader.fieldnames is None:
+                    print("Error: No field names found in CSV file.")
+                    return {}, False
+                reader.fieldnames = [field.strip() for field in reader.fieldnames]
+                quarantine = Quarantine(path, GROCERY_FIELDS)
+                for line_number, row in enumerate(reader, start=2):
+                    try:
+                        grocery_id, grocery_info = validate_grocery(row)
+                        if grocery_id in grocery_data:
+                            raise InvalidRecord('id', f"grocery ID {grocery_id} is already used")
+                    except InvalidRecord as e:
+                        quarantine.reject(row, e, line_number)
+                        continue
+                    grocery_data[grocery_id] = grocery_info
+                quarantine.accepted = len(grocery_data)
+                quarantine.close()
+        except FileNotFoundError:
+            print(f"Error: File '{path}' not found.")
+            return grocery_data, False
+        except IOError as e:
+            print(f"Error reading file '{path}': {e}")
+            return grocery_data, False
+        return grocery_data, True
+
+    def _recover_interrupted_compaction(self, path, grocery_data):
+        """
+        Finishes a journal compaction that was interrupted by a crash.
+        save_groceries parks the journal under a '.compacting' name before moving the new
+        catalog into place. If the temporary catalog still exists, the move never happened and
+        the parked changes are applied to the loaded data; otherwise the catalog already has them.
+        Returns:
+            bool: True if changes were recovered and the catalog must be saved again.
+        """
+        pending_file = journal_path(path) + COMPACTING_SUFFIX
+        if not os.path.exists(pending_file):
+            return False
+        temp_file = path + '.tmp'
+        if os.path.exists(temp_file):
+            apply_stock_deltas(grocery_data, read_stock_deltas(pending_file))
+            os.remove(temp_file)
+            return True
+        os.remove(pending_file)
+        return False
+
+    def save_groceries(self, path, grocery_data):
+        temp_file = path + '.tmp'
+        journal_file = journal_path(path)
+        pending_file = journal_file + COMPACTING_SUFFIX
+        try:
+            with open(temp_file, mode='w', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=GROCERY_FIELDS)
+                writer.writeheader()
+                for grocery_id, grocery_info in grocery_data.items():
+                    writer.writerow({
+                        'id': grocery_id,
+                        'name': grocery_info['name'],
+                        'price': grocery_info['price'],
+                        'stock': grocery_info['stock']
+                    })
+                file.flush()
+                os.fsync(file.fileno())
+
+            if os.path.exists(journal_file):
+                os.replace(journal_file, pending_file)
+            os.replace(temp_file, path)
+            if os.path.exists(pending_file):
+                os.remove(pending_file)
+            if isinstance(grocery_data, GroceryCatalog):
+                grocery_data.catalog_state = _catalog_state(path)
+                grocery_data.journal_offset = 0
+        except IOError as e:
+            print(f"Error writing to file '{path}': {e}")
+
+    def save_grocery_item(self, path, grocery_data, grocery_id, changes):
+        # The catalog is one file; under the lock and after a refresh, rewriting it loses nothing
+        self.save_groceries(path, grocery_data)
+
+    def load_transactions(self, path, columnar=False, snapshot=False, start_ordinal=None, end_ordinal=None):
+        if is_partitioned(path):
+            return self._load_partitions(path, columnar, snapshot, start_ordinal, end_ordinal)
+        if snapshot:
+            return load_transaction_snapshot(path)
+        if columnar:
+            return load_transaction_store(path)
+
+        transactions = []
+        try:
+            with open(path, mode='r') as file:
+                reader = csv.DictReader(file)
+                quarantine = Quarantine(path, TRANSACTION_FIELDS)
+                for line_number, row in enumerate(reader, start=2):
+                    try:
+                        transactions.append(typed_transaction(row))
+                    except InvalidRecord as e:
+                        quarantine.reject(row, e, line_number)
+                quarantine.accepted = len(transactions)
+                quarantine.close()
+        except FileNotFoundError:
+            print(f"Error: File '{path}' not found.")
+        except IOError as e:
+            print(f"Error reading file '{path}': {e}")
+        return transactions
+
+    def _load_partitions(self, directory, columnar, snapshot, start_ordinal, end_ordinal):
+        partitions = list_partitions(directory, start_ordinal, end_ordinal)
+        if snapshot:
+            store = TransactionStore()
+            for _, path in partitions:
+                store.extend(load_transaction_snapshot(path, indexed=False))
+            store.build_indexes()
+            return store
+
+        transactions = []
+        for _, path in partitions:
+            transactions.extend(self.load_transactions(path))
+        if columnar:
+            return build_transaction_store(transactions)
+        return transactions
+
+    def iter_transaction_range(self, path, start_ordinal=None, end_ordinal=None):
+        if is_partitioned(path):
+            for _, partition in list_partitions(path, start_ordinal, end_ordinal):
+                yield from self.iter_transaction_range(partition, start_ordinal, end_ordinal)
+            return
+
+        if start_ordinal is not None and end_ordinal is not None:
+            # A compacted file is bisected straight to the range through its offset index
+            records = iter_sorted_range(path, start_ordinal, end_ordinal)
+            if records is not None:
+                yield from records
+                return
+
+        try:
+            with open(path, mode='r', newline='') as file:
+                reader = csv.reader(file)
+                header = next(reader, None)
+                if header is None:
+                    return
+                header = [field.strip() for field in header]
+                try:
+                    columns = [header.index(field) for field in TRANSACTION_FIELDS]
+                except ValueError:
+                    print(f"Error: File '{path}' must have the columns {', '.join(TRANSACTION_FIELDS)}.")
+                    return
+                date_col, time_col, id_col, quantity_col, payment_col = columns
+
+                for line_number, row in enumerate(reader, start=2):
+                    try:
+                        yield (
+                            parse_date(row[date_col].strip()),
+                            parse_time(row[time_col].strip()),
+                            int(row[id_col]),
+                            int(row[quantity_col]),
+                            parse_cents(row[payment_col]),
+                        )
+                    except (IndexError, ValueError) as e:
+                        print(f"Skipping invalid transaction on line {line_number} ({row}): {e}")
+        except FileNotFoundError:
+            print(f"Error: File '{path}' not found.")
+        except IOError as e:
+            print(f"Error reading file '{path}': {e}")
+
+    def save_transactions(self, path, transactions):
+        if is_partitioned(path):
+            try:
+                partitions = group_by_partition(transactions)
+            except (KeyError, ValueError, AttributeError) as e:
+                print(f"Error: Cannot route a transaction to its month: {e}")
+                return False
+            return all(
+                self.save_transactions(partition_path(path, month), rows)
+                for month, rows in sorted(partitions.items())
+            )
+
+        try:
+            try:
+                before = os.stat(path)
+            except FileNotFoundError:
+                before = None
+            with open(path, mode='a', newline='') as file:
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=['date', 'time', 'id', 'quantity', 'payment'])
+                file_empty = file.tell() == 0
+
+                if file_empty:
+                    writer.writeheader()
+                for transaction in transactions:
+                    writer.writerow(transaction)
+                file.write(buffer.getvalue())
+                file.flush()
+                os.fsync(file.fileno())
+                if before is not None:
+                    # The snapshot then only needs to hash the appended rows
+                    note_transaction_append(path, before, os.fstat(file.fileno()))
+            return True
+        except IOError as e:
+            print(f"Error writing to file '{path}': {e}")
+            return False
+
+    def record_sale(self, grocery_path, grocery_data, transaction_path, transactions, transaction_backend):
+        # The stock is checked again and the sale written under the grocery file lock.
+        # The stock changes are journalled as pending before the rows and committed after them;
+        # they are cut off again if the rows cannot be written, and ignored on load if the
+        # program stops before the commit, so the rows and stock changes count together.
+        quantities = {}
+        for t in transactions:
+            quantities[t['id']] = quantities.get(t['id'], 0) + t['quantity']
+
+        with file_lock(grocery_path):
+            if self.refresh_groceries(grocery_path, grocery_data):
+                bump_data_version()
+            shortages = [
+                grocery_id for grocery_id, quantity in quantities.items()
+                if grocery_id not in grocery_data or grocery_data[grocery_id]['stock'] < quantity
+            ]
+            if shortages:
+                return shortages
+
+            deltas = {grocery_id: -quantity for grocery_id, quantity in quantities.items()}
+            journalled = journal_size(grocery_path)
+            sale = uuid.uuid4().hex
+            try:
+                append_stock_deltas(grocery_path, deltas, sale)
+            except OSError as e:
+                print(f"Error writing to the stock journal of '{grocery_path}': {e}")
+                return None
+
+            saved = False
+            try:
+                with file_lock(transaction_path):
+                    saved = transaction_backend.save_transactions(transaction_path, transactions)
+            finally:
+                if not saved:
+                    try:
+                        truncate_stock_journal(grocery_path, journalled)
+                    except OSError as e:
+                        print(f"Error removing the stock changes of the unrecorded sale from the stock journal "
+                              f"of '{grocery_path}': {e}")
+            if not saved:
+                return None
+            try:
+                offset = commit_stock_deltas(grocery_path, sale)
+            except OSError as e:
+                # The rows are written; the stock kept in memory is saved when the journal is compacted
+                print(f"Error writing to the stock journal of '{grocery_path}': {e}")
+                offset = None
+
+            for grocery_id, delta in deltas.items():
+                grocery_data[grocery_id]['stock'] += delta
+            if isinstance(grocery_data, GroceryCatalog) and offset is not None:
+                grocery_data.journal_offset = offset
+            if journal_size(grocery_path) >= COMPACT_THRESHOLD_BYTES:
+                self.save_groceries(grocery_path, grocery_data)
+        return []
+
+    def load_users(self, path):
+        users = []
+
+        # Check if the file exists
+        if not os.path.isfile(path):
+            print(f"Error: The file '{path}' does not exist.")
+            return users  # Return an empty list if the file is not found
+
+        try:
+            with open(path, mode='r') as file:
+                reader = csv.DictReader(file)
+                for row in reader:
+                    # Optionally validate that the necessary fields exist
+                    if 'username' in row and 'password' in row:
+                        users.append(row)
+                    else:
+                        print("Warning: Missing 'username' or 'password' in row:", row)
+        except OSError as e:
+            print(f"Error: Unable to open file '{path}'. Reason: {e}")
+        except Exception as e:
+            print(f"An unexpected error occurred: {e}")
+
+        return users
@@ -0,0 +1,92 @@
+from datetime import date
+from functools import lru_cache
+
+
+# A year of history has a few hundred distinct dates, so this comfortably covers many years.
+DATE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(value):
+    """
+    Converts a 'dd/mm/yyyy' date string to a day ordinal.
+    Each distinct string is parsed once; repeats are answered from a bounded cache.
+    Args:
+        value (str): The date string. Day and month may omit the leading zero.
+    Returns:
+        int: The proleptic Gregorian ordinal of the date.
+    Raises:
+        ValueError: If the string is not a valid 'dd/mm/yyyy' date.
+    """
+    day, month, year = value.strip().split('/')
+    return date(int(year), int(month), int(day)).toordinal()
+
+def parse_time(value):
+    """
+    Converts a 12-hour 'h:mm:ss AM/PM' time string to seconds since midnight.
+    Times are nearly all distinct, so they are parsed directly rather than cached.
+    Args:
+        value (str): The time string, e.g. '6:05:21 PM' or '06:05:21 PM'.
+    Returns:
+        int: The number of seconds since midnight.
+    Raises:
+        ValueError: If the string is not a valid 12-hour time.
+    """
+    clock, meridiem = value.split()
+    hours, minutes, seconds = clock.split(':')
+    hours, minutes, seconds = int(hours), int(minutes), int(seconds)
+    meridiem = meridiem.upper()
+    if meridiem not in ('AM', 'PM') or not (1 <= hours <= 12 and 0 <= minutes < 60 and 0 <= seconds < 60):
+        raise ValueError(f"invalid time '{value}'")
+    hours %= 12
+    if meridiem == 'PM':
+        hours += 12
+    return hours * 3600 + minutes * 60 + seconds
+
+def parse_month(value):
+    """
+    Converts a 'mm/yyyy' month string to a month index (year * 12 + month - 1).
+    Raises:
+        ValueError: If the string is not a valid 'mm/yyyy' month.
+    """
+    month, year = value.strip().split('/')
+    month, year = int(month), int(year)
+    if not (1 <= month <= 12 and 1 <= year <= 9999):
+        raise ValueError(f"invalid month '{value}'")
+    return year * 12 + month - 1
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def format_date(ordinal, date_format="%d/%m/%Y"):
+    """
+    Converts a day ordinal back to a date string, 'dd/mm/yyyy' by default.
+    """
+    return date.fromordinal(ordinal).strftime(date_format)
+
+def format_time(seconds):
+    """
+    Converts seconds since midnight back to a 12-hour 'h:mm:ss AM/PM' time string.
+    """
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    meridiem = 'PM' if hours >= 12 else 'AM'
+    return f"{(hours % 12) or 12}:{minutes:02d}:{seconds:02d} {meridiem}"
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def month_index(ordinal):
+    """
+    Converts a day ordinal to a month index (year * 12 + month - 1).
+    """
+    d = date.fromordinal(ordinal)
+    return d.year * 12 + d.month - 1
+
+def month_start(index):
+    """
+    Returns the day ordinal of the first day of a month index.
+    """
+    return date(index // 12, index % 12 + 1, 1).toordinal()
+
+def month_label(index, date_format="%Y-%m"):
+    """
+    Formats the first day of a month index with the given strftime format.
+    """
+    return date(index // 12, index % 12 + 1, 1).strftime(date_format)
@@ -1,12 +1,23 @@
-from datetime import datetime
-import matplotlib.pyplot as plt
-
+import heapq
+from utils.charts import render_chart
+from utils.date_normalization import format_date, month_label, parse_date, parse_month
+from utils.profiling import profiled
+from utils.report_cache import cached_report
+from utils.transaction_store import TransactionStore, as_transaction_store
+
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+# Ranking metric -> position of the metric in a sales rollup cell [cents, quantity, count]
+RANKING_METRICS = {'value': 0, 'quantity': 1, 'count': 2}
+
+@profiled
 def plot_bar_chart(sorted_sales, grocery_names):
     """
     Plots a bar chart using the given data.
     Args:
         sorted_sales (list of tuple): A list of tuples where each tuple contains a grocery ID and its total sales value.
         grocery_names (list of str): A list of grocery names corresponding to the sales values.
+    Returns:
+        str: The path of the saved chart, or None if it could not be plotted.
     """
     try:
         # Check if sorted_sales and grocery_names are not empty
@@ -19,20 +30,14 @@ def plot_bar_chart(sorted_sales, grocery_names):
 
         sales_values = [value for _, value in sorted_sales]
 
-        plt.figure(figsize=(10, 6))
-        plt.barh(grocery_names, sales_values, color='skyblue')
-        plt.xlabel("Total Sales Value")
-        plt.title("Total Sales by Product")
-        plt.gca().invert_yaxis()  # To display the highest sales at the top
-
-        plt.savefig("total_sales_value.png")
-        plt.show()
+        return render_chart('bar', (list(grocery_names), sales_values), "total_sales_value.png")
     
     except ValueError as ve:
         print(ve)
     except Exception as e:
         print(f"An error occurred while plotting the chart: {e}")
 
+@profiled
 def plot_graph(monthly_sales, title, save_name):
     """
     Plots a graph of monthly sales data.
@@ -44,7 +49,7 @@ def plot_graph(monthly_sales, title, save_name):
         save_name (str): The filename to save the plot.
 
     Returns:
-        None
+        str: The path of the saved chart, or None if it could not be plotted.
     """
     if not monthly_sales:
         print("Error: No sales data available to plot.")
@@ -75,32 +80,215 @@ def plot_graph(monthly_sales, title, save_name):
         return
 
     try:
-        fig, ax = plt.subplots()
-        ax.plot(months, sales_values, label="Monthly Sales Value", color='b', marker='o')
-        ax.plot(months, sales_counts, label='Number of Sales', color='g', marker='x')
-        ax.plot(months, sales_quantity, label="Number of Items Sold", color="r", marker="*")
-        ax.set_title(title)
-        ax.set_xlabel("Month")
-        ax.set_ylabel("Sales Value / Count")
-        ax.legend()
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        plt.savefig(save_name)
-        plt.show()
+        return render_chart('line', (months, sales_values, sales_counts, sales_quantity, title), save_name)
     except Exception as e:
         print(f"Error: An error occurred while plotting the graph: {e}")
 
+@profiled
+def plot_heatmap(hourly_sales, title, save_name):
+    """
+    Plots heatmaps of sales by weekday and hour of day.
+    Args:
+        hourly_sales (dict): The result of hourly_sales_summary, with 'value', 'stock' and
+                             'count' grids of 7 rows (Monday first) by 24 hours.
+        title (str): The title of the chart.
+        save_name (str): The filename to save the plot.
+    Returns:
+        str: The path of the saved chart, or None if it could not be plotted.
+    """
+    try:
+        grids = [
+            ("Sales Value", hourly_sales['value']),
+            ("Number of Items Sold", hourly_sales['stock']),
+            ("Number of Sales", hourly_sales['count']),
+        ]
+    except KeyError as e:
+        print(f"Error: Missing hourly sales data: {e}.")
+        return
+
+    if any(len(grid) != 7 or any(len(row) != 24 for row in grid) for _, grid in grids):
+        print("Error: Hourly sales data must have 7 weekdays of 24 hours.")
+        return
+
+    try:
+        weekdays = [name[:3] for name in WEEKDAY_NAMES]
+        hours = [f"{hour:02d}" for hour in range(24)]
+        return render_chart('heatmap', (weekdays, hours, grids, title), save_name)
+    except Exception as e:
+        print(f"Error: An error occurred while plotting the heatmap: {e}")
+
+@profiled
+@cached_report
+def monthly_sales_summary(transactions, start_month, end_month):
+    """
+    Computes the sales of every month in a range of months, both included in full.
+    Args:
+        transactions (TransactionStore or list): Transaction records.
+        start_month (str): The start month in "MM/YYYY" format.
+        end_month (str): The end month in "MM/YYYY" format.
+    Returns:
+        dict: Month label ("yy-mm") -> {'value': float, 'stock': int, 'count': int}, for months with sales.
+    Raises:
+        ValueError: If the start or end month is not in "MM/YYYY" format.
+    """
+    start_index = parse_month(start_month)
+    end_index = parse_month(end_month)
+    if not transactions:
+        return {}
+
+    # Read the pre-aggregated month cells; payments are kept in cents to avoid float drift
+    store = as_transaction_store(transactions)
+    monthly_sales = {}
+    for month, (cents, quantity, count) in store.sales_rollup.monthly_totals(start_index, end_index).items():
+        monthly_sales[month_label(month, "%y-%m")] = {'value': cents / 100, 'stock': quantity, 'count': count}
+    return monthly_sales
+
+@profiled
+@cached_report
+def product_sales_summary(transactions, grocery_id, start_month, end_month):
+    """
+    Computes the monthly sales of one grocery item in a range of months, both included in full.
+    Args:
+        transactions (TransactionStore or list): Transaction records.
+        grocery_id (str): The ID of the grocery item.
+        start_month (str): The start month in "MM/YYYY" format.
+        end_month (str): The end month in "MM/YYYY" format.
+    Returns:
+        dict: Month label ("yyyy-mm") -> {'value': float, 'stock': int, 'count': int}, for months with sales.
+    Raises:
+        ValueError: If a month is not in "MM/YYYY" format or the grocery ID is not numeric.
+    """
+    start_index = parse_month(start_month)
+    end_index = parse_month(end_month)
+    product_id = int(grocery_id)
+
+    # Read the pre-aggregated month cells of the grocery item
+    store = as_transaction_store(transactions)
+    monthly_sales = {}
+    for month, (cents, quantity, count) in store.sales_rollup.monthly_totals(start_index, end_index, product_id).items():
+        monthly_sales[month_label(month)] = {'value': cents / 100, 'stock': quantity, 'count': count}
+    return monthly_sales
+
+@profiled
+@cached_report
+def total_sales_summary(transactions, groceries, start_date, end_date):
+    """
+    Computes the total sales value of every grocery item between two dates, both inclusive.
+    Args:
+        transactions (TransactionStore or list of dict): Transaction records.
+        groceries (dict): A dictionary of grocery items keyed by grocery ID.
+        start_date (str): The start date of the range in DD/MM/YYYY format.
+        end_date (str): The end date of the range in DD/MM/YYYY format.
+    Returns:
+        dict: Grocery ID -> total sales value, for grocery items with sales. Sales of IDs
+              missing from ``groceries`` are left out; check_grocery_references reports
+              them once when the data is loaded.
+    Raises:
+        ValueError: If a date is not in DD/MM/YYYY format.
+    """
+    start_ordinal = parse_date(start_date)
+    end_ordinal = parse_date(end_date)
+
+    store = as_transaction_store(transactions)
+    grocery_total_sales = {}
+    for transaction_id, (cents, _, _) in store.sales_rollup.product_totals(start_ordinal, end_ordinal).items():
+        grocery_id = str(transaction_id)
+        if grocery_id in groceries:
+            grocery_total_sales[grocery_id] = cents / 100
+    return grocery_total_sales
+
+@profiled
+@cached_report
+def top_products_summary(transactions, groceries, start_date, end_date, metric='value', limit=20, bottom=False):
+    """
+    Ranks grocery items by their sales between two dates, both inclusive.
+    The per-product totals are read from the sales rollup and only the ``limit`` best
+    (or worst) are selected with a bounded heap, so the cost grows with the number of
+    products times log(limit) rather than with a sort of every product.
+    Args:
+        transactions (TransactionStore or list of dict): Transaction records.
+        groceries (dict): A dictionary of grocery items keyed by grocery ID.
+        start_date (str): The start date of the range in DD/MM/YYYY format.
+        end_date (str): The end date of the range in DD/MM/YYYY format.
+        metric (str, optional): 'value', 'quantity' or 'count'. Defaults to 'value'.
+        limit (int, optional): The number of grocery items to return. Defaults to 20.
+        bottom (bool, optional): If True, return the lowest ranked items instead. Grocery
+            items without sales in the range are then included with zero sales.
+    Returns:
+        list of dict: Up to ``limit`` items, best first (worst first if ``bottom``), each with
+                      'id', 'name', 'value' (float), 'quantity' (int) and 'count' (int).
+    Raises:
+        ValueError: If a date is not in DD/MM/YYYY format, the metric is unknown or the
+                    limit is not a positive integer.
+    """
+    if metric not in RANKING_METRICS:
+        raise ValueError(f"unknown metric '{metric}'; expected one of: {', '.join(RANKING_METRICS)}")
+    limit = int(limit)
+    if limit <= 0:
+        raise ValueError("the number of items must be a positive integer")
+    start_ordinal = parse_date(start_date)
+    end_ordinal = parse_date(end_date)
+
+    store = as_transaction_store(transactions)
+    totals = {}
+    for transaction_id, cell in store.sales_rollup.product_totals(start_ordinal, end_ordinal).items():
+        grocery_id = str(transaction_id)
+        if grocery_id in groceries:
+            totals[grocery_id] = cell
+    if bottom:
+        for grocery_id in groceries:
+            totals.setdefault(grocery_id, (0, 0, 0))
+
+    column = RANKING_METRICS[metric]
+    select = heapq.nsmallest if bottom else heapq.nlargest
+    ranked = select(limit, totals.items(), key=lambda item: item[1][column])
+    return [
+        {'id': grocery_id, 'name': groceries[grocery_id]['name'],
+         'value': cents / 100, 'quantity': quantity, 'count': count}
+        for grocery_id, (cents, quantity, count) in ranked
+    ]
+
+@profiled
+@cached_report
+def hourly_sales_summary(transactions, start_date, end_date):
+    """
+    Bins the sales between two dates, both inclusive, by weekday and hour of day.
+    The hourly cells of each day in the range are read from the sales rollup and summed,
+    so the cost grows with the number of days rather than the number of transactions.
+    Args:
+        transactions (TransactionStore or list of dict): Transaction records.
+        start_date (str): The start date of the range in DD/MM/YYYY format.
+        end_date (str): The end date of the range in DD/MM/YYYY format.
+    Returns:
+        dict: {'value': grid of float, 'stock': grid of int, 'count': grid of int}, where each
+              grid is a list of 7 weekdays (Monday first) of 24 hourly totals.
+    Raises:
+        ValueError: If a date is not in DD/MM/YYYY format.
+    """
+    start_ordinal = parse_date(start_date)
+    end_ordinal = parse_date(end_date)
+
+    store = as_transaction_store(transactions)
+    bins = store.sales_rollup.hourly_totals(start_ordinal, end_ordinal)
+    empty = (0, 0, 0)
+    return {
+        'value': [[bins.get((day, hour), empty)[0] / 100 for hour in range(24)] for day in range(7)],
+        'stock': [[bins.get((day, hour), empty)[1] for hour in range(24)] for day in range(7)],
+        'count': [[bins.get((day, hour), empty)[2] for hour in range(24)] for day in range(7)],
+    }
+
+@profiled
 def display_monthly_sales(transactions, start_month, end_month):
     """
     Displays the monthly sales for a given range of months.
-    This function processes a list of transactions, filters them by the specified
-    date range, and calculates the total sales value, stock quantity, and number
-    of transactions for each month within the range. It then plots a graph of the
-    monthly sales values and the number of sales.
+    This function reads the total sales value, stock quantity, and number of
+    transactions for each month within the range from the pre-aggregated sales
+    rollup of the transactions. Both the start and end months are included in full.
+    It then plots a graph of the monthly sales values and the number of sales.
     Args:
-        transactions (list): A list of transaction dictionaries. Each dictionary
-                             should contain 'date' (str in "dd/mm/yyyy" format),
-                             'payment' (float or str), and 'quantity' (int or str).
+        transactions (TransactionStore or list): A TransactionStore, or a list of transaction
+                             dictionaries. Each dictionary should contain 'date' (str in
+                             "dd/mm/yyyy" format), 'payment' (float or str), and 'quantity' (int or str).
         start_month (str): The start month in "MM/YYYY" format.
         end_month (str): The end month in "MM/YYYY" format.
     Returns:
@@ -115,9 +303,9 @@ def display_monthly_sales(transactions, start_month, end_month):
         display_monthly_sales(transactions, '01/2023', '02/2023')
     """
     try:
-        # Convert start and end month strings to datetime objects
-        start_date = datetime.strptime(start_month, "%m/%Y")
-        end_date = datetime.strptime(end_month, "%m/%Y")
+        # Convert start and end month strings to month indexes
+        start_index = parse_month(start_month)
+        end_index = parse_month(end_month)
     except ValueError:
         print("Error: Please use MM/YYYY format for start and end months.")
         return
@@ -126,46 +314,22 @@ def display_monthly_sales(transactions, start_month, end_month):
         print("No transactions available to display.")
         return
 
-    monthly_sales = {}
-    
-    for t in transactions:
-        try:
-            # Extract and convert the transaction date
-            transaction_date = datetime.strptime(t['date'], "%d/%m/%Y")
-            
-            # Check if the transaction date is within the specified range
-            if start_date <= transaction_date <= end_date:
-                month = transaction_date.strftime("%y-%m")
-                
-                # Initialize month entry if it doesn't exist
-                if month not in monthly_sales:
-                    monthly_sales[month] = {'value': 0, 'stock': 0, 'count': 0}
-
-                # Safely get payment and quantity values
-                payment = float(t.get('payment', 0))  # Defaults to 0 if 'payment' key is missing
-                quantity = int(t.get('quantity', 0))  # Defaults to 0 if 'quantity' key is missing
-                
-                monthly_sales[month]['value'] += payment
-                monthly_sales[month]['stock'] += quantity
-                monthly_sales[month]['count'] += 1
-
-        except ValueError:
-            print(f"Error: Invalid transaction data found: {t}")
-            continue  # Skip this transaction and continue with the next
+    monthly_sales = monthly_sales_summary(transactions, start_month, end_month)
 
     if not monthly_sales:
         print("No sales data found for the specified date range.")
         return
 
     grapth_title = "Monthly Sales Values and Number of Sales"
-    save_file_name = f"{start_date.strftime('%Y-%m-%d')}_to_{end_date.strftime('%Y-%m-%d')}_sales"
+    save_file_name = f"{month_label(start_index, '%Y-%m-%d')}_to_{month_label(end_index, '%Y-%m-%d')}_sales"
     plot_graph(monthly_sales, grapth_title, save_file_name)
 
+@profiled
 def display_product_sales(transactions, groceries, grocery_id, start_month, end_month):
     """
     Display and plot the monthly sales data for a specific grocery item within a given date range.
     Args:
-        transactions (list): A list of transaction dictionaries. Each dictionary should contain:
+        transactions (TransactionStore or list): A TransactionStore, or a list of transaction dictionaries. Each dictionary should contain:
             - 'date' (str): The date of the transaction in "dd/mm/yyyy" format.
             - 'id' (int): The grocery item ID.
             - 'payment' (str): The payment amount for the transaction.
@@ -184,7 +348,8 @@ def display_product_sales(transactions, groceries, grocery_id, start_month, end_
     Notes:
         - The function checks if the grocery_id exists in the groceries dictionary.
         - It parses the start and end months and ensures the start date is before the end date.
-        - It processes each transaction to collect monthly sales data for the specified grocery item within the date range.
+        - Both the start and end months are included in full, not only the first day of the end month.
+        - It reads the monthly sales data for the specified grocery item from the sales rollup. Both the start and end months are included in full.
         - If no sales data is found, it notifies the user.
         - It prepares a filename and plots the graph using the collected sales data.
     """
@@ -195,39 +360,22 @@ def display_product_sales(transactions, groceries, grocery_id, start_month, end_
 
     # Try to parse the start and end dates
     try:
-        start_date = datetime.strptime(start_month, "%m/%Y")
-        end_date = datetime.strptime(end_month, "%m/%Y")
+        start_index = parse_month(start_month)
+        end_index = parse_month(end_month)
     except ValueError:
         print("Error: Please use MM/YYYY format for start and end months.")
         return
 
     # Ensure the start date is before the end date
-    if start_date > end_date:
+    if start_index > end_index:
         print("Error: Start date must be before end date.")
         return
 
-    monthly_sales = {}
-    
-    # Process each transaction
-    for t in transactions:
-        try:
-            transaction_date = datetime.strptime(t['date'], "%d/%m/%Y")
-            # Check if the transaction is for the specified grocery_id and within the date range
-            if t['id'] == grocery_id and start_date <= transaction_date <= end_date:
-                month = transaction_date.strftime("%Y-%m")
-                # Initialize monthly sales data if the month is not already present
-                if month not in monthly_sales:
-                    monthly_sales[month] = {'value': 0, 'stock': 0, 'count': 0}
-                # Update the monthly sales data
-                monthly_sales[month]['value'] += float(t['payment'])
-                monthly_sales[month]['stock'] += int(t['quantity'])
-                monthly_sales[month]['count'] += 1
-        except ValueError as e:
-            print(f"Error processing transaction date '{t['date']}': {e}")
-        except KeyError as e:
-            print(f"Error: Missing expected key in transaction data: {e}")
-        except TypeError as e:
-            print(f"Error with transaction data types: {e}")
+    try:
+        monthly_sales = product_sales_summary(transactions, grocery_id, start_month, end_month)
+    except ValueError:
+        print("Error: Invalid product ID.")
+        return
 
     # If no sales data is collected, notify the user
     if not monthly_sales:
@@ -235,18 +383,19 @@ def display_product_sales(transactions, groceries, grocery_id, start_month, end_
         return
 
     # Prepare the filename and plot the graph
-    file_start_date = start_date.strftime('%Y-%m-%d')
-    file_end_date = end_date.strftime('%Y-%m-%d')
+    file_start_date = month_label(start_index, '%Y-%m-%d')
+    file_end_date = month_label(end_index, '%Y-%m-%d')
 
     graph_title = f"Monthly Sales for {groceries[grocery_id]['name']}. Grocery ID: {grocery_id}."
     save_file_name = f"{grocery_id}_{groceries[grocery_id]['name']}_{file_start_date}_to_{file_end_date}_sales"
     plot_graph(monthly_sales, graph_title, save_file_name)
 
+@profiled
 def display_total_sales(transactions, groceries, start_date, end_date):
     """
     Displays a bar chart of total sales by product within a specified date range.
     Args:
-        transactions (list of dict): A list of transaction records, where each record is a dictionary
+        transactions (TransactionStore or list of dict): A TransactionStore, or a list of transaction records, where each record is a dictionary
                                      containing 'date' (str in DD/MM/YYYY format), 'id' (str), and 'payment' (str).
         groceries (dict): A dictionary of grocery items where keys are grocery IDs and values are dictionaries
                           containing 'name' (str) and other grocery details.
@@ -257,42 +406,18 @@ def display_total_sales(transactions, groceries, start_date, end_date):
               and displays a bar chart of total sales by product within the specified date range.
     """
     # Check input types
-    if not isinstance(transactions, list) or not isinstance(groceries, dict) or not isinstance(start_date, str) or not isinstance(end_date, str):
+    if not isinstance(transactions, (list, TransactionStore)) or not isinstance(groceries, dict) or not isinstance(start_date, str) or not isinstance(end_date, str):
         print("Error: Invalid input types. Please check the types of your arguments.")
         return
 
     try:
-        start_date = datetime.strptime(start_date, "%d/%m/%Y")
-        end_date = datetime.strptime(end_date, "%d/%m/%Y")
+        parse_date(start_date)
+        parse_date(end_date)
     except ValueError:
         print("\nError: Please use DD/MM/YYYY format for start and end dates.")
         return
-    
-    grocery_total_sales = {}
-    for t in transactions:
-        # Validate transaction structure
-        if not isinstance(t, dict) or 'date' not in t or 'id' not in t or 'payment' not in t:
-            print(f"Skipping invalid transaction: {t}")
-            continue
-
-        try:
-            transaction_date = datetime.strptime(t['date'], "%d/%m/%Y")
-            if start_date <= transaction_date <= end_date:
-                grocery_id = t['id']
-                
-                # Validate grocery ID exists in groceries
-                if grocery_id not in groceries:
-                    print(f"Warning: Grocery ID {grocery_id} not found in grocery data. Skipping transaction.")
-                    continue
-                
-                # Validate payment data
-                payment = t['payment']
-                if isinstance(payment, (int, float, str)) and str(payment).replace('.', '', 1).isdigit():
-                    grocery_total_sales[grocery_id] = grocery_total_sales.get(grocery_id, 0) + float(payment)
-                else:
-                    print(f"Skipping transaction {t} due to invalid payment data.")
-        except ValueError:
-            print(f"Skipping transaction due to invalid date format in transaction {t}")
+
+    grocery_total_sales = total_sales_summary(transactions, groceries, start_date, end_date)
 
     # Check if there are any sales to display
     if not grocery_total_sales:
@@ -307,3 +432,92 @@ def display_total_sales(transactions, groceries, start_date, end_date):
         print("Warning: Some grocery names could not be found for the sales data.")
     
     plot_bar_chart(sorted_sales, grocery_names)
+
+@profiled
+def display_hourly_sales(transactions, start_date, end_date):
+    """
+    Displays heatmaps of the sales value, items sold and number of sales by weekday and
+    hour of day within a specified date range, to help plan staffing.
+    Args:
+        transactions (TransactionStore or list of dict): A TransactionStore, or a list of transaction records,
+                                     where each record contains 'date' (str in DD/MM/YYYY format),
+                                     'time' (str in h:mm:ss AM/PM format), 'quantity' and 'payment'.
+        start_date (str): The start date of the range in DD/MM/YYYY format.
+        end_date (str): The end date of the range in DD/MM/YYYY format.
+    Returns:
+        None
+    """
+    try:
+        start_ordinal = parse_date(start_date)
+        end_ordinal = parse_date(end_date)
+    except ValueError:
+        print("\nError: Please use DD/MM/YYYY format for start and end dates.")
+        return
+
+    if start_ordinal > end_ordinal:
+        print("Error: Start date must be before end date.")
+        return
+
+    if not transactions:
+        print("No transactions available to display.")
+        return
+
+    hourly_sales = hourly_sales_summary(transactions, start_date, end_date)
+    if not any(any(row) for row in hourly_sales['count']):
+        print("\nNo sales found in the specified date range.")
+        return
+
+    title = f"Sales by Weekday and Hour, {start_date} to {end_date}"
+    save_file_name = f"{format_date(start_ordinal, '%Y-%m-%d')}_to_{format_date(end_ordinal, '%Y-%m-%d')}_hourly_sales"
+    plot_heatmap(hourly_sales, title, save_file_name)
+
+@profiled
+def display_top_products(transactions, groceries, start_date, end_date, metric='value', limit=20, bottom=False):
+    """
+    Prints a leaderboard of the best (or worst) selling grocery items within a date range.
+    Args:
+        transactions (TransactionStore or list of dict): A TransactionStore, or a list of transaction records.
+        groceries (dict): A dictionary of grocery items where keys are grocery IDs and values are dictionaries
+                          containing 'name' (str) and other grocery details.
+        start_date (str): The start date of the range in DD/MM/YYYY format.
+        end_date (str): The end date of the range in DD/MM/YYYY format.
+        metric (str, optional): Rank by 'value', 'quantity' or 'count'. Defaults to 'value'.
+        limit (int or str, optional): The number of grocery items to show. Defaults to 20.
+        bottom (bool, optional): If True, show the worst selling items instead. Defaults to False.
+    Returns:
+        None
+    """
+    try:
+        start_ordinal = parse_date(start_date)
+        end_ordinal = parse_date(end_date)
+    except ValueError:
+        print("\nError: Please use DD/MM/YYYY format for start and end dates.")
+        return
+
+    if start_ordinal > end_ordinal:
+        print("Error: Start date must be before end date.")
+        return
+
+    if metric not in RANKING_METRICS:
+        print(f"Error: Please rank by one of: {', '.join(RANKING_METRICS)}.")
+        return
+
+    try:
+        limit = int(limit)
+        if limit <= 0:
+            raise ValueError
+    except ValueError:
+        print("Error: The number of items must be a positive whole number.")
+        return
+
+    ranking = top_products_summary(transactions, groceries, start_date, end_date, metric, limit, bottom)
+    if not ranking or (not bottom and not any(item['count'] for item in ranking)):
+        print("\nNo sales found in the specified date range.")
+        return
+
+    heading = "Bottom" if bottom else "Top"
+    print(f"\n{heading} {len(ranking)} grocery items by {metric}, {start_date} to {end_date}:")
+    print(f"{'Rank':<6}{'ID':<6}{'Name':<25}{'Value':>12}{'Quantity':>10}{'Sales':>8}")
+    print("-" * 67)
+    for rank, item in enumerate(ranking, start=1):
+        print(f"{rank:<6}{item['id']:<6}{item['name'][:24]:<25}{item['value']:>12.2f}{item['quantity']:>10}{item['count']:>8}")
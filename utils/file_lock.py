@@ -0,0 +1,39 @@
+import contextlib
+import os
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+
+LOCK_SUFFIX = '.lock'
+
+
+def lock_path(data_file):
+    """
+    Returns the path of the lock file guarding a data file.
+    """
+    return data_file.rstrip(os.sep) + LOCK_SUFFIX
+
+@contextlib.contextmanager
+def file_lock(data_file):
+    """
+    Holds an exclusive lock on a data file for the duration of a with block.
+    The lock is taken with flock on a separate '.lock' file next to the data file, so the
+    data file itself can still be replaced atomically while the lock is held. Terminals
+    only hold the lock for the few reads and writes of one change, never for a session.
+    Locks are advisory and only work on systems providing fcntl; elsewhere the block runs
+    unlocked, which is safe for a single terminal.
+    Args:
+        data_file (str): The path of the data file to lock.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path(data_file), mode='a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,30 @@
+from utils.name_index import NameIndex
+
+
+class GroceryCatalog(dict):
+    """
+    Grocery data as returned by load_grocery_data.
+    It is the usual dictionary of grocery items keyed by grocery ID, and also remembers
+    which version of the grocery file and how much of its stock journal it reflects:
+        - catalog_state (tuple): The inode, size and modification time of the grocery file.
+        - journal_offset (int): The number of stock journal bytes already applied.
+    With these, refresh_grocery_data catches up with changes made by other terminals by
+    applying only the journal entries appended since, instead of reloading the catalog.
+    It also keeps a trigram index of the grocery names for searches, in ``name_index``.
+    Code that adds or renames items must update it with index_grocery_name.
+    """
+
+    def __init__(self, items=(), catalog_state=None, journal_offset=0):
+        super().__init__(items)
+        self.catalog_state = catalog_state
+        self.journal_offset = journal_offset
+        self.name_index = NameIndex(self)
+
+
+def index_grocery_name(grocery_data, grocery_id):
+    """
+    Updates the name index of a GroceryCatalog after an item was added or renamed.
+    Plain dictionaries have no index and are left alone.
+    """
+    if isinstance(grocery_data, GroceryCatalog):
+        grocery_data.name_index.add(grocery_id, grocery_data[grocery_id]['name'])
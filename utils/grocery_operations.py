@@ -1,10 +1,18 @@
-import csv
+from utils.file_lock import file_lock
+from utils.grocery_catalog import index_grocery_name
+from utils.profiling import profiled
+from utils.report_cache import bump_data_version
+from utils.stock_journal import journal_size
+from utils.storage import storage_backend
 
-def load_grocery_data(grocery_file):
+@profiled
+def load_grocery_data(grocery_file, snapshot=False):
     """
     Loads grocery data from a CSV file into a dictionary.
     Args:
         grocery_file (str): The path to the CSV file containing grocery data.
+        snapshot (bool): If True, the data is read from a snapshot next to the CSV file when
+            the file is unchanged since the snapshot was taken, and a new snapshot is saved otherwise.
     Returns:
         dict: A dictionary where each key is a grocery ID and each value is another dictionary 
               containing 'name', 'price', and 'stock' of the grocery item. Returns an empty 
@@ -18,36 +26,45 @@ def load_grocery_data(grocery_file):
         - Leading and trailing spaces in field names and values are stripped.
         - If no field names are found in the CSV file, an error message is printed and an empty 
           dictionary is returned.
-        - If there is a data error in a row (e.g., non-numeric 'price' or 'stock'), an error 
-          message is printed for that row, and the row is skipped.
+        - Rows are validated once, here. A row with a data error (e.g. a non-numeric 'price'
+          or 'stock', or a repeated ID) is skipped and written, with the reason, to the
+          quarantine file '<grocery_file>.rejected', and one summary is printed.
+        - Stock changes recorded in the stock journal since the file was last saved are
+          applied to the loaded stock.
+        - The files are read under the grocery file lock, so a compaction by another
+          terminal cannot happen halfway through.
+        - The returned GroceryCatalog indexes the grocery names by trigram for searches.
+        - A path ending in '.db', '.sqlite' or '.sqlite3' is read from the groceries table of
+          that SQLite database instead; see utils.storage.
     """
-    grocery_data = {}
-    try:
-        with open(grocery_file, mode='r') as file:
-            reader = csv.DictReader(file)
-            if reader.fieldnames is None:
-                print("Error: No field names found in CSV file.")
-                return {}
-            reader.fieldnames = [field.strip() for field in reader.fieldnames]
-            for row in reader:
-                grocery_id = row['id'].strip()
-                try:
-                    grocery_data[grocery_id] = {
-                        'name': row['name'],
-                        'price': float(row['price']),
-                        'stock': int(row['stock'])
-                    }
-                except ValueError as e:
-                    print(f"Data error in row {row}: {e}")
-    except FileNotFoundError:
-        print(f"Error: File '{grocery_file}' not found.")
-    except IOError as e:
-        print(f"Error reading file '{grocery_file}': {e}")
-    return grocery_data
+    return storage_backend(grocery_file).load_groceries(grocery_file, snapshot)
+
+@profiled
+def refresh_grocery_data(grocery_file, grocery_data):
+    """
+    Brings in-memory grocery data up to date with changes saved by other terminals.
+    Only the stock journal entries appended since the data was loaded or last refreshed are
+    applied. The catalog is only re-read if it was rewritten in the meantime, e.g. by an
+    edit or a journal compaction. The caller must hold the grocery file lock so that the
+    files do not change while they are read.
+    Args:
+        grocery_file (str): The path to the grocery CSV file.
+        grocery_data (GroceryCatalog): The grocery data to update in place. Plain dictionaries
+            carry no journal position and are left unchanged, unless the grocery data is
+            kept in a database, which is simply re-read.
+    """
+    if storage_backend(grocery_file).refresh_groceries(grocery_file, grocery_data):
+        bump_data_version()
 
+@profiled
 def save_grocery_data(grocery_file, grocery_data):
     """
     Save grocery data to a CSV file.
+    The data is written to a temporary file that replaces the CSV file only once it is
+    complete, so a crash cannot truncate the catalog. The saved data already includes
+    every journalled stock change, so the stock journal is cleared as part of the save.
+    When several terminals share the files, the caller must hold the grocery file lock
+    and refresh the data with refresh_grocery_data first.
     Args:
         grocery_file (str): The path to the CSV file where the grocery data will be saved.
         grocery_data (dict): A dictionary containing grocery data. The keys are grocery IDs, 
@@ -55,19 +72,35 @@ def save_grocery_data(grocery_file, grocery_data):
     Raises:
         IOError: If there is an error writing to the file.
     """
-    try:
-        with open(grocery_file, mode='w', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=['id', 'name', 'price', 'stock'])
-            writer.writeheader()
-            for grocery_id, grocery_info in grocery_data.items():
-                writer.writerow({
-                    'id': grocery_id,
-                    'name': grocery_info['name'],
-                    'price': grocery_info['price'],
-                    'stock': grocery_info['stock']
-                })
-    except IOError as e:
-        print(f"Error writing to file '{grocery_file}': {e}")
+    storage_backend(grocery_file).save_groceries(grocery_file, grocery_data)
+
+@profiled
+def save_grocery_item(grocery_file, grocery_data, grocery_id, changes):
+    """
+    Saves a new or edited grocery item.
+    A CSV catalog is rewritten as a whole, while a database only has the changed fields
+    of that one item written, so a sale recorded at another terminal in the meantime
+    keeps its stock change. The caller must hold the grocery file lock.
+    Args:
+        grocery_file (str): The path to the grocery data.
+        grocery_data (dict): The grocery data, with the changes already applied.
+        grocery_id (str): The ID of the new or edited item.
+        changes (dict): The fields that were set; every field of a new item.
+    """
+    storage_backend(grocery_file).save_grocery_item(grocery_file, grocery_data, grocery_id, changes)
+
+def compact_stock_journal(grocery_file, grocery_data):
+    """
+    Folds the stock journal into the grocery CSV file if it has any entries.
+    Args:
+        grocery_file (str): The path to the grocery CSV file.
+        grocery_data (dict): The in-memory grocery data, which includes the journalled changes.
+            It is refreshed first, so changes journalled by other terminals are kept.
+    """
+    with file_lock(grocery_file):
+        if journal_size(grocery_file) > 0:
+            refresh_grocery_data(grocery_file, grocery_data)
+            save_grocery_data(grocery_file, grocery_data)
 
 def add_new_grocery_item(grocery_file, grocery_data):
     """
@@ -87,17 +120,22 @@ def add_new_grocery_item(grocery_file, grocery_data):
     """
     
     try:
-        new_grocery_id = str(len(grocery_data) + 1)
         name = input("Enter grocery name: ")
         price = float(input("Enter grocery price: "))
         stock = int(input("Enter grocery stock: "))
 
-        grocery_data[new_grocery_id] = {
-            'name': name,
-            'price': price,
-            'stock': stock
-        }
-        save_grocery_data(grocery_file, grocery_data)
+        # Pick the ID and save under the lock, after catching up with other terminals
+        with file_lock(grocery_file):
+            refresh_grocery_data(grocery_file, grocery_data)
+            new_grocery_id = str(len(grocery_data) + 1)
+            grocery_data[new_grocery_id] = {
+                'name': name,
+                'price': price,
+                'stock': stock
+            }
+            index_grocery_name(grocery_data, new_grocery_id)
+            save_grocery_item(grocery_file, grocery_data, new_grocery_id, grocery_data[new_grocery_id])
+            bump_data_version()
         print("Grocery item added successfully.")
     except ValueError as e:
         print(f"Input error: {e}")
@@ -128,15 +166,30 @@ def edit_grocery_item(grocery_file, grocery_data):
 
         print(f"Editing {grocery_data[grocery_id]['name']} with ID {grocery_id}")
 
-        name = input(f"New name for {grocery_data[grocery_id]['name']}: ") or grocery_data[grocery_id]['name']
-        price = input(f"Current price: {grocery_data[grocery_id]['price']}. New price: ") or grocery_data[grocery_id]['price']
-        stock = input(f"Current stock: {grocery_data[grocery_id]['stock']}. New stock: ") or grocery_data[grocery_id]['stock']
-
-        grocery_data[grocery_id]["name"] = name
-        grocery_data[grocery_id]["price"] = float(price)
-        grocery_data[grocery_id]["stock"] = int(stock)
+        name = input(f"New name for {grocery_data[grocery_id]['name']}: ")
+        price = input(f"Current price: {grocery_data[grocery_id]['price']}. New price: ")
+        stock = input(f"Current stock: {grocery_data[grocery_id]['stock']}. New stock: ")
+        price = float(price) if price else None
+        stock = int(stock) if stock else None
 
-        save_grocery_data(grocery_file, grocery_data)
+        # Only the fields that were changed are merged into the latest saved version of the item
+        with file_lock(grocery_file):
+            refresh_grocery_data(grocery_file, grocery_data)
+            if grocery_id not in grocery_data:
+                print("Grocery ID not found.")
+                return
+            changes = {}
+            if name:
+                changes["name"] = name
+            if price is not None:
+                changes["price"] = price
+            if stock is not None:
+                changes["stock"] = stock
+            grocery_data[grocery_id].update(changes)
+            if name:
+                index_grocery_name(grocery_data, grocery_id)
+            save_grocery_item(grocery_file, grocery_data, grocery_id, changes)
+            bump_data_version()
         print("Grocery item updated successfully.")
     except ValueError as e:
         print(f"Input error: {e}")
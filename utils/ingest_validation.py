@@ -0,0 +1,154 @@
+import csv
+import os
+
+
+QUARANTINE_SUFFIX = '.rejected'
+
+
+class InvalidRecord(ValueError):
+    """
+    Raised when a row of a data file fails validation.
+    Attributes:
+        field (str): The name of the offending field, used to group rejections in the summary.
+    """
+
+    def __init__(self, field, message):
+        super().__init__(message)
+        self.field = field
+
+
+def quarantine_path(data_file):
+    """
+    Returns the path of the quarantine file of a data file.
+    """
+    return data_file + QUARANTINE_SUFFIX
+
+
+class Quarantine:
+    """
+    Collects the rows rejected while loading a data file.
+    Rows are validated once, when the file is loaded, so searches and reports work on
+    checked, typed records. The rejected rows are written to '<data file>.rejected' as CSV
+    with the line number and the reason for each. A single summary is printed instead of
+    one warning per row.
+    """
+
+    def __init__(self, data_file, fields=None, append=False, path=None):
+        """
+        Args:
+            data_file (str): The path of the file being loaded.
+            fields (list of str, optional): The column names of the file, used for the quarantine file.
+            append (bool, optional): If True, add to an existing quarantine file, e.g. when only
+                the rows appended since the last load are validated. Defaults to False.
+            path (str, optional): The quarantine file. Defaults to '<data_file>.rejected'.
+        """
+        self.data_file = data_file
+        self.fields = fields
+        self.append = append
+        self.path = path or quarantine_path(data_file)
+        self.rejected = []
+        self.accepted = 0
+
+    def accept(self):
+        self.accepted += 1
+
+    def reject(self, row, error, line_number=None):
+        """
+        Records a rejected row.
+        Args:
+            row (dict or list): The raw row.
+            error (Exception): Why the row was rejected.
+            line_number (int, optional): The line of the row in the data file.
+        """
+        if isinstance(row, dict):
+            values = [row.get(field, '') for field in (self.fields or row.keys())]
+        else:
+            values = list(row)
+        field = getattr(error, 'field', None) or 'row'
+        self.rejected.append((line_number, values, field, str(error)))
+
+    def close(self):
+        """
+        Writes the quarantine file and prints the summary.
+        When there are no rejections and nothing is being appended, an outdated quarantine
+        file from an earlier load is removed.
+        Returns:
+            int: The number of rejected rows.
+        """
+        path = self.path
+        if not self.rejected:
+            if not self.append and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return 0
+
+        try:
+            write_header = not (self.append and os.path.exists(path))
+            with open(path, mode='w' if write_header else 'a', newline='') as file:
+                writer = csv.writer(file)
+                if write_header:
+                    writer.writerow(['line'] + list(self.fields or []) + ['reason'])
+                for line_number, values, _, reason in self.rejected:
+                    writer.writerow([line_number if line_number is not None else ''] + values + [reason])
+            where = f" Details are in '{path}'."
+        except OSError as e:
+            where = f" Unable to write '{path}': {e}"
+
+        by_field = {}
+        for _, _, field, _ in self.rejected:
+            by_field[field] = by_field.get(field, 0) + 1
+        reasons = ', '.join(f"{count} with an invalid {field}" for field, count in sorted(by_field.items()))
+        total = self.accepted + len(self.rejected)
+        print(f"Warning: Rejected {len(self.rejected)} of {total} rows of '{self.data_file}' ({reasons}).{where}")
+        return len(self.rejected)
+
+
+def validate_grocery(row):
+    """
+    Checks and converts one row of the grocery file.
+    Args:
+        row (dict): The raw row, with 'id', 'name', 'price' and 'stock'.
+    Returns:
+        tuple: (grocery ID (str), {'name': str, 'price': float, 'stock': int}).
+    Raises:
+        InvalidRecord: If a field is missing or invalid.
+    """
+    grocery_id = (row.get('id') or '').strip()
+    if not grocery_id.isdigit() or int(grocery_id) <= 0:
+        raise InvalidRecord('id', f"grocery ID must be a positive whole number, not '{grocery_id}'")
+    name = (row.get('name') or '').strip()
+    if not name:
+        raise InvalidRecord('name', "the name is empty")
+    try:
+        price = float(row.get('price'))
+    except (TypeError, ValueError):
+        raise InvalidRecord('price', f"price '{row.get('price')}' is not a number")
+    if not price >= 0:
+        raise InvalidRecord('price', f"price {price} is negative")
+    try:
+        stock = int(row.get('stock'))
+    except (TypeError, ValueError):
+        raise InvalidRecord('stock', f"stock '{row.get('stock')}' is not a whole number")
+    return grocery_id, {'name': row['name'], 'price': price, 'stock': stock}
+
+def check_grocery_references(transactions, groceries):
+    """
+    Warns once about sales of grocery IDs that are missing from the grocery data.
+    Reports leave such sales out without a warning of their own.
+    Args:
+        transactions (TransactionStore): The indexed transaction store.
+        groceries (dict): The grocery data keyed by grocery ID.
+    Returns:
+        list of str: The unknown grocery IDs.
+    """
+    if transactions.product_index is None:
+        transactions.build_indexes()
+    positions = transactions.product_index.positions
+    unknown = sorted(grocery_id for grocery_id in positions if str(grocery_id) not in groceries)
+    if unknown:
+        sales = sum(len(positions[grocery_id]) for grocery_id in unknown)
+        print(f"Warning: {sales} sales refer to grocery IDs missing from the grocery data "
+              f"({', '.join(str(grocery_id) for grocery_id in unknown)}). Reports leave them out.")
+    return [str(grocery_id) for grocery_id in unknown]
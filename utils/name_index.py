@@ -0,0 +1,131 @@
+import heapq
+from collections import Counter
+from itertools import chain
+
+
+NGRAM_SIZE = 3
+# Candidates must share at least this much of their n-grams with the query (Dice coefficient).
+MIN_SIMILARITY = 0.3
+# Number of candidate products returned for a query that matches no name.
+CANDIDATE_LIMIT = 5
+
+
+def _ngrams(text):
+    """
+    Returns the character n-grams of a lowercase name, padded with a space at either end
+    so that the first and last letters of the name are also covered by word-edge n-grams.
+    """
+    text = ' ' + text + ' '
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+class NameIndex:
+    """
+    An inverted index from the character trigrams of grocery names to grocery IDs.
+    It answers substring searches by intersecting the posting sets of the query's
+    trigrams instead of scanning every name, and ranks products by the trigrams they
+    share with a misspelt query ("tomatoe", "choclate"). Both cost time in proportion
+    to the postings of the query's trigrams, not to the size of the catalog.
+    Attributes:
+        postings (dict): Trigram -> set of grocery IDs whose name contains it.
+        names (dict): Grocery ID -> lowercase name.
+        grams (dict): Grocery ID -> set of trigrams of its name.
+    """
+
+    def __init__(self, groceries=None):
+        """
+        Args:
+            groceries (dict, optional): Grocery data keyed by grocery ID to index.
+        """
+        self.postings = {}
+        self.names = {}
+        self.grams = {}
+        for grocery_id, grocery_info in (groceries or {}).items():
+            self.add(grocery_id, grocery_info['name'])
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, grocery_id, name):
+        """
+        Indexes the name of a grocery item, replacing its previous name if it was indexed.
+        """
+        name = name.lower()
+        if self.names.get(grocery_id) == name:
+            return
+        self.remove(grocery_id)
+        grams = _ngrams(name)
+        self.names[grocery_id] = name
+        self.grams[grocery_id] = grams
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(grocery_id)
+
+    def remove(self, grocery_id):
+        """
+        Removes a grocery item from the index, if it is there.
+        """
+        grams = self.grams.pop(grocery_id, None)
+        if grams is None:
+            return
+        del self.names[grocery_id]
+        for gram in grams:
+            ids = self.postings[gram]
+            ids.discard(grocery_id)
+            if not ids:
+                del self.postings[gram]
+
+    def containing(self, text):
+        """
+        Returns the grocery IDs whose name contains a string, ignoring case.
+        Args:
+            text (str): The name or partial name to look for.
+        Returns:
+            set: The matching grocery IDs.
+        """
+        text = text.lower()
+        if len(text) < NGRAM_SIZE:
+            return {grocery_id for grocery_id, name in self.names.items() if text in name}
+        # Every trigram of the text occurs in a matching name; check the few names left
+        grams = sorted((text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)),
+                       key=lambda gram: len(self.postings.get(gram, ())))
+        ids = self.postings.get(grams[0], set())
+        for gram in grams[1:]:
+            if not ids:
+                break
+            ids = ids & self.postings.get(gram, set())
+        return {grocery_id for grocery_id in ids if text in self.names[grocery_id]}
+
+    def candidates(self, query, limit=CANDIDATE_LIMIT, min_similarity=MIN_SIMILARITY):
+        """
+        Ranks the grocery items whose names are most similar to a query, e.g. a misspelt name.
+        Args:
+            query (str): The name as typed.
+            limit (int, optional): The maximum number of candidates. Defaults to CANDIDATE_LIMIT.
+            min_similarity (float, optional): The lowest Dice coefficient of shared trigrams
+                a candidate may have. Defaults to MIN_SIMILARITY.
+        Returns:
+            list of tuple: (grocery ID, similarity between 0 and 1), most similar first.
+        """
+        query_grams = _ngrams(query.strip().lower())
+        shared = Counter(chain.from_iterable(self.postings.get(gram, ()) for gram in query_grams))
+
+        # A name has at least as many trigrams as it shares, so an item sharing ``count``
+        # trigrams is at most 2 * count / (query trigrams + count) similar. Items that cannot
+        # reach the minimum are skipped, and the rest are visited with the most shared first.
+        needed = min_similarity * len(query_grams) / (2 - min_similarity)
+        ranked = sorted(((count, grocery_id) for grocery_id, count in shared.items() if count >= needed), reverse=True)
+        best = []
+        for count, grocery_id in ranked:
+            floor = max(min_similarity, best[0][0]) if len(best) == limit else min_similarity
+            if 2 * count / (len(query_grams) + count) < floor:
+                break
+            similarity = 2 * count / (len(query_grams) + len(self.grams[grocery_id]))
+            if similarity < floor:
+                continue
+            # Ties go to the shorter name, which has fewer extra letters
+            item = (similarity, -len(self.names[grocery_id]), grocery_id)
+            if len(best) < limit:
+                heapq.heappush(best, item)
+            else:
+                heapq.heappushpop(best, item)
+        return [(grocery_id, similarity) for similarity, _, grocery_id in sorted(best, reverse=True)]
@@ -0,0 +1,227 @@
+import atexit
+import builtins
+import cProfile
+import functools
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+
+PROFILE_ENV = 'GROCERY_STORE_PROFILE'
+CPROFILE_ENV = 'GROCERY_STORE_CPROFILE'
+DEFAULT_PROFILE_FILE = 'grocery_store_profile.json'
+
+# Profiling settings; see enable_profiling.
+_settings = {
+    'enabled': False,
+    'output': DEFAULT_PROFILE_FILE,
+    'cprofile_action': None,
+}
+# Span name -> list of self times in seconds
+_timings = {}
+# The spans open in each thread, innermost last; see _start
+_open_spans = threading.local()
+
+
+def enable_profiling(output=None, cprofile_action=None):
+    """
+    Turns on timing spans. The collected timings are written as JSON when the program exits.
+    Profiling is also turned on by setting the GROCERY_STORE_PROFILE environment variable
+    to '1' or to the output path, and GROCERY_STORE_CPROFILE to a menu option.
+    Args:
+        output (str, optional): The JSON output path. Defaults to 'grocery_store_profile.json'.
+        cprofile_action (str, optional): A menu option, e.g. '7'. The first time it is chosen,
+            the whole action is also run under cProfile and the statistics are saved to
+            'grocery_store_menu_<option>.prof'.
+    """
+    if not _settings['enabled']:
+        atexit.register(dump_profile)
+    _settings['enabled'] = True
+    if output:
+        _settings['output'] = output
+    if cprofile_action:
+        _settings['cprofile_action'] = str(cprofile_action)
+
+def profiling_enabled():
+    return _settings['enabled']
+
+def configure_profiling_from_argv(argv):
+    """
+    Handles the '--profile[=FILE]' and '--profile-action=OPTION' command line flags.
+    Args:
+        argv (list of str): The command line arguments.
+    Returns:
+        list of str: The arguments without the profiling flags.
+    """
+    remaining = []
+    for arg in argv:
+        if arg == '--profile':
+            enable_profiling()
+        elif arg.startswith('--profile='):
+            enable_profiling(output=arg.split('=', 1)[1])
+        elif arg.startswith('--profile-action='):
+            enable_profiling(cprofile_action=arg.split('=', 1)[1])
+        else:
+            remaining.append(arg)
+    return remaining
+
+def _record(name, elapsed):
+    durations = _timings.get(name)
+    if durations is None:
+        durations = _timings[name] = []
+    durations.append(elapsed)
+
+def _start():
+    """
+    Opens a span in the current thread.
+    Returns:
+        list: [start time, time spent in nested spans], to pass to _finish.
+    """
+    stack = getattr(_open_spans, 'stack', None)
+    if stack is None:
+        stack = _open_spans.stack = []
+    frame = [time.perf_counter(), 0.0]
+    stack.append(frame)
+    return frame
+
+def _finish(name, frame):
+    """
+    Closes the innermost span and records its self time: its duration without the
+    nested spans, which record their own. With ``name`` None nothing is recorded, so the
+    time is only left out of the enclosing spans.
+    """
+    elapsed = time.perf_counter() - frame[0]
+    stack = _open_spans.stack
+    stack.pop()
+    if stack:
+        stack[-1][1] += elapsed
+    if name is not None:
+        _record(name, elapsed - frame[1])
+
+@contextmanager
+def span(name):
+    """
+    Times the body of a with block under a span name. Does nothing unless profiling is enabled.
+    """
+    if not _settings['enabled']:
+        yield
+        return
+    frame = _start()
+    try:
+        yield
+    finally:
+        _finish(name, frame)
+
+def profiled(func):
+    """
+    Decorator timing every call of a function under the span '<module>.<function>'.
+    Profiled functions calling each other each record their self time only, so the time
+    of a call is not counted again in the span of its caller.
+    When profiling is disabled the only overhead is one flag check per call.
+    """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _settings['enabled']:
+            return func(*args, **kwargs)
+        frame = _start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _finish(name, frame)
+    return wrapper
+
+@contextmanager
+def menu_action(option, user_type=None):
+    """
+    Times one menu action under the span 'menu.<user type>.<option>', and runs it under
+    cProfile if it is the option selected with --profile-action or GROCERY_STORE_CPROFILE.
+    The time spent waiting at the prompts of the action is left out of every span.
+    """
+    if not _settings['enabled']:
+        yield
+        return
+    profiler = None
+    if _settings['cprofile_action'] == option:
+        # Only the first run of the action is captured
+        _settings['cprofile_action'] = None
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    prompt = builtins.input
+
+    def timed_prompt(*args):
+        # The wait for the user counts as a nested span that is not recorded
+        frame = _start()
+        try:
+            return prompt(*args)
+        finally:
+            _finish(None, frame)
+
+    builtins.input = timed_prompt
+    frame = _start()
+    try:
+        yield
+    finally:
+        _finish(f"menu.{user_type}.{option}" if user_type else f"menu.{option}", frame)
+        builtins.input = prompt
+        if profiler is not None:
+            profiler.disable()
+            path = f"grocery_store_menu_{option}.prof"
+            profiler.dump_stats(path)
+            print(f"cProfile statistics of menu option {option} saved to '{path}' "
+                  f"(view with: python -m pstats {path}).", file=sys.stderr)
+
+def _percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def profile_summary():
+    """
+    Summarises the recorded spans. The times are self times, without nested spans, so
+    the totals of all spans add up to the time profiled.
+    Returns:
+        dict: Span name -> {'count', 'total_s', 'mean_s', 'p50_s', 'p90_s', 'p99_s', 'max_s'},
+              ordered by total time, largest first.
+    """
+    summary = {}
+    for name, durations in sorted(_timings.items(), key=lambda item: sum(item[1]), reverse=True):
+        ordered = sorted(durations)
+        total = sum(ordered)
+        summary[name] = {
+            'count': len(ordered),
+            'total_s': total,
+            'mean_s': total / len(ordered),
+            'p50_s': _percentile(ordered, 0.50),
+            'p90_s': _percentile(ordered, 0.90),
+            'p99_s': _percentile(ordered, 0.99),
+            'max_s': ordered[-1],
+        }
+    return summary
+
+def dump_profile(path=None):
+    """
+    Writes the span summary to a JSON file. Registered to run at exit once profiling is enabled.
+    """
+    if not _timings:
+        return
+    path = path or _settings['output']
+    try:
+        with open(path, mode='w') as file:
+            json.dump({'pid': os.getpid(), 'spans': profile_summary()}, file, indent=2)
+        print(f"Profile of {sum(len(d) for d in _timings.values())} spans saved to '{path}'.", file=sys.stderr)
+    except OSError as e:
+        print(f"Error writing profile '{path}': {e}", file=sys.stderr)
+
+
+_env = os.environ.get(PROFILE_ENV, '').strip()
+if _env and _env.lower() not in ('0', 'false', 'no'):
+    enable_profiling(None if _env.lower() in ('1', 'true', 'yes') else _env, os.environ.get(CPROFILE_ENV))
+elif os.environ.get(CPROFILE_ENV):
+    enable_profiling(cprofile_action=os.environ.get(CPROFILE_ENV))
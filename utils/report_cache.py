@@ -0,0 +1,126 @@
+import functools
+import threading
+from collections import OrderedDict
+
+
+# Maximum number of report results kept; the least recently used result is evicted first.
+REPORT_CACHE_SIZE = 128
+
+# Advanced whenever recorded sales or grocery items change; see bump_data_version.
+_data_version = 0
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A dictionary with a maximum size that evicts the least recently used entry.
+    A maximum size of 0 disables the cache. It can be shared by threads, e.g. the
+    searches and reports the server runs side by side.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Returns the value of a key and marks it as most recently used, or ``default`` if it is missing.
+        """
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return default
+            return self._entries[key]
+
+    def put(self, key, value):
+        """
+        Stores a value, evicting the least recently used entries beyond the maximum size.
+        """
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._entries.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_reports = LRUCache(REPORT_CACHE_SIZE)
+
+
+def data_version():
+    """
+    Returns the current data version.
+    """
+    return _data_version
+
+def bump_data_version():
+    """
+    Marks the in-memory sales and grocery data as changed, so that cached report results
+    computed from the old data are no longer used. Called when a sale is recorded and
+    when a grocery item is added or edited.
+    """
+    global _data_version
+    _data_version += 1
+
+def configure_report_cache(maxsize=None):
+    """
+    Changes the maximum number of cached report results and empties the cache.
+    Args:
+        maxsize (int, optional): The new maximum size; 0 disables caching. Defaults to REPORT_CACHE_SIZE.
+    """
+    _reports.maxsize = REPORT_CACHE_SIZE if maxsize is None else maxsize
+    _reports.clear()
+
+def clear_report_cache():
+    _reports.clear()
+
+def _key_part(value):
+    # Dates, months, IDs and options are compared by value; data sets by identity
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    # Data that other terminals can change, such as a database, also has a version of its own
+    version = getattr(value, 'data_version', None)
+    if version is not None:
+        return ('id', id(value), version())
+    return ('id', id(value))
+
+def cached_report(func):
+    """
+    Decorator caching the results of a report summary function.
+    Results are keyed on (report, arguments, data version). The transaction and grocery
+    data arguments are keyed by identity, together with the result of their data_version()
+    method if they have one; the cache entry keeps a reference to them, so
+    their identity cannot be reused by other data while the entry exists. Cached results
+    are shared between callers and must not be modified.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _reports.maxsize <= 0:
+            return func(*args, **kwargs)
+        key = (
+            func.__name__,
+            tuple(_key_part(arg) for arg in args),
+            tuple(sorted((name, _key_part(value)) for name, value in kwargs.items())),
+            _data_version,
+        )
+        entry = _reports.get(key, _MISSING)
+        if entry is not _MISSING:
+            return entry[1]
+        result = func(*args, **kwargs)
+        _reports.put(key, ((args, kwargs), result))
+        return result
+    return wrapper
@@ -0,0 +1,324 @@
+import argparse
+import contextlib
+import csv
+import json
+import shlex
+import sys
+from utils.date_normalization import month_label, month_start, parse_date, parse_month
+from utils.display_transactions import (WEEKDAY_NAMES, hourly_sales_summary, monthly_sales_summary,
+                                        product_sales_summary, top_products_summary, total_sales_summary)
+from utils.grocery_operations import load_grocery_data
+from utils.ingest_validation import check_grocery_references
+from utils.profiling import profiled
+from utils.search_transanctions import find_by_date, find_by_name, find_by_name_and_date, iter_file_by_date_range
+from utils.storage import SQLiteBackend, storage_backend
+from utils.transaction_compaction import read_offset_index
+from utils.transaction_operations import load_transaction_data
+from utils.transaction_partitions import is_partitioned
+from utils.transaction_stream import stream_monthly_totals, stream_product_totals
+
+
+TRANSACTION_COLUMNS = ['date', 'time', 'id', 'quantity', 'payment']
+MONTHLY_COLUMNS = ['month', 'value', 'stock', 'count']
+TOTAL_COLUMNS = ['id', 'name', 'value']
+HOURLY_COLUMNS = ['weekday', 'hour', 'value', 'stock', 'count']
+RANKING_COLUMNS = ['rank', 'id', 'name', 'value', 'quantity', 'count']
+
+
+def _transaction_rows(transactions):
+    return [
+        {'date': t['date'], 'time': t['time'], 'id': t['id'],
+         'quantity': int(t['quantity']), 'payment': round(float(t['payment']), 2)}
+        for t in transactions
+    ]
+
+def _monthly_rows(monthly_sales):
+    return [
+        {'month': month, 'value': round(sales['value'], 2), 'stock': sales['stock'], 'count': sales['count']}
+        for month, sales in sorted(monthly_sales.items())
+    ]
+
+def _streamed_months(totals, date_format="%Y-%m"):
+    # Same shape as monthly_sales_summary and product_sales_summary
+    return {month_label(month, date_format): {'value': cents / 100, 'stock': quantity, 'count': count}
+            for month, (cents, quantity, count) in totals.items()}
+
+def _search_date(groceries, transactions, date):
+    if isinstance(transactions, str):
+        return TRANSACTION_COLUMNS, _transaction_rows(iter_file_by_date_range(transactions, date, date))
+    return TRANSACTION_COLUMNS, _transaction_rows(find_by_date(transactions, date))
+
+def _search_name(groceries, transactions, name):
+    return TRANSACTION_COLUMNS, _transaction_rows(find_by_name(transactions, groceries, name))
+
+def _search_name_date(groceries, transactions, name, start_date, end_date):
+    if isinstance(transactions, str):
+        return TRANSACTION_COLUMNS, _transaction_rows(
+            iter_file_by_date_range(transactions, start_date, end_date, groceries, name))
+    return TRANSACTION_COLUMNS, _transaction_rows(
+        find_by_name_and_date(transactions, groceries, name, start_date, end_date))
+
+def _monthly(groceries, transactions, start_month, end_month):
+    if isinstance(transactions, str):
+        totals = stream_monthly_totals(transactions, parse_month(start_month), parse_month(end_month))
+        return MONTHLY_COLUMNS, _monthly_rows(_streamed_months(totals, "%y-%m"))
+    return MONTHLY_COLUMNS, _monthly_rows(monthly_sales_summary(transactions, start_month, end_month))
+
+def _product(groceries, transactions, grocery_id, start_month, end_month):
+    if grocery_id not in groceries:
+        raise ValueError(f"unknown grocery ID '{grocery_id}'")
+    if isinstance(transactions, str):
+        totals = stream_monthly_totals(transactions, parse_month(start_month), parse_month(end_month), int(grocery_id))
+        return MONTHLY_COLUMNS, _monthly_rows(_streamed_months(totals))
+    return MONTHLY_COLUMNS, _monthly_rows(product_sales_summary(transactions, grocery_id, start_month, end_month))
+
+def _total(groceries, transactions, start_date, end_date):
+    if isinstance(transactions, str):
+        cells = stream_product_totals(transactions, parse_date(start_date), parse_date(end_date))
+        totals = {str(grocery_id): cents / 100 for grocery_id, (cents, _, _) in cells.items()
+                  if str(grocery_id) in groceries}
+    else:
+        totals = total_sales_summary(transactions, groceries, start_date, end_date)
+    rows = [
+        {'id': grocery_id, 'name': groceries[grocery_id]['name'], 'value': round(value, 2)}
+        for grocery_id, value in sorted(totals.items(), key=lambda x: x[1], reverse=True)
+    ]
+    return TOTAL_COLUMNS, rows
+
+def _hourly(groceries, transactions, start_date, end_date):
+    hourly_sales = hourly_sales_summary(transactions, start_date, end_date)
+    rows = [
+        {'weekday': WEEKDAY_NAMES[day], 'hour': hour, 'value': round(hourly_sales['value'][day][hour], 2),
+         'stock': hourly_sales['stock'][day][hour], 'count': hourly_sales['count'][day][hour]}
+        for day in range(7) for hour in range(24)
+        if hourly_sales['count'][day][hour]
+    ]
+    return HOURLY_COLUMNS, rows
+
+def _ranking(groceries, transactions, metric, limit, start_date, end_date, bottom=False):
+    ranking = top_products_summary(transactions, groceries, start_date, end_date, metric, limit, bottom)
+    rows = [dict(item, rank=rank, value=round(item['value'], 2)) for rank, item in enumerate(ranking, start=1)]
+    return RANKING_COLUMNS, rows
+
+def _top(groceries, transactions, metric, limit, start_date, end_date):
+    return _ranking(groceries, transactions, metric, limit, start_date, end_date)
+
+def _bottom(groceries, transactions, metric, limit, start_date, end_date):
+    return _ranking(groceries, transactions, metric, limit, start_date, end_date, bottom=True)
+
+
+# Report name -> (argument names, handler)
+REPORTS = {
+    'search-date': (['DATE'], _search_date),
+    'search-name': (['NAME'], _search_name),
+    'search-name-date': (['NAME', 'START_DATE', 'END_DATE'], _search_name_date),
+    'monthly': (['START_MONTH', 'END_MONTH'], _monthly),
+    'product': (['GROCERY_ID', 'START_MONTH', 'END_MONTH'], _product),
+    'total': (['START_DATE', 'END_DATE'], _total),
+    'hourly': (['START_DATE', 'END_DATE'], _hourly),
+    'top': (['METRIC', 'N', 'START_DATE', 'END_DATE'], _top),
+    'bottom': (['METRIC', 'N', 'START_DATE', 'END_DATE'], _bottom),
+}
+# Reports that can be answered straight from a compacted transaction file without loading it.
+FILE_REPORTS = {'search-date', 'search-name-date'}
+# Reports that can be answered by streaming the transaction file once per query; see --stream.
+STREAM_REPORTS = FILE_REPORTS | {'monthly', 'product', 'total'}
+
+
+def _query_date_range(query):
+    """
+    Returns the (first, last) day ordinals a query reads, or None if it reads every date
+    (or cannot be parsed, in which case run_query reports the error).
+    """
+    try:
+        parts = shlex.split(query)
+        arg_names, _ = REPORTS[parts[0]]
+        args = dict(zip(arg_names, parts[1:]))
+        if 'DATE' in args:
+            return parse_date(args['DATE']), parse_date(args['DATE'])
+        if 'START_DATE' in args:
+            return parse_date(args['START_DATE']), parse_date(args['END_DATE'])
+        if 'START_MONTH' in args:
+            return month_start(parse_month(args['START_MONTH'])), month_start(parse_month(args['END_MONTH']) + 1) - 1
+    except (ValueError, KeyError, IndexError):
+        pass
+    return None
+
+def queries_date_range(queries):
+    """
+    Returns the (first, last) day ordinals covering every query, with None for an open
+    end. A partitioned transaction directory then only has to load the overlapping months.
+    """
+    ranges = [_query_date_range(query) for query in queries]
+    if not ranges or None in ranges:
+        return None, None
+    return min(start for start, _ in ranges), max(end for _, end in ranges)
+
+def _searchable_on_disk(transaction_file, queries):
+    """
+    Returns True if every query is a date search and the transaction data is a compacted
+    file, a partition directory or a database, so the queries can be answered without loading it.
+    """
+    if not all(query.split()[:1] and query.split()[0] in FILE_REPORTS for query in queries):
+        return False
+    return (is_partitioned(transaction_file) or isinstance(storage_backend(transaction_file), SQLiteBackend)
+            or read_offset_index(transaction_file) is not None)
+
+@profiled
+def run_query(query, groceries, transactions):
+    """
+    Runs one report query against loaded data.
+    Args:
+        query (str): The report name followed by its arguments, e.g. "monthly 02/2024 10/2024".
+            Arguments containing spaces can be quoted.
+        groceries (dict): The grocery data.
+        transactions (TransactionStore or list of dict): The transaction data. For the
+            STREAM_REPORTS, this can instead be the path of the transaction file to read.
+    Returns:
+        dict: {'query', 'report', 'columns', 'rows'} on success, or {'query', 'error'} on failure.
+    """
+    try:
+        parts = shlex.split(query)
+    except ValueError as e:
+        return {'query': query, 'error': f"could not parse query: {e}"}
+    if not parts or parts[0] not in REPORTS:
+        return {'query': query, 'error': f"unknown report; expected one of: {', '.join(REPORTS)}"}
+
+    report, args = parts[0], parts[1:]
+    arg_names, handler = REPORTS[report]
+    if len(args) != len(arg_names):
+        return {'query': query, 'error': f"usage: {report} {' '.join(arg_names)}"}
+
+    try:
+        columns, rows = handler(groceries, transactions, *args)
+    except ValueError as e:
+        return {'query': query, 'error': f"invalid input: {e}"}
+    return {'query': query, 'report': report, 'columns': columns, 'rows': rows}
+
+def write_json(results, output):
+    json.dump({'results': results}, output, indent=2)
+    output.write('\n')
+
+def write_csv(results, output):
+    """
+    Writes successful results as CSV, with the query as the first column. A header row is
+    written before the first result and again whenever the columns change.
+    """
+    writer = csv.writer(output)
+    header = None
+    for result in results:
+        if 'error' in result:
+            continue
+        if result['columns'] != header:
+            header = result['columns']
+            writer.writerow(['query'] + header)
+        for row in result['rows']:
+            writer.writerow([result['query']] + [row[column] for column in header])
+
+def _cell(value):
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+def write_table(results, output):
+    for result in results:
+        output.write(f"\n== {result['query']} ==\n")
+        if 'error' in result:
+            output.write(f"Error: {result['error']}\n")
+            continue
+        if not result['rows']:
+            output.write("No matching results.\n")
+            continue
+        widths = [
+            max(len(column), *(len(_cell(row[column])) for row in result['rows'])) + 2
+            for column in result['columns']
+        ]
+        output.write(''.join(f"{column.capitalize():<{width}}" for column, width in zip(result['columns'], widths)).rstrip() + '\n')
+        output.write('-' * sum(widths) + '\n')
+        for row in result['rows']:
+            output.write(''.join(f"{_cell(row[column]):<{width}}" for column, width in zip(result['columns'], widths)).rstrip() + '\n')
+
+WRITERS = {'json': write_json, 'csv': write_csv, 'table': write_table}
+
+
+def _build_parser():
+    reports = '\n'.join(f"  {name} {' '.join(args)}" for name, (args, _) in REPORTS.items())
+    parser = argparse.ArgumentParser(
+        prog='grocery_store.py report',
+        description="Run search and sales reports without the interactive menu.",
+        epilog=f"Queries (quote each one):\n{reports}\n\n"
+               "Example:\n  grocery_store.py report groceries.csv transactions.csv "
+               "\"search-name milk\" \"monthly 02/2024 10/2024\" --format json",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('grocery_file', help="path to the grocery CSV file")
+    parser.add_argument('transaction_file', help="path to the transaction CSV file or partition directory")
+    parser.add_argument('queries', nargs='*', metavar='QUERY', help="a report name followed by its arguments")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="read additional queries from FILE, one per line ('-' for standard input)")
+    parser.add_argument('--format', choices=sorted(WRITERS), default='table', help="output format (default: table)")
+    parser.add_argument('--output', metavar='FILE', help="write the results to FILE instead of standard output")
+    parser.add_argument('--stream', action='store_true',
+                        help="read the transaction data once per query instead of loading it, which keeps memory "
+                             f"use flat for very large files; only for {', '.join(sorted(STREAM_REPORTS))}")
+    return parser
+
+def _read_batch(batch_file):
+    if batch_file == '-':
+        lines = sys.stdin.readlines()
+    else:
+        with open(batch_file, mode='r') as file:
+            lines = file.readlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith('#')]
+
+def run_report_cli(argv):
+    """
+    Entry point of the non-interactive report mode.
+    The data files are loaded once and every query is answered from them. Diagnostics are
+    written to standard error so that standard output only carries the results.
+    Args:
+        argv (list of str): The command line arguments after 'report'.
+    Returns:
+        int: The exit status: 0 if every query succeeded, 1 if any failed, 2 on usage errors.
+    """
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    queries = list(args.queries)
+    if args.batch:
+        try:
+            queries.extend(_read_batch(args.batch))
+        except OSError as e:
+            parser.error(f"cannot read batch file: {e}")
+    if not queries:
+        parser.error("no queries given")
+    if args.stream:
+        unsupported = sorted({query.split()[0] for query in queries if query.split()[:1]} - STREAM_REPORTS)
+        if unsupported:
+            parser.error(f"--stream does not support: {', '.join(unsupported)}")
+
+    with contextlib.redirect_stdout(sys.stderr):
+        groceries = load_grocery_data(args.grocery_file, snapshot=True)
+        if args.stream or _searchable_on_disk(args.transaction_file, queries):
+            # Read each query's date range from disk instead of loading the history
+            results = [run_query(query, groceries, args.transaction_file) for query in queries]
+        else:
+            start_ordinal, end_ordinal = queries_date_range(queries)
+            transactions = load_transaction_data(args.transaction_file, snapshot=True,
+                                                 start_ordinal=start_ordinal, end_ordinal=end_ordinal)
+            check_grocery_references(transactions, groceries)
+            results = [run_query(query, groceries, transactions) for query in queries]
+
+    for result in results:
+        if 'error' in result:
+            print(f"Error in query '{result['query']}': {result['error']}", file=sys.stderr)
+
+    try:
+        if args.output:
+            with open(args.output, mode='w', newline='') as output:
+                WRITERS[args.format](results, output)
+        else:
+            WRITERS[args.format](results, sys.stdout)
+    except OSError as e:
+        print(f"Error writing results: {e}", file=sys.stderr)
+        return 1
+
+    return 1 if any('error' in result for result in results) else 0
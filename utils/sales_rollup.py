@@ -0,0 +1,175 @@
+from bisect import bisect_left, bisect_right, insort
+from utils.date_normalization import month_index, month_start
+from utils.profiling import profiled
+
+
+class SalesRollup:
+    """
+    Pre-aggregated sales totals keyed by (period, grocery ID).
+    Two levels are kept:
+        - daily: day ordinal -> {grocery ID: [value in cents, quantity, count]}
+        - monthly: month index -> {grocery ID: [value in cents, quantity, count]}
+    together with the sorted list of days and months present, and the sales of every day
+    by hour of day for the hourly report:
+        - hourly: day ordinal -> {hour: [value in cents, quantity, count]}
+    Reports read the cells
+    that overlap their range, so their cost depends on the number of periods and
+    products in the range rather than the number of transactions.
+    """
+
+    def __init__(self):
+        self.daily = {}
+        self.monthly = {}
+        self.hourly = {}
+        self.days = []
+        self.months = []
+
+    def add(self, ordinal, grocery_id, quantity, cents, seconds):
+        """
+        Adds one transaction to the rollup.
+        Args:
+            ordinal (int): The day ordinal of the transaction.
+            grocery_id (int): The grocery ID of the transaction.
+            quantity (int): The quantity sold.
+            cents (int): The payment in cents.
+            seconds (int): The time of the transaction in seconds since midnight.
+        """
+        month = month_index(ordinal)
+        hours = self.hourly.setdefault(ordinal, {})
+        cell = hours.get(seconds // 3600)
+        if cell is None:
+            hours[seconds // 3600] = [cents, quantity, 1]
+        else:
+            cell[0] += cents
+            cell[1] += quantity
+            cell[2] += 1
+
+        for period, cells, periods in ((ordinal, self.daily, self.days), (month, self.monthly, self.months)):
+            products = cells.get(period)
+            if products is None:
+                products = cells[period] = {}
+                if not periods or period > periods[-1]:
+                    periods.append(period)
+                else:
+                    insort(periods, period)
+            cell = products.get(grocery_id)
+            if cell is None:
+                products[grocery_id] = [cents, quantity, 1]
+            else:
+                cell[0] += cents
+                cell[1] += quantity
+                cell[2] += 1
+
+    def monthly_totals(self, start_month, end_month, grocery_id=None):
+        """
+        Returns the sales of each month in a range of months.
+        Args:
+            start_month (int): The first month index of the range, inclusive.
+            end_month (int): The last month index of the range, inclusive.
+            grocery_id (int, optional): Only count the sales of this grocery. Defaults to all groceries.
+        Returns:
+            dict: Month index -> [value in cents, quantity, count], for months with sales.
+        """
+        totals = {}
+        lo = bisect_left(self.months, start_month)
+        hi = bisect_right(self.months, end_month)
+        for month in self.months[lo:hi]:
+            products = self.monthly[month]
+            if grocery_id is not None:
+                cell = products.get(grocery_id)
+                if cell is not None:
+                    totals[month] = list(cell)
+                continue
+            total = [0, 0, 0]
+            for cell in products.values():
+                total[0] += cell[0]
+                total[1] += cell[1]
+                total[2] += cell[2]
+            totals[month] = total
+        return totals
+
+    def product_totals(self, start_ordinal, end_ordinal):
+        """
+        Returns the sales of each grocery between two days, both inclusive.
+        Whole months inside the range are read from the monthly cells and only the
+        partial months at either end from the daily cells.
+        Args:
+            start_ordinal (int): The first day ordinal of the range.
+            end_ordinal (int): The last day ordinal of the range.
+        Returns:
+            dict: Grocery ID -> [value in cents, quantity, count], for groceries with sales.
+        """
+        totals = {}
+        if start_ordinal > end_ordinal:
+            return totals
+
+        first_full = month_index(start_ordinal)
+        if month_start(first_full) != start_ordinal:
+            first_full += 1
+        last_full = month_index(end_ordinal)
+        if month_start(last_full + 1) - 1 != end_ordinal:
+            last_full -= 1
+
+        if first_full <= last_full:
+            lo = bisect_left(self.months, first_full)
+            hi = bisect_right(self.months, last_full)
+            for month in self.months[lo:hi]:
+                _merge_cells(totals, self.monthly[month])
+            day_ranges = ((start_ordinal, month_start(first_full) - 1), (month_start(last_full + 1), end_ordinal))
+        else:
+            day_ranges = ((start_ordinal, end_ordinal),)
+
+        for first_day, last_day in day_ranges:
+            lo = bisect_left(self.days, first_day)
+            hi = bisect_right(self.days, last_day)
+            for day in self.days[lo:hi]:
+                _merge_cells(totals, self.daily[day])
+        return totals
+
+    def hourly_totals(self, start_ordinal, end_ordinal):
+        """
+        Returns the sales between two days, both inclusive, by weekday and hour of day.
+        Args:
+            start_ordinal (int): The first day ordinal of the range.
+            end_ordinal (int): The last day ordinal of the range.
+        Returns:
+            dict: (weekday, hour) -> [value in cents, quantity, count], with Monday as
+                weekday 0, for the hours with sales.
+        """
+        totals = {}
+        lo = bisect_left(self.days, start_ordinal)
+        hi = bisect_right(self.days, end_ordinal)
+        for day in self.days[lo:hi]:
+            # Day ordinal 1 (1 January of year 1) is a Monday
+            weekday = (day - 1) % 7
+            for hour, cell in self.hourly[day].items():
+                total = totals.get((weekday, hour))
+                if total is None:
+                    totals[weekday, hour] = list(cell)
+                else:
+                    total[0] += cell[0]
+                    total[1] += cell[1]
+                    total[2] += cell[2]
+        return totals
+
+
+def _merge_cells(totals, products):
+    for grocery_id, cell in products.items():
+        total = totals.get(grocery_id)
+        if total is None:
+            totals[grocery_id] = list(cell)
+        else:
+            total[0] += cell[0]
+            total[1] += cell[1]
+            total[2] += cell[2]
+
+@profiled
+def build_sales_rollup(store):
+    """
+    Builds a SalesRollup over every row of a TransactionStore.
+    """
+    rollup = SalesRollup()
+    for ordinal, grocery_id, quantity, cents, seconds in zip(store.dates, store.ids, store.quantities,
+                                                             store.payments, store.times):
+        rollup.add(ordinal, grocery_id, quantity, cents, seconds)
+    return rollup
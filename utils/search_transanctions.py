@@ -1,78 +1,301 @@
-from datetime import datetime
+import heapq
+import itertools
+import sys
+from utils.date_normalization import format_date, format_time, parse_date
+from utils.name_index import CANDIDATE_LIMIT, NameIndex
+from utils.profiling import profiled
+from utils.transaction_store import as_transaction_store
+from utils.transaction_stream import filter_date_range, filter_grocery_ids, iter_transactions
 
 
-def display_transactions(transactions):
+# Number of transactions per page when paging in a terminal.
+PAGE_SIZE = 20
+# Number of transactions formatted per write when not paging.
+WRITE_CHUNK_ROWS = 1000
+
+
+def _format_rows(rows):
+    return ''.join(
+        f"{t['date']:<15} {t['time']:<15} {t['id']:<10} {t['quantity']:<10} {float(t['payment']):<10.2f}\n"
+        for t in rows
+    )
+
+def _pager_command(page_number, has_more):
     """
-    Display a list of transactions in a formatted table.
-    Parameters:
-    transactions (list of dict): A list of dictionaries where each dictionary represents a transaction.
-        Each dictionary should have the following keys:
-        - 'date' (str): The date of the transaction.
-        - 'time' (str): The time of the transaction.
-        - 'id' (str): The transaction ID.
-        - 'quantity' (str): The quantity of items in the transaction.
-        - 'payment' (str): The payment amount for the transaction.
+    Prompts for the next pager command.
     Returns:
-    None
-    Prints:
-    A formatted table of transactions. If the payment value is not a valid number, an error message is printed.
-    If no transactions are provided, a message indicating no matching transactions is printed.
-    """
-    
-    if not transactions:
-        print("\nNo matching transactions found.\n")
-        return
-    
-    print(f"\n\n{'Date':<15} {'Time':<15} {'ID':<10} {'Quantity':<10} {'Payment':<10}")
-    print('-' * 61)
-
-    for i, t in enumerate(transactions):
-        try:
-            # Check for missing keys
-            required_keys = ['date', 'time', 'id', 'quantity', 'payment']
-            for key in required_keys:
-                if key not in t:
-                    raise KeyError(f"Transaction {i + 1} is missing the key '{key}'.")
-
-            # Check types of specific fields
-            if not isinstance(t['quantity'], (int, str)) or not isinstance(t['payment'], (float, int, str)):
-                raise TypeError(f"Transaction {i + 1} has invalid types for 'quantity' or 'payment'.")
-            
-            # Convert payment to float for formatting
-            payment = float(t['payment'])
-            print(f"{t['date']:<15} {t['time']:<15} {t['id']:<10} {t['quantity']:<10} {payment:<10.2f}")
-        
-        except KeyError as e:
-            print(f"\nError: {e}. Transaction skipped.")
-        
-        except ValueError:
-            print(f"\nError: Payment value '{t.get('payment')}' in transaction {i + 1} is not a valid number.")
-        
-        except TypeError as e:
-            print(f"\nError: {e}. Transaction skipped.")
-    
-    print('\n')
-
-
-
-def search_by_date(transactions, date):
-    """
-    Searches transactions by date and returns a list of transactions on that date.
+        int or None: The index of the page to show next, or None to stop.
+    """
+    while True:
+        choice = input(f"Page {page_number + 1}{'' if has_more else ' (last)'} - "
+                       "[Enter/n] next, [p] previous, [page number] jump, [q] quit: ").strip().lower()
+        if choice in ('', 'n'):
+            if has_more:
+                return page_number + 1
+            return None
+        if choice == 'p':
+            return max(page_number - 1, 0)
+        if choice == 'q':
+            return None
+        if choice.isdigit() and int(choice) >= 1:
+            return int(choice) - 1
+        print("Invalid command. Please try again.")
+
+def display_transactions(transactions, limit=None, page_size=PAGE_SIZE, interactive=None,
+                         empty_message="\nNo matching transactions found.\n"):
+    """
+    Displays transactions in a formatted table.
+    Rows are pulled from ``transactions`` only as they are needed, so the first page of a
+    lazy search appears without waiting for every match. Output is written in buffered
+    chunks rather than one print per row. In a terminal the table is shown one page at a
+    time with next, previous, jump and quit commands; otherwise it is written straight
+    through without prompts.
+    Args:
+        transactions (iterable of dict): Transactions with 'date', 'time', 'id', 'quantity'
+            and 'payment' keys, e.g. from the iter_by_* functions.
+        limit (int, optional): The maximum number of transactions to show. Defaults to no limit.
+        page_size (int, optional): The number of transactions per page. Defaults to PAGE_SIZE.
+        interactive (bool, optional): Whether to page. Defaults to True when both standard input
+            and standard output are terminals.
+        empty_message (str, optional): Printed when there are no transactions.
+    Returns:
+        int: The number of transactions fetched.
+    """
+    rows = iter(transactions)
+    if limit is not None:
+        rows = itertools.islice(rows, int(limit))
+    if interactive is None:
+        interactive = sys.stdin.isatty() and sys.stdout.isatty()
+    page_size = max(int(page_size), 1)
+
+    header = f"\n\n{'Date':<15} {'Time':<15} {'ID':<10} {'Quantity':<10} {'Payment':<10}\n{'-' * 61}\n"
+    # Rows fetched so far, kept so earlier pages can be shown again
+    fetched = list(itertools.islice(rows, page_size + 1 if interactive else WRITE_CHUNK_ROWS))
+    if not fetched:
+        print(empty_message)
+        return 0
+
+    if not interactive:
+        count = 0
+        sys.stdout.write(header)
+        while fetched:
+            count += len(fetched)
+            sys.stdout.write(_format_rows(fetched))
+            fetched = list(itertools.islice(rows, WRITE_CHUNK_ROWS))
+        sys.stdout.write('\n\n')
+        return count
+
+    exhausted = False
+    page_number = 0
+    while page_number is not None:
+        # Fetch up to one row past the page, to know whether there is a next page
+        wanted = (page_number + 1) * page_size + 1
+        if not exhausted and len(fetched) < wanted:
+            fetched.extend(itertools.islice(rows, wanted - len(fetched)))
+            exhausted = len(fetched) < wanted
+        last_page = max((len(fetched) - 1) // page_size, 0)
+        page_number = min(page_number, last_page)
+        page = fetched[page_number * page_size:(page_number + 1) * page_size]
+        sys.stdout.write(header + _format_rows(page) + '\n')
+        sys.stdout.flush()
+        page_number = _pager_command(page_number, len(fetched) > (page_number + 1) * page_size)
+    print()
+    return len(fetched)
+
+def _matching_grocery_ids(groceries, name):
+    """
+    Resolves a grocery name or partial name to the set of matching grocery IDs.
+    Args:
+        groceries (dict): Dictionary with grocery IDs as keys and grocery info as values.
+        name (str): The grocery name or partial name to search for.
+    Returns:
+        set of int: The IDs of every grocery whose name contains ``name`` (case-insensitive).
+    """
+    # Grocery IDs and names were validated when the grocery data was loaded
+    index = getattr(groceries, 'name_index', None)
+    if index is not None:
+        return {int(grocery_id) for grocery_id in index.containing(name)}
+    name = name.lower()
+    return {int(grocery_id) for grocery_id, grocery_info in groceries.items() if name in grocery_info['name'].lower()}
+
+def suggest_grocery_names(groceries, name, limit=CANDIDATE_LIMIT):
+    """
+    Ranks the grocery items whose names are closest to a possibly misspelt name.
     Args:
-        transactions (list of dict): List of transaction records.
+        groceries (dict): Dictionary with grocery IDs as keys and grocery info as values. The
+            name index of a GroceryCatalog is used; other dictionaries are indexed on the fly.
+        name (str): The grocery name as typed, e.g. "tomatoe".
+        limit (int, optional): The maximum number of candidates. Defaults to CANDIDATE_LIMIT.
+    Returns:
+        list of tuple: (grocery ID, similarity between 0 and 1), most similar first.
+    """
+    index = getattr(groceries, 'name_index', None)
+    if index is None:
+        index = NameIndex(groceries)
+    return index.candidates(name, limit)
+
+def _resolve_name(groceries, name):
+    """
+    Resolves a name typed by the user to the groceries to search for.
+    Returns:
+        tuple: (name, set of int). ``name`` itself and the IDs of the groceries whose name
+            contains it if there are any; otherwise the name and ID of the closest grocery
+            item only, after telling the user about the correction.
+    """
+    matching_ids = _matching_grocery_ids(groceries, name)
+    if matching_ids:
+        return name, matching_ids
+    candidates = suggest_grocery_names(groceries, name)
+    if not candidates:
+        return name, matching_ids
+    best = groceries[candidates[0][0]]['name']
+    print(f"\nNo grocery name contains '{name}'. Showing results for the closest match, '{best}'.")
+    if len(candidates) > 1:
+        others = ', '.join(f"{groceries[grocery_id]['name']} (ID {grocery_id})" for grocery_id, _ in candidates[1:])
+        print(f"Other close matches: {others}")
+    # The best match alone, not every name containing it ("Milk" is also in "Almond Milk")
+    return best, {int(candidates[0][0])}
+
+def _product_positions(store, grocery_ids, start_ordinal=None, end_ordinal=None):
+    """
+    Merges the row positions of the sales of several groceries from the product index.
+    Args:
+        store (TransactionStore): The indexed transaction store.
+        grocery_ids (iterable of int): The grocery IDs to collect.
+        start_ordinal (int, optional): The first day ordinal of the range, inclusive.
+        end_ordinal (int, optional): The last day ordinal of the range, inclusive.
+    Returns:
+        iterator of int: The row positions of every matching sale, lazily merged into date order.
+    """
+    postings = [
+        store.product_index.positions_for(grocery_id, start_ordinal, end_ordinal)
+        for grocery_id in grocery_ids
+    ]
+    dates = store.dates
+    return heapq.merge(*postings, key=lambda position: (dates[position], position))
+
+def iter_by_date(transactions, date):
+    """
+    Lazily finds the transactions on a date.
+    Args:
+        transactions (TransactionStore or list of dict): Transaction records.
         date (str): The date to search for in 'dd/mm/yyyy' format.
+    Returns:
+        iterator of dict: The matching transactions, built as they are read.
+    Raises:
+        ValueError: If the date is not in 'dd/mm/yyyy' format.
     """
-    try:
-        datetime.strptime(date, "%d/%m/%Y")
+    ordinal = parse_date(date)
+    store = as_transaction_store(transactions)
+    return store.rows(store.date_index.positions_on(ordinal))
+
+def iter_by_name(transactions, groceries, name, grocery_ids=None):
+    """
+    Lazily finds the transactions of every grocery whose name contains a search string.
+    Args:
+        transactions (TransactionStore or list of dict): Transaction records.
+        groceries (dict): Dictionary with grocery IDs as keys and grocery info as values.
+        name (str): The grocery name or partial name to search for.
+        grocery_ids (set of int, optional): The grocery IDs to find instead, e.g. of a name
+            that was already resolved.
+    Returns:
+        iterator of dict: The matching transactions in date order, built as they are read.
+    """
+    matching_ids = _matching_grocery_ids(groceries, name) if grocery_ids is None else grocery_ids
+    store = as_transaction_store(transactions)
+    return store.rows(_product_positions(store, matching_ids))
+
+def iter_by_name_and_date(transactions, groceries, name, start_date, end_date, grocery_ids=None):
+    """
+    Lazily finds the transactions of every grocery whose name contains a search string within a date range.
+    Args:
+        transactions (TransactionStore or list of dict): Transaction records.
+        groceries (dict): Dictionary with grocery IDs as keys and grocery info as values.
+        name (str): The grocery name or partial name to search for.
+        start_date (str): Start date in DD/MM/YYYY format.
+        end_date (str): End date in DD/MM/YYYY format.
+        grocery_ids (set of int, optional): The grocery IDs to find instead, e.g. of a name
+            that was already resolved.
+    Returns:
+        iterator of dict: The matching transactions in date order, built as they are read.
+    Raises:
+        ValueError: If a date is not in DD/MM/YYYY format.
+    """
+    start_ordinal = parse_date(start_date)
+    end_ordinal = parse_date(end_date)
+    matching_ids = _matching_grocery_ids(groceries, name) if grocery_ids is None else grocery_ids
+    store = as_transaction_store(transactions)
+    return store.rows(_product_positions(store, matching_ids, start_ordinal, end_ordinal))
+
+def iter_file_by_date_range(transaction_file, start_date, end_date, groceries=None, name=None):
+    """
+    Lazily finds the transactions between two dates, both inclusive, straight from a
+    transaction file, without loading it. Files compacted with compact_transaction_file
+    are memory-mapped and bisected to the range through their offset index; other files
+    and partitions are streamed.
+    Args:
+        transaction_file (str): The path to the transaction CSV file or partition directory.
+        start_date (str): Start date in DD/MM/YYYY format.
+        end_date (str): End date in DD/MM/YYYY format.
+        groceries (dict, optional): The grocery data, needed to search by name.
+        name (str, optional): Only find the transactions of groceries whose name contains this.
+    Returns:
+        iterator of dict: The matching transactions, as returned by TransactionStore.row.
+    Raises:
+        ValueError: If a date is not in DD/MM/YYYY format.
+    """
+    start_ordinal = parse_date(start_date)
+    end_ordinal = parse_date(end_date)
+    records = filter_date_range(iter_transactions(transaction_file, start_ordinal, end_ordinal),
+                                start_ordinal, end_ordinal)
+    if name is not None:
+        records = filter_grocery_ids(records, _matching_grocery_ids(groceries, name))
+    return (
+        {'date': format_date(r.date), 'time': format_time(r.time), 'id': str(r.id),
+         'quantity': r.quantity, 'payment': r.payment / 100}
+        for r in records
+    )
+
+@profiled
+def find_by_date(transactions, date):
+    """
+    Finds the transactions on a date.
+    Returns:
+        list of dict: The matching transactions. See iter_by_date.
+    """
+    return list(iter_by_date(transactions, date))
 
-        matching_transactions = [
-            t for t in transactions if t.get('date') == date
-        ]
+@profiled
+def find_by_name(transactions, groceries, name):
+    """
+    Finds the transactions of every grocery whose name contains a search string.
+    Returns:
+        list of dict: The matching transactions in date order. See iter_by_name.
+    """
+    return list(iter_by_name(transactions, groceries, name))
 
-        if matching_transactions:
-            display_transactions(matching_transactions)
-        else:
-            print(f"\nNo transactions found for the date: {date}")
+@profiled
+def find_by_name_and_date(transactions, groceries, name, start_date, end_date):
+    """
+    Finds the transactions of every grocery whose name contains a search string within a date range.
+    Returns:
+        list of dict: The matching transactions in date order. See iter_by_name_and_date.
+    """
+    return list(iter_by_name_and_date(transactions, groceries, name, start_date, end_date))
+
+@profiled
+def search_by_date(transactions, date, limit=None):
+    """
+    Searches transactions by date and displays the transactions on that date.
+    Args:
+        transactions (TransactionStore or list of dict): Transaction records.
+        date (str): The date to search for in 'dd/mm/yyyy' format.
+        limit (int, optional): The maximum number of transactions to show. Defaults to no limit.
+    """
+    try:
+        matching_transactions = iter_by_date(transactions, date)
+        display_transactions(matching_transactions, limit,
+                             empty_message=f"\nNo transactions found for the date: {date}")
 
     except ValueError as ve:
         print(f"\nError: Invalid date format. Please use 'dd/mm/yyyy'. Details: {ve}")
@@ -83,24 +306,22 @@ def search_by_date(transactions, date):
     except Exception as e:
         print(f"\nAn unexpected error occurred: {e}")
 
-def search_by_name(transactions, groceries, name):
+@profiled
+def search_by_name(transactions, groceries, name, limit=None):
     """
-    Searches transactions by grocery name and returns a list of matching transactions.
+    Searches transactions by grocery name and displays the matching transactions.
     Args:
-        transactions (list of dict): List of transaction records.
+        transactions (TransactionStore or list of dict): Transaction records.
         groceries (dict): Dictionary with grocery IDs as keys and grocery info as values.
-        name (str): The grocery name or partial name to search for.
+        name (str): The grocery name or partial name to search for. If no grocery name
+            contains it, e.g. because it is misspelt, the closest grocery item is searched.
+        limit (int, optional): The maximum number of transactions to show. Defaults to no limit.
     """
     try:
-        matching_transactions = [
-            t for t in transactions
-            if t.get('id') in groceries and name.lower() in groceries[t['id']].get('name', '').lower()
-        ]
-
-        if matching_transactions:
-            display_transactions(matching_transactions)
-        else:
-            print(f"\nNo transactions found for grocery name containing: '{name}'")
+        name, grocery_ids = _resolve_name(groceries, name)
+        matching_transactions = iter_by_name(transactions, groceries, name, grocery_ids)
+        display_transactions(matching_transactions, limit,
+                             empty_message=f"\nNo transactions found for grocery name containing: '{name}'")
 
     except KeyError as ke:
         print(f"\nError: Missing expected field in transaction or grocery data. Details: {ke}")
@@ -108,48 +329,29 @@ def search_by_name(transactions, groceries, name):
     except Exception as e:
         print(f"\nAn unexpected error occurred: {e}")
 
-from datetime import datetime
-
-def search_by_name_and_date(transactions, groceries, name, start_date, end_date):
+@profiled
+def search_by_name_and_date(transactions, groceries, name, start_date, end_date, limit=None):
     """
-    Searches transactions by grocery name and date range, and returns a list of matching transactions.
+    Searches transactions by grocery name and date range, and displays the matching transactions.
     Args:
-        transactions (list of dict): List of transaction records.
+        transactions (TransactionStore or list of dict): Transaction records.
         groceries (dict): Dictionary with grocery IDs as keys and grocery info as values.
-        name (str): The grocery name or partial name to search for.
+        name (str): The grocery name or partial name to search for. If no grocery name
+            contains it, e.g. because it is misspelt, the closest grocery name is searched.
         start_date (str): Start date in DD/MM/YYYY format.
         end_date (str): End date in DD/MM/YYYY format.
+        limit (int, optional): The maximum number of transactions to show. Defaults to no limit.
     """
     try:
-        start_date = datetime.strptime(start_date, "%d/%m/%Y")
-        end_date = datetime.strptime(end_date, "%d/%m/%Y")
+        name, grocery_ids = _resolve_name(groceries, name)
+        matching_transactions = iter_by_name_and_date(transactions, groceries, name, start_date, end_date, grocery_ids)
     except ValueError:
         print("\nError: Incorrect date format. Please use DD/MM/YYYY.")
         return
+    except Exception as e:
+        print(f"\nAn unexpected error occurred: {e}")
+        return
 
-    matching_transactions = []
-    for t in transactions:
-        try:
-            transaction_date = datetime.strptime(t.get('date', ''), "%d/%m/%Y")
-            
-            if (
-                t.get('id') in groceries and
-                name.lower() in groceries[t['id']].get('name', '').lower() and
-                start_date <= transaction_date <= end_date
-            ):
-                matching_transactions.append(t)
-        
-        except ValueError:
-            print(f"\nError: Incorrect date format in transaction {t.get('id', 'unknown')}. Skipping this transaction.")
-            continue
-        except KeyError as ke:
-            print(f"\nError: Missing expected field ({ke}) in transaction or grocery data. Skipping transaction {t.get('id', 'unknown')}.")
-            continue
-        except Exception as e:
-            print(f"\nAn unexpected error occurred while processing transaction {t.get('id', 'unknown')}: {e}")
-            continue
-
-    if matching_transactions:
-        display_transactions(matching_transactions)
-    else:
-        print(f"\nNo transactions found for grocery name containing '{name}' within the specified date range.")
+    display_transactions(
+        matching_transactions, limit,
+        empty_message=f"\nNo transactions found for grocery name containing '{name}' within the specified date range.")
@@ -0,0 +1,296 @@
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from utils.ingest_validation import InvalidRecord, Quarantine
+from utils.profiling import profiled
+from utils.transaction_store import TransactionStore
+
+
+SNAPSHOT_SUFFIX = '.snapshot'
+SNAPSHOT_MAGIC = b'GSMSNAP\x01'
+SNAPSHOT_VERSION = 1
+# Size of the blocks the parsed part of a source file is read in to hash it.
+HASH_BLOCK_SIZE = 1 << 20
+
+_HEADER = struct.Struct('<8sQ')
+_COLUMN_NAMES = ['dates', 'times', 'ids', 'quantities', 'payments']
+# Transaction file -> {'size', 'mtime_ns', 'offset', 'digest'}: the hash state of the part
+# of the file parsed into its snapshot, and the state of the file it is known to be valid for.
+# Appends made by this process keep the entry valid, so they are not hashed again from the start.
+_prefix_digests = {}
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+def _source_state(path):
+    """
+    Returns the state of a source file the snapshot is keyed on.
+    """
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+def _extend_digest(digest, path, start, length):
+    """
+    Adds ``length`` bytes of a file, from offset ``start``, to a hash.
+    """
+    with open(path, mode='rb') as file:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = file.read(min(HASH_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            remaining -= len(block)
+    return digest
+
+def _prefix_digest(path, source, current):
+    """
+    Checks that the bytes parsed into a snapshot are unchanged, i.e. that the file has only
+    been appended to, by hashing the first ``source['offset']`` bytes of the file so that any
+    edit to them is noticed. A hash carried forward by this process is reused when the file
+    was only appended to by this process since.
+    Args:
+        path (str): The path to the transaction CSV file.
+        source (dict): The state of the file saved in the snapshot.
+        current (dict): The current state of the file.
+    Returns:
+        hash object: The hash of the parsed bytes, or None if they changed.
+    """
+    entry = _prefix_digests.get(os.path.abspath(path))
+    if (entry is not None and entry['offset'] == source['offset']
+            and (entry['size'], entry['mtime_ns']) == (current['size'], current['mtime_ns'])
+            and entry['digest'].hexdigest() == source.get('prefix_hash')):
+        return entry['digest'].copy()
+    digest = _extend_digest(hashlib.blake2b(digest_size=16), path, 0, source['offset'])
+    return digest if digest.hexdigest() == source.get('prefix_hash') else None
+
+def note_transaction_append(transaction_file, before, after):
+    """
+    Records that this process appended to a transaction file, so that the next snapshot load
+    hashes only the appended rows. Called by the writer with the file state before and after.
+    Args:
+        transaction_file (str): The path to the transaction CSV file.
+        before (os.stat_result): The state of the file before the append.
+        after (os.stat_result): The state of the file after the append.
+    """
+    entry = _prefix_digests.get(os.path.abspath(transaction_file))
+    if entry is not None and (entry['size'], entry['mtime_ns']) == (before.st_size, before.st_mtime_ns):
+        entry['size'], entry['mtime_ns'] = after.st_size, after.st_mtime_ns
+
+def _write_snapshot(snapshot_file, header, columns=()):
+    """
+    Writes a snapshot file: the magic bytes, the length of the JSON header, the header,
+    then the raw bytes of each column, 8-byte aligned. The file is written to a temporary
+    path and moved into place so a crash never leaves a half-written snapshot.
+    """
+    header = dict(header, version=SNAPSHOT_VERSION, byteorder=sys.byteorder, columns=[])
+    offset = 0
+    for name, column in columns:
+        header['columns'].append({
+            'name': name,
+            'typecode': column.typecode,
+            'itemsize': column.itemsize,
+            'length': len(column),
+            'offset': offset,
+        })
+        offset = _align(offset + len(column) * column.itemsize)
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    temp_file = snapshot_file + '.tmp'
+    try:
+        with open(temp_file, mode='wb') as file:
+            file.write(_HEADER.pack(SNAPSHOT_MAGIC, len(header_bytes)))
+            file.write(header_bytes)
+            data_start = _align(_HEADER.size + len(header_bytes))
+            file.write(b'\0' * (data_start - file.tell()))
+            for (name, column), info in zip(columns, header['columns']):
+                file.write(b'\0' * (data_start + info['offset'] - file.tell()))
+                column.tofile(file)
+        os.replace(temp_file, snapshot_file)
+    except OSError as e:
+        print(f"Warning: Unable to write snapshot '{snapshot_file}': {e}")
+
+def _read_snapshot(snapshot_file):
+    """
+    Memory-maps a snapshot file and reads its header and columns.
+    Returns:
+        tuple: (header, columns) where columns maps column names to arrays, or None if
+               the snapshot is missing, unreadable or was written by an incompatible build.
+    """
+    try:
+        with open(snapshot_file, mode='rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, header_length = _HEADER.unpack_from(mapped, 0)
+            if magic != SNAPSHOT_MAGIC:
+                return None
+            header = json.loads(mapped[_HEADER.size:_HEADER.size + header_length])
+            if header.get('version') != SNAPSHOT_VERSION or header.get('byteorder') != sys.byteorder:
+                return None
+            data_start = _align(_HEADER.size + header_length)
+            columns = {}
+            for info in header['columns']:
+                column = array(info['typecode'])
+                if column.itemsize != info['itemsize']:
+                    return None
+                start = data_start + info['offset']
+                column.frombytes(mapped[start:start + info['length'] * info['itemsize']])
+                columns[info['name']] = column
+            return header, columns
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+@profiled
+def _parse_transaction_rows(file, store, fields=None, quarantine=None):
+    """
+    Parses transaction rows from a binary file object into a store, starting at its current position.
+    Args:
+        file (file object): The transaction CSV file, opened in binary mode.
+        store (TransactionStore): The store to append the rows to.
+        fields (list of str, optional): The column names. If None, the first line is read as the header.
+        quarantine (Quarantine, optional): Receives the invalid rows. If None, they are reported one by one.
+    Returns:
+        tuple: (number of bytes consumed, column names).
+    """
+    consumed = 0
+
+    def lines():
+        nonlocal consumed
+        for raw in file:
+            consumed += len(raw)
+            yield raw.decode('utf-8')
+
+    reader = csv.reader(lines())
+    # Line numbers are only known when parsing from the start of the file
+    first_line = None
+    if fields is None:
+        header = next(reader, None)
+        if header is None:
+            return consumed, None
+        fields = [field.strip() for field in header]
+        first_line = 2
+
+    rows_before = len(store)
+    for i, row in enumerate(reader):
+        try:
+            store.append(dict(zip(fields, row)))
+        except InvalidRecord as e:
+            if quarantine is None:
+                print(f"Skipping invalid transaction ({row}): {e}")
+            else:
+                quarantine.reject(row, e, first_line + i if first_line else None)
+    if quarantine is not None:
+        quarantine.fields = fields
+        quarantine.accepted += len(store) - rows_before
+    return consumed, fields
+
+@profiled
+def load_transaction_snapshot(transaction_file, snapshot_file=None, indexed=True):
+    """
+    Loads a TransactionStore through a binary snapshot of the parsed transaction columns.
+    The snapshot is keyed on the size and modification time of the CSV file. When both
+    are unchanged the columns are copied in bulk from the snapshot, without parsing. When the
+    file has grown and the bytes parsed into the snapshot still hash the same, the snapshot
+    is reused and just the appended rows are parsed. Any other change, such as an edit to an
+    earlier row, falls back to parsing the whole CSV file. The snapshot is rewritten whenever rows were parsed.
+    The hash is carried forward over the appended rows, so after appends made by this
+    process only the new rows are read and hashed.
+    Parsed rows are validated, and invalid rows are written to '<transaction_file>.rejected'
+    and left out of the snapshot, so they are not checked again on later loads.
+    Args:
+        transaction_file (str): The path to the CSV file containing transaction data.
+        snapshot_file (str, optional): The snapshot path. Defaults to the CSV path with '.snapshot' appended.
+        indexed (bool, optional): If False, the indexes are not built, e.g. because the store
+            is combined with others first. Defaults to True.
+    Returns:
+        TransactionStore: The store. It is empty if the CSV file cannot be read.
+    """
+    snapshot_file = snapshot_file or transaction_file + SNAPSHOT_SUFFIX
+    store = TransactionStore()
+    try:
+        current = _source_state(transaction_file)
+        cached = _read_snapshot(snapshot_file)
+        offset, fields, digest = 0, None, None
+
+        if cached is not None:
+            header, columns = cached
+            source = header['source']
+            unchanged = source['size'] == current['size'] and source['mtime_ns'] == current['mtime_ns']
+            if not unchanged and current['size'] > source['offset']:
+                digest = _prefix_digest(transaction_file, source, current)
+            if unchanged or digest is not None:
+                for name in _COLUMN_NAMES:
+                    setattr(store, name, columns[name])
+                offset, fields = source['offset'], header['fields']
+                if unchanged:
+                    if indexed:
+                        store.build_indexes()
+                    return store
+
+        # Rows are validated only when they are first parsed; rejected rows are quarantined
+        quarantine = Quarantine(transaction_file, append=offset > 0)
+        with open(transaction_file, mode='rb') as file:
+            file.seek(offset)
+            consumed, fields = _parse_transaction_rows(file, store, fields, quarantine)
+        quarantine.close()
+
+        if digest is None:
+            digest = hashlib.blake2b(digest_size=16)
+        _extend_digest(digest, transaction_file, offset, consumed)
+        source = dict(_source_state(transaction_file), offset=offset + consumed, prefix_hash=digest.hexdigest())
+        _prefix_digests[os.path.abspath(transaction_file)] = dict(
+            size=source['size'], mtime_ns=source['mtime_ns'], offset=source['offset'], digest=digest.copy())
+        _write_snapshot(
+            snapshot_file,
+            {'source': source, 'fields': fields},
+            [(name, getattr(store, name)) for name in _COLUMN_NAMES],
+        )
+    except FileNotFoundError:
+        print(f"Error: File '{transaction_file}' not found.")
+    except (IOError, UnicodeDecodeError) as e:
+        print(f"Error reading file '{transaction_file}': {e}")
+    if indexed:
+        store.build_indexes()
+    return store
+
+@profiled
+def read_grocery_snapshot(grocery_file, snapshot_file=None):
+    """
+    Returns the grocery data saved in a snapshot if the grocery CSV file has not changed since.
+    Args:
+        grocery_file (str): The path to the grocery CSV file.
+        snapshot_file (str, optional): The snapshot path. Defaults to the CSV path with '.snapshot' appended.
+    Returns:
+        dict or None: The grocery data, or None if there is no up-to-date snapshot.
+    """
+    snapshot_file = snapshot_file or grocery_file + SNAPSHOT_SUFFIX
+    cached = _read_snapshot(snapshot_file)
+    if cached is None:
+        return None
+    header, _ = cached
+    try:
+        current = _source_state(grocery_file)
+    except OSError:
+        return None
+    source = header.get('source', {})
+    if source.get('size') != current['size'] or source.get('mtime_ns') != current['mtime_ns']:
+        return None
+    return header.get('groceries')
+
+@profiled
+def write_grocery_snapshot(grocery_file, grocery_data, snapshot_file=None):
+    """
+    Saves parsed grocery data to a snapshot keyed on the current state of the grocery CSV file.
+    """
+    snapshot_file = snapshot_file or grocery_file + SNAPSHOT_SUFFIX
+    try:
+        source = _source_state(grocery_file)
+    except OSError:
+        return
+    _write_snapshot(snapshot_file, {'source': source, 'groceries': grocery_data})
@@ -0,0 +1,152 @@
+import os
+from utils.profiling import profiled
+
+
+JOURNAL_SUFFIX = '.journal'
+# Suffix the journal is renamed to while its deltas are being compacted into the catalog.
+COMPACTING_SUFFIX = '.compacting'
+# Journal size in bytes above which record_sales_transaction compacts it into the catalog.
+COMPACT_THRESHOLD_BYTES = 64 * 1024
+
+
+def journal_path(grocery_file):
+    """
+    Returns the path of the stock journal of a grocery CSV file.
+    """
+    return grocery_file + JOURNAL_SUFFIX
+
+# First field of the line that commits the stock changes of a sale, 'commit,<sale>'.
+COMMIT_MARKER = 'commit'
+
+
+def _append_record(grocery_file, record):
+    with open(journal_path(grocery_file), mode='a+b') as file:
+        # Terminate a line torn by an earlier crash so it cannot merge with this record
+        file.seek(0, os.SEEK_END)
+        if file.tell() > 0:
+            file.seek(-1, os.SEEK_END)
+            if file.read(1) != b'\n':
+                record = b'\n' + record
+        file.write(record)
+        file.flush()
+        os.fsync(file.fileno())
+        return file.tell()
+
+@profiled
+def append_stock_deltas(grocery_file, deltas, sale=None):
+    """
+    Appends stock changes to the journal of a grocery file with a single write and fsync.
+    Each change is one 'id,delta' line, so the cost does not depend on the catalog size
+    and a crash can at most lose a partially written last line, which is ignored on load.
+    The changes of a sale are written as 'id,delta,sale' lines ahead of its transaction
+    rows and only count once commit_stock_deltas has marked the sale committed, so a
+    crash before the rows are written cannot take stock away for a sale that never happened.
+    Args:
+        grocery_file (str): The path to the grocery CSV file.
+        deltas (dict): Grocery ID -> stock change (negative for sales).
+        sale (str, optional): A unique tag of the sale the changes belong to, without commas.
+    Returns:
+        int: The size of the journal after the write, i.e. the offset up to which it has been read
+             by a caller that was up to date before appending. None if there was nothing to write.
+    Raises:
+        OSError: If the journal cannot be written.
+    """
+    if not deltas:
+        return None
+    tag = f",{sale}" if sale is not None else ''
+    record = ''.join(f"{grocery_id},{delta}{tag}\n" for grocery_id, delta in deltas.items()).encode('utf-8')
+    return _append_record(grocery_file, record)
+
+@profiled
+def commit_stock_deltas(grocery_file, sale):
+    """
+    Marks the stock changes appended for a sale as committed, once its transaction rows are written.
+    Returns:
+        int: The size of the journal after the write.
+    Raises:
+        OSError: If the journal cannot be written.
+    """
+    return _append_record(grocery_file, f"{COMMIT_MARKER},{sale}\n".encode('utf-8'))
+
+def truncate_stock_journal(grocery_file, size):
+    """
+    Cuts the journal of a grocery file back to an earlier size, dropping the stock changes
+    appended since, e.g. those of a sale whose transaction rows could not be written.
+    Args:
+        grocery_file (str): The path to the grocery CSV file.
+        size (int): The journal size to go back to, as returned by journal_size.
+    Raises:
+        OSError: If the journal cannot be truncated.
+    """
+    with open(journal_path(grocery_file), mode='r+b') as file:
+        file.truncate(size)
+        file.flush()
+        os.fsync(file.fileno())
+
+def read_stock_deltas(path):
+    """
+    Reads the stock changes recorded in a journal file.
+    Args:
+        path (str): The path to the journal file.
+    Returns:
+        list of tuple: (grocery ID, delta) pairs in the order they were written. Missing
+                       journals give an empty list; torn or malformed lines are skipped.
+    """
+    return read_stock_deltas_since(path, 0)[0]
+
+def read_stock_deltas_since(path, offset):
+    """
+    Reads the stock changes appended to a journal file after a byte offset.
+    The changes of a sale are returned once its commit line is read; those of a sale
+    whose commit line is missing, because the program stopped before its transaction rows
+    were written, are left out, and are dropped when the journal is compacted.
+    Args:
+        path (str): The path to the journal file.
+        offset (int): The offset up to which the journal was read before.
+    Returns:
+        tuple: (list of (grocery ID, delta) pairs, offset just after the last complete line).
+               The offset can be passed back in to read only the changes appended later.
+    """
+    deltas = []
+    # Sale tag -> changes waiting for the commit line of the sale
+    pending = {}
+    try:
+        with open(path, mode='rb') as file:
+            file.seek(offset)
+            for line in file:
+                if not line.endswith(b'\n'):
+                    break
+                offset += len(line)
+                try:
+                    fields = line.decode('utf-8').strip().split(',')
+                    if fields[0] == COMMIT_MARKER and len(fields) == 2:
+                        deltas.extend(pending.pop(fields[1], ()))
+                    elif len(fields) == 3:
+                        pending.setdefault(fields[2], []).append((fields[0], int(fields[1])))
+                    else:
+                        grocery_id, delta = fields
+                        deltas.append((grocery_id, int(delta)))
+                except ValueError:
+                    print(f"Warning: Skipping malformed stock journal entry {line!r}.")
+    except FileNotFoundError:
+        pass
+    return deltas, offset
+
+def apply_stock_deltas(grocery_data, deltas):
+    """
+    Applies (grocery ID, delta) pairs to the stock of in-memory grocery data.
+    """
+    for grocery_id, delta in deltas:
+        if grocery_id in grocery_data:
+            grocery_data[grocery_id]['stock'] += delta
+        else:
+            print(f"Warning: Stock journal refers to unknown grocery ID {grocery_id}.")
+
+def journal_size(grocery_file):
+    """
+    Returns the size in bytes of the stock journal of a grocery file (0 if there is none).
+    """
+    try:
+        return os.path.getsize(journal_path(grocery_file))
+    except OSError:
+        return 0
@@ -0,0 +1,413 @@
+import os
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from utils.csv_storage import CSVBackend
+from utils.date_normalization import month_index, month_start
+from utils.grocery_catalog import GroceryCatalog
+from utils.ingest_validation import InvalidRecord
+from utils.name_index import NameIndex
+from utils.profiling import profiled
+from utils.storage_backend import StorageBackend
+from utils.transaction_index import DateIndex, ProductIndex
+from utils.transaction_store import TransactionStore, parse_transaction
+
+
+# Data files with these extensions are SQLite databases; any other path is a CSV file.
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+# Seconds a terminal waits for another terminal's write to the database to finish.
+SQLITE_TIMEOUT = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS groceries (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    price REAL NOT NULL,
+    stock INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    day INTEGER NOT NULL,
+    seconds INTEGER NOT NULL,
+    grocery_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    cents INTEGER NOT NULL,
+    month INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_by_date ON transactions (day, seconds);
+CREATE INDEX IF NOT EXISTS transactions_by_grocery ON transactions (grocery_id, day);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password TEXT NOT NULL,
+    type TEXT NOT NULL
+);
+"""
+
+
+class SQLiteSalesRollup:
+    """
+    Answers the queries of a SalesRollup with SQL aggregations over the transactions
+    table. The totals are summed by SQLite through the date and grocery indexes instead
+    of being kept in memory, and include the sales recorded by other terminals.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def add(self, ordinal, grocery_id, quantity, cents, seconds):
+        # The sale is already in the database by the time it is appended to the store
+        pass
+
+    def monthly_totals(self, start_month, end_month, grocery_id=None):
+        """
+        Returns:
+            dict: Month index -> [value in cents, quantity, count], for months with sales.
+        """
+        query = ("SELECT month, SUM(cents), SUM(quantity), COUNT(*) FROM transactions "
+                 "WHERE day BETWEEN ? AND ?")
+        params = [month_start(start_month), month_start(end_month + 1) - 1]
+        if grocery_id is not None:
+            query += " AND grocery_id = ?"
+            params.append(grocery_id)
+        query += " GROUP BY month"
+        return {month: [cents, quantity, count] for month, cents, quantity, count in self._query(query, params)}
+
+    def product_totals(self, start_ordinal, end_ordinal):
+        """
+        Returns:
+            dict: Grocery ID -> [value in cents, quantity, count], for groceries with sales.
+        """
+        if start_ordinal > end_ordinal:
+            return {}
+        query = ("SELECT grocery_id, SUM(cents), SUM(quantity), COUNT(*) FROM transactions "
+                 "WHERE day BETWEEN ? AND ? GROUP BY grocery_id")
+        rows = self._query(query, (start_ordinal, end_ordinal))
+        return {grocery_id: [cents, quantity, count] for grocery_id, cents, quantity, count in rows}
+
+    def hourly_totals(self, start_ordinal, end_ordinal):
+        """
+        Returns:
+            dict: (weekday, hour) -> [value in cents, quantity, count], for the hours with sales.
+        """
+        # Day ordinal 1 (1 January of year 1) is a Monday
+        query = ("SELECT (day - 1) % 7, seconds / 3600, SUM(cents), SUM(quantity), COUNT(*) FROM transactions "
+                 "WHERE day BETWEEN ? AND ? GROUP BY 1, 2")
+        rows = self._query(query, (start_ordinal, end_ordinal))
+        return {(weekday, hour): [cents, quantity, count] for weekday, hour, cents, quantity, count in rows}
+
+    def _query(self, query, params):
+        try:
+            with closing(_connect(self.database)) as connection:
+                return connection.execute(query, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading database '{self.database}': {e}")
+            return []
+
+
+class SQLiteTransactionStore(TransactionStore):
+    """
+    A TransactionStore loaded from a SQLite database.
+    Searches use the usual in-memory indexes, while the monthly, product and total sales
+    reports are aggregated by SQLite through an SQLiteSalesRollup.
+    """
+
+    def __init__(self, database):
+        super().__init__()
+        self.database = database
+
+    def data_version(self):
+        """
+        Returns a number that changes whenever a transaction is recorded in the database, by
+        any terminal, so cached reports aggregated from it are recomputed. Transactions are
+        only ever appended, so the largest rowid is enough.
+        """
+        rows = self.sales_rollup._query("SELECT MAX(rowid) FROM transactions", ())
+        return rows[0][0] if rows else None
+
+    @profiled
+    def build_indexes(self):
+        self.date_index = DateIndex(self.dates)
+        self.product_index = ProductIndex(self.ids, self.dates, self.date_index.order)
+        self.sales_rollup = SQLiteSalesRollup(self.database)
+
+
+def _connect(database, create=False):
+    """
+    Opens a database. Reads open it read-only, so a mistyped path is reported instead of
+    silently becoming a new, empty database; only writes create the file and its tables.
+    """
+    if not create:
+        return sqlite3.connect(Path(database).resolve().as_uri() + '?mode=ro', timeout=SQLITE_TIMEOUT, uri=True)
+    # Autocommit mode: writes are grouped with explicit BEGIN and COMMIT statements
+    connection = sqlite3.connect(database, timeout=SQLITE_TIMEOUT, isolation_level=None)
+    connection.executescript(_SCHEMA)
+    return connection
+
+def _same_file(path, other):
+    return os.path.abspath(path) == os.path.abspath(other)
+
+def _transaction_values(transactions):
+    """
+    Checks transaction dictionaries and returns the rows to insert.
+    Raises:
+        InvalidRecord: If a transaction is invalid.
+    """
+    values = []
+    for transaction in transactions:
+        ordinal, seconds, grocery_id, quantity, cents = parse_transaction(transaction)
+        values.append((ordinal, seconds, grocery_id, quantity, cents, month_index(ordinal)))
+    return values
+
+_INSERT_TRANSACTIONS = ("INSERT INTO {table} (day, seconds, grocery_id, quantity, cents, month) "
+                        "VALUES (?, ?, ?, ?, ?, ?)")
+_SELECT_TRANSACTIONS = "SELECT day, seconds, grocery_id, quantity, cents FROM transactions"
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Keeps the groceries, transactions and users in the tables of a local SQLite database.
+    The three data files may be the same database. Transactions are stored typed, with
+    indexes on the date and on the grocery ID, so date ranges are read without scanning
+    the table and the sales reports are aggregated in SQL. A sale is checked and recorded
+    in one database transaction, which also keeps terminals sharing the database apart.
+    """
+
+    def load_groceries(self, path, snapshot=False):
+        try:
+            with closing(_connect(path)) as connection:
+                rows = connection.execute("SELECT id, name, price, stock FROM groceries ORDER BY id").fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading database '{path}': {e}")
+            return GroceryCatalog()
+        return GroceryCatalog((str(grocery_id), {'name': name, 'price': price, 'stock': stock})
+                              for grocery_id, name, price, stock in rows)
+
+    def save_groceries(self, path, grocery_data):
+        try:
+            with closing(_connect(path, create=True)) as connection:
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    connection.execute("DELETE FROM groceries")
+                    connection.executemany(
+                        "INSERT INTO groceries (id, name, price, stock) VALUES (?, ?, ?, ?)",
+                        ((int(grocery_id), info['name'], info['price'], info['stock'])
+                         for grocery_id, info in grocery_data.items()))
+                except (sqlite3.Error, ValueError):
+                    connection.execute("ROLLBACK")
+                    raise
+                connection.execute("COMMIT")
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error writing to database '{path}': {e}")
+
+    def save_grocery_item(self, path, grocery_data, grocery_id, changes):
+        fields = [field for field in ('name', 'price', 'stock') if field in changes]
+        try:
+            with closing(_connect(path, create=True)) as connection:
+                # Only the changed fields are written, in one transaction with the read below
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    row = connection.execute("SELECT 1 FROM groceries WHERE id = ?", (int(grocery_id),)).fetchone()
+                    if row is None:
+                        info = grocery_data[grocery_id]
+                        connection.execute("INSERT INTO groceries (id, name, price, stock) VALUES (?, ?, ?, ?)",
+                                           (int(grocery_id), info['name'], info['price'], info['stock']))
+                    elif fields:
+                        assignments = ', '.join(f"{field} = ?" for field in fields)
+                        connection.execute(f"UPDATE groceries SET {assignments} WHERE id = ?",
+                                           [changes[field] for field in fields] + [int(grocery_id)])
+                    name, price, stock = connection.execute(
+                        "SELECT name, price, stock FROM groceries WHERE id = ?", (int(grocery_id),)).fetchone()
+                except (sqlite3.Error, ValueError):
+                    connection.execute("ROLLBACK")
+                    raise
+                connection.execute("COMMIT")
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error writing to database '{path}': {e}")
+            return
+        grocery_data[grocery_id].update(name=name, price=price, stock=stock)
+
+    def refresh_groceries(self, path, grocery_data):
+        fresh = self.load_groceries(path)
+        if not fresh or fresh == grocery_data:
+            return False
+        grocery_data.clear()
+        grocery_data.update(fresh)
+        if isinstance(grocery_data, GroceryCatalog):
+            grocery_data.name_index = NameIndex(grocery_data)
+        return True
+
+    def load_transactions(self, path, columnar=False, snapshot=False, start_ordinal=None, end_ordinal=None):
+        store = SQLiteTransactionStore(path)
+        columns = store._columns()
+        for values in self.iter_transaction_range(path, start_ordinal, end_ordinal):
+            for column, value in zip(columns, values):
+                column.append(value)
+        if not (columnar or snapshot):
+            return list(store.rows())
+        store.build_indexes()
+        return store
+
+    def iter_transaction_range(self, path, start_ordinal=None, end_ordinal=None):
+        conditions, params = [], []
+        if start_ordinal is not None:
+            conditions.append("day >= ?")
+            params.append(start_ordinal)
+        if end_ordinal is not None:
+            conditions.append("day <= ?")
+            params.append(end_ordinal)
+        if conditions:
+            # Read through the date index; rows of the same day and time keep their order
+            query = f"{_SELECT_TRANSACTIONS} WHERE {' AND '.join(conditions)} ORDER BY day, seconds, rowid"
+        else:
+            query = f"{_SELECT_TRANSACTIONS} ORDER BY rowid"
+        try:
+            with closing(_connect(path)) as connection:
+                yield from connection.execute(query, params)
+        except sqlite3.Error as e:
+            print(f"Error reading database '{path}': {e}")
+
+    def save_transactions(self, path, transactions):
+        try:
+            values = _transaction_values(transactions)
+            with closing(_connect(path, create=True)) as connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(_INSERT_TRANSACTIONS.format(table='transactions'), values)
+                connection.execute("COMMIT")
+            return True
+        except InvalidRecord as e:
+            print(f"Error: Invalid transaction: {e}")
+        except sqlite3.Error as e:
+            print(f"Error writing to database '{path}': {e}")
+        return False
+
+    def record_sale(self, grocery_path, grocery_data, transaction_path, transactions, transaction_backend):
+        if not isinstance(transaction_backend, SQLiteBackend):
+            print(f"Error: Sales of the groceries in '{grocery_path}' must be recorded in a SQLite "
+                  f"database, not in '{transaction_path}'.")
+            return None
+        quantities = {}
+        for t in transactions:
+            quantities[t['id']] = quantities.get(t['id'], 0) + t['quantity']
+
+        try:
+            values = _transaction_values(transactions)
+            with closing(_connect(grocery_path, create=True)) as connection:
+                table = 'transactions'
+                if not _same_file(grocery_path, transaction_path):
+                    # Create the tables of the other database, then write to both in one transaction
+                    _connect(transaction_path, create=True).close()
+                    connection.execute("ATTACH DATABASE ? AS sales", (transaction_path,))
+                    table = 'sales.transactions'
+
+                # Taking the write lock first means no other terminal can sell the stock read below
+                connection.execute("BEGIN IMMEDIATE")
+                try:
+                    ids = [int(grocery_id) for grocery_id in quantities]
+                    placeholders = ', '.join('?' * len(ids))
+                    stock = {str(grocery_id): in_stock for grocery_id, in_stock in connection.execute(
+                        f"SELECT id, stock FROM groceries WHERE id IN ({placeholders})", ids)}
+                    for grocery_id, in_stock in stock.items():
+                        if grocery_id in grocery_data:
+                            grocery_data[grocery_id]['stock'] = in_stock
+                    shortages = [grocery_id for grocery_id, quantity in quantities.items()
+                                 if stock.get(grocery_id, 0) < quantity]
+                    if shortages:
+                        connection.execute("ROLLBACK")
+                        return shortages
+
+                    connection.executemany(_INSERT_TRANSACTIONS.format(table=table), values)
+                    connection.executemany("UPDATE groceries SET stock = stock - ? WHERE id = ?",
+                                           [(quantity, int(grocery_id)) for grocery_id, quantity in quantities.items()])
+                except sqlite3.Error:
+                    connection.execute("ROLLBACK")
+                    raise
+                connection.execute("COMMIT")
+        except InvalidRecord as e:
+            print(f"Error: Invalid transaction: {e}")
+            return None
+        except sqlite3.Error as e:
+            print(f"Error recording the sale in database '{grocery_path}': {e}")
+            return None
+
+        for grocery_id, quantity in quantities.items():
+            grocery_data[grocery_id]['stock'] -= quantity
+        return []
+
+    def load_users(self, path):
+        try:
+            with closing(_connect(path)) as connection:
+                rows = connection.execute("SELECT username, password, type FROM users ORDER BY rowid").fetchall()
+        except sqlite3.Error as e:
+            print(f"Error: Unable to open database '{path}'. Reason: {e}")
+            return []
+        if not rows:
+            print(f"Error: No users found in database '{path}'.")
+        return [{'username': username, 'password': password, 'type': user_type}
+                for username, password, user_type in rows]
+
+    def save_users(self, path, users):
+        try:
+            with closing(_connect(path, create=True)) as connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(
+                    "INSERT OR REPLACE INTO users (username, password, type) VALUES (?, ?, ?)",
+                    [(user['username'], user['password'], user.get('type') or '') for user in users])
+                connection.execute("COMMIT")
+        except (sqlite3.Error, KeyError) as e:
+            print(f"Error writing to database '{path}': {e}")
+
+
+CSV_BACKEND = CSVBackend()
+_BACKENDS = dict.fromkeys(SQLITE_SUFFIXES, SQLiteBackend())
+
+
+def storage_backend(path):
+    """
+    Returns the storage backend of a data file, chosen by its extension.
+    Args:
+        path (str): The path of a grocery, transaction or user data file.
+    Returns:
+        StorageBackend: SQLiteBackend for a database file, and CSVBackend for anything
+            else, including directories of monthly partitions.
+    """
+    return _BACKENDS.get(os.path.splitext(str(path))[1].lower(), CSV_BACKEND)
+
+@profiled
+def copy_to_database(grocery_file, transaction_file, user_file, database):
+    """
+    Copies the groceries, transactions and users from their data files into a SQLite database.
+    The rows are loaded (and validated) by the usual loaders, so the source files can be
+    CSV files, a directory of monthly partitions, or another database. The source files
+    are left untouched.
+    Args:
+        grocery_file (str): The path to the grocery data.
+        transaction_file (str): The path to the transaction data.
+        user_file (str): The path to the user data.
+        database (str): The path of the SQLite database, ending in '.db', '.sqlite' or '.sqlite3'.
+    Returns:
+        int: The number of transactions copied, or None if nothing was copied.
+    """
+    # Imported here because the loaders themselves hand databases over to this module
+    from utils.grocery_operations import load_grocery_data
+    from utils.transaction_operations import load_transaction_data
+    from utils.users_load import load_user_data
+
+    backend = storage_backend(database)
+    if not isinstance(backend, SQLiteBackend):
+        print(f"Error: '{database}' is not a database; use one of the extensions {', '.join(SQLITE_SUFFIXES)}.")
+        return None
+    try:
+        with closing(_connect(database, create=True)) as connection:
+            has_sales = connection.execute("SELECT 1 FROM transactions LIMIT 1").fetchone() is not None
+    except sqlite3.Error as e:
+        print(f"Error: Unable to open database '{database}'. Reason: {e}")
+        return None
+    if has_sales:
+        print(f"Error: Database '{database}' already holds transactions.")
+        return None
+
+    transactions = load_transaction_data(transaction_file)
+    backend.save_groceries(database, load_grocery_data(grocery_file))
+    backend.save_users(database, load_user_data(user_file))
+    if not backend.save_transactions(database, transactions):
+        return None
+    return len(transactions)
@@ -0,0 +1,99 @@
+from abc import ABC, abstractmethod
+
+
+class StorageBackend(ABC):
+    """
+    Where the groceries, transactions and users are kept.
+    The data functions (load_grocery_data, save_grocery_data, refresh_grocery_data,
+    load_transaction_data, save_transaction_data, iter_transactions, load_user_data and
+    the sale recording of transaction_operations) ask utils.storage.storage_backend for
+    the backend of the path they are given and hand the work over to it, so the menus
+    never need to know where the data lives. CSVBackend is the default; SQLiteBackend
+    is used for database files.
+    """
+
+    @abstractmethod
+    def load_groceries(self, path, snapshot=False):
+        """
+        Args:
+            path (str): The path to the grocery data.
+            snapshot (bool, optional): If True, the backend may read and keep a faster copy
+                of the parsed data, e.g. a binary snapshot next to a CSV file.
+        Returns:
+            GroceryCatalog: The grocery items keyed by grocery ID (str), each with 'name',
+                'price' and 'stock'.
+        """
+
+    @abstractmethod
+    def refresh_groceries(self, path, grocery_data):
+        """
+        Updates ``grocery_data`` in place with the changes saved by other terminals, and
+        rebuilds the name index of a GroceryCatalog whose items were replaced.
+        Returns:
+            bool: True if the catalog was re-read, so cached results computed from it are stale.
+        """
+
+    @abstractmethod
+    def save_groceries(self, path, grocery_data):
+        """
+        Saves every grocery item of ``grocery_data``.
+        """
+
+    @abstractmethod
+    def save_grocery_item(self, path, grocery_data, grocery_id, changes):
+        """
+        Saves one new or edited grocery item without writing back the other items, so
+        stock sold at other terminals in the meantime is not overwritten. The caller holds
+        the grocery file lock and has already applied ``changes`` to ``grocery_data``.
+        Args:
+            grocery_id (str): The ID of the item.
+            changes (dict): The fields that were set, e.g. {'price': 2.5}; every field of a new item.
+        """
+
+    @abstractmethod
+    def load_transactions(self, path, columnar=False, snapshot=False, start_ordinal=None, end_ordinal=None):
+        """
+        Returns:
+            list or TransactionStore: The transactions as typed dictionaries or, if ``columnar``
+                or ``snapshot``, as a TransactionStore. Backends may leave out the transactions
+                outside the day ordinal range; the caller must not rely on it either way.
+        """
+
+    @abstractmethod
+    def iter_transaction_range(self, path, start_ordinal=None, end_ordinal=None):
+        """
+        Yields (day ordinal, seconds, grocery ID, quantity, payment in cents) of the
+        transactions one at a time. Backends may skip the transactions outside the day
+        ordinal range, so callers still filter the dates.
+        """
+
+    @abstractmethod
+    def save_transactions(self, path, transactions):
+        """
+        Appends transaction dictionaries.
+        Returns:
+            bool: True if the transactions were written.
+        """
+
+    @abstractmethod
+    def record_sale(self, grocery_path, grocery_data, transaction_path, transactions, transaction_backend):
+        """
+        Checks the stock and records the rows and stock changes of a sale together.
+        The stock of the sold items in ``grocery_data`` is brought up to date either way.
+        Args:
+            grocery_path (str): The path to the grocery data kept by this backend.
+            grocery_data (dict): The in-memory grocery data.
+            transaction_path (str): The path to the transaction data.
+            transactions (list of dict): The transaction rows of the sale.
+            transaction_backend (StorageBackend): The backend of ``transaction_path``.
+        Returns:
+            list of str: The grocery IDs without enough stock; empty if the sale was recorded.
+                None if the sale could not be recorded for another reason.
+        """
+
+    @abstractmethod
+    def load_users(self, path):
+        """
+        Returns:
+            list of dict: The users, with 'username', 'password' and 'type'.
+        """
@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import sys
+import threading
+from utils.grocery_operations import compact_stock_journal, load_grocery_data
+from utils.ingest_validation import check_grocery_references
+from utils.report_cli import REPORTS, run_query, write_table
+from utils.transaction_operations import commit_basket, load_transaction_data
+from utils.users_load import load_user_data
+
+
+DEFAULT_SOCKET = 'grocery_store.sock'
+# Reports a cashier may run; managers may run every report.
+CASHIER_REPORTS = {'search-date', 'search-name', 'search-name-date'}
+
+
+_capture = threading.local()
+
+
+class _ThreadStdout:
+    """
+    Stands in for sys.stdout while the server runs. Each worker thread's output goes to the
+    buffer _captured gave it, and everything else to the real stdout, so requests running
+    in parallel do not collect each other's messages.
+    """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+    def write(self, text):
+        return (getattr(_capture, 'output', None) or self.stdout).write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stdout, name)
+
+
+def _captured(func, *args):
+    """
+    Calls a function and returns its result together with the lines it printed, so the
+    messages of the regular menu functions can be sent back to the terminal that asked.
+    Runs in a worker thread; the output of other threads is not captured.
+    """
+    _capture.output = io.StringIO()
+    try:
+        result = func(*args)
+        lines = _capture.output.getvalue().splitlines()
+    finally:
+        _capture.output = None
+    return result, [line for line in lines if line.strip()]
+
+
+class StoreService:
+    """
+    The data shared by every terminal connected to the server.
+    The grocery, transaction and user data are loaded once. Requests from all terminals
+    are answered from the same in-memory structures, so searches and reports see every
+    sale as soon as it is recorded. Sales are the only writes. Sales, searches and reports
+    run in worker threads, so the event loop keeps serving other terminals meanwhile;
+    searches and reports run side by side, while a sale waits for the running ones to
+    finish and holds off new ones until it is recorded.
+    """
+
+    def __init__(self, grocery_file, transaction_file, user_file):
+        self.grocery_file = grocery_file
+        self.transaction_file = transaction_file
+        self.groceries = load_grocery_data(grocery_file, snapshot=True)
+        self.transactions = load_transaction_data(transaction_file, snapshot=True)
+        check_grocery_references(self.transactions, self.groceries)
+        self.users = load_user_data(user_file)
+        self.write_lock = None
+        self.readers = 0
+        self.no_readers = None
+
+    def authenticate(self, username, password):
+        """
+        Returns the user type of a username and password, or None if they do not match.
+        """
+        user = next((user for user in self.users if user.get('username') == username), None)
+        if user is None or not password or user.get('password') != password:
+            return None
+        return user.get('type')
+
+    async def handle(self, request, session):
+        """
+        Answers one request.
+        Args:
+            request (dict): The decoded request, with an 'op' key.
+            session (dict): The state of the connection: 'username' and 'user_type'.
+        Returns:
+            dict: The response, with 'ok' set to True or False.
+        """
+        op = request.get('op')
+        if op == 'login':
+            username = str(request.get('username', '')).strip()
+            user_type = self.authenticate(username, str(request.get('password', '')).strip())
+            if user_type is None:
+                return {'ok': False, 'error': "incorrect username or password"}
+            session['username'], session['user_type'] = username, user_type
+            return {'ok': True, 'username': session['username'], 'user_type': user_type}
+
+        if session.get('user_type') is None:
+            return {'ok': False, 'error': "please log in first"}
+
+        if op == 'catalog':
+            async with self.write_lock:
+                groceries = {grocery_id: dict(info) for grocery_id, info in self.groceries.items()}
+            return {'ok': True, 'groceries': groceries}
+
+        if op == 'query':
+            query = str(request.get('query', ''))
+            report = query.split()[0] if query.split() else ''
+            if session['user_type'] != 'manager' and report in REPORTS and report not in CASHIER_REPORTS:
+                return {'ok': False, 'error': f"the '{report}' report is only available to managers"}
+            result = await self._read(run_query, query, self.groceries, self.transactions)
+            return {'ok': 'error' not in result, 'result': result}
+
+        if op == 'sale':
+            items = request.get('items')
+            if not isinstance(items, dict):
+                return {'ok': False, 'error': "'items' must map grocery IDs to quantities"}
+            basket = {str(grocery_id): quantity for grocery_id, quantity in items.items()}
+            async with self.write_lock:
+                await self.no_readers.wait()
+                transactions, messages = await asyncio.to_thread(
+                    _captured, commit_basket, self.groceries, self.transaction_file, self.grocery_file,
+                    basket, self.transactions)
+            if transactions is None:
+                return {'ok': False, 'error': ' '.join(messages) or "sale not recorded"}
+            return {'ok': True, 'transactions': transactions}
+
+        return {'ok': False, 'error': f"unknown operation '{op}'"}
+
+    async def _read(self, func, *args):
+        """
+        Runs a function that only reads the shared data in a worker thread, alongside other readers.
+        """
+        # Taking the write lock briefly waits for a running sale and lets a waiting one go first
+        async with self.write_lock:
+            self.readers += 1
+            self.no_readers.clear()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+        finally:
+            self.readers -= 1
+            if self.readers == 0:
+                self.no_readers.set()
+
+    async def serve_client(self, reader, writer):
+        """
+        Reads JSON requests from a connection, one per line, and writes one JSON response line for each.
+        """
+        session = {'username': None, 'user_type': None}
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    response = {'ok': False, 'error': f"invalid request: {e}"}
+                else:
+                    try:
+                        response = await self.handle(request, session)
+                    except Exception as e:
+                        response = {'ok': False, 'error': f"unexpected error: {e}"}
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path=None, host=None, port=None):
+        """
+        Serves terminals until cancelled, on a Unix domain socket or on a TCP port.
+        """
+        self.write_lock = asyncio.Lock()
+        self.no_readers = asyncio.Event()
+        self.no_readers.set()
+        if port is not None:
+            server = await asyncio.start_server(self.serve_client, host or '127.0.0.1', port)
+        else:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            # The socket is created with mode 0660, so other users can never connect, not even briefly
+            umask = os.umask(0o117)
+            try:
+                server = await asyncio.start_unix_server(self.serve_client, socket_path)
+            finally:
+                os.umask(umask)
+        addresses = ', '.join(str(s.getsockname()) for s in server.sockets)
+        print(f"Grocery store server listening on {addresses}. Press Ctrl+C to stop.", flush=True)
+        # Stop as cleanly on SIGTERM (e.g. from a service manager) as on Ctrl+C
+        with contextlib.suppress(NotImplementedError):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
+        sys.stdout = _ThreadStdout(sys.stdout)
+        try:
+            async with server:
+                await server.serve_forever()
+        except asyncio.CancelledError:
+            print("\nServer stopped.")
+        finally:
+            sys.stdout = sys.stdout.stdout
+            if port is None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+def _address_arguments(parser):
+    parser.add_argument('--socket', metavar='PATH', default=DEFAULT_SOCKET,
+                        help=f"Unix domain socket path (default: {DEFAULT_SOCKET})")
+    parser.add_argument('--host', default='127.0.0.1', help="TCP host, used with --port (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, help="serve or connect over TCP on this port instead of a Unix socket")
+
+def run_server_cli(argv):
+    """
+    Entry point of the server mode: loads the data once and serves terminals until interrupted.
+    Args:
+        argv (list of str): The command line arguments after 'serve'.
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(
+        prog='grocery_store.py serve',
+        description="Load the data files once and serve logins, sales, searches and reports to terminals.",
+    )
+    parser.add_argument('grocery_file', help="path to the grocery CSV file")
+    parser.add_argument('transaction_file', help="path to the transaction CSV file or partition directory")
+    parser.add_argument('user_file', help="path to the user CSV file")
+    _address_arguments(parser)
+    args = parser.parse_args(argv)
+
+    service = StoreService(args.grocery_file, args.transaction_file, args.user_file)
+    try:
+        asyncio.run(service.serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+    except OSError as e:
+        print(f"Error: Unable to start the server: {e}")
+        return 1
+    finally:
+        compact_stock_journal(args.grocery_file, service.groceries)
+    return 0
+
+
+class StoreClient:
+    """
+    A blocking connection to a grocery store server.
+    """
+
+    def __init__(self, socket_path=None, host=None, port=None):
+        if port is not None:
+            self._socket = socket.create_connection((host or '127.0.0.1', port))
+        else:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.connect(socket_path)
+        self._file = self._socket.makefile('rwb')
+
+    def request(self, op, **fields):
+        """
+        Sends one request and returns the decoded response.
+        Raises:
+            ConnectionError: If the server closed the connection.
+        """
+        self._file.write(json.dumps(dict(fields, op=op)).encode('utf-8') + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("the server closed the connection")
+        return json.loads(line)
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+def _client_sale(client):
+    response = client.request('catalog')
+    if not response['ok']:
+        print(f"Error: {response['error']}")
+        return
+    print(f"\n{'ID':<10} {'Name':<20} {'Price':<10} {'Stock':<10}")
+    print('-' * 50)
+    for grocery_id, grocery_info in response['groceries'].items():
+        print(f"{grocery_id:<10} {grocery_info['name']:<20} {grocery_info['price']:<10.2f} {grocery_info['stock']:<10}")
+    print("\n")
+
+    basket = {}
+    while True:
+        line = input("Enter grocery ID and quantity (e.g. '4 2'), or press Enter to finish: ").strip()
+        if not line:
+            break
+        parts = line.replace(',', ' ').split()
+        if len(parts) != 2:
+            print("Error: Please enter a grocery ID and a quantity separated by a space.")
+            continue
+        grocery_id, quantity = parts
+        try:
+            quantity = int(quantity)
+        except ValueError:
+            print("Error: Invalid input for quantity. Please enter a valid integer.")
+            continue
+        basket[grocery_id] = basket.get(grocery_id, 0) + quantity
+
+    if not basket:
+        print("Basket is empty. No transaction recorded.\n")
+        return
+    response = client.request('sale', items=basket)
+    if response['ok']:
+        total = sum(t['payment'] for t in response['transactions'])
+        print(f"Basket of {len(response['transactions'])} item(s) recorded successfully. Total: {total:.2f}\n")
+    else:
+        print(f"Error: {response['error']}\n")
+
+def run_client_cli(argv):
+    """
+    Entry point of a thin terminal connected to a grocery store server.
+    Args:
+        argv (list of str): The command line arguments after 'connect'.
+    Returns:
+        int: The exit status.
+    """
+    parser = argparse.ArgumentParser(prog='grocery_store.py connect',
+                                     description="Connect a terminal to a running grocery store server.")
+    _address_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        client = StoreClient(args.socket, args.host, args.port)
+    except OSError as e:
+        print(f"Error: Unable to connect to the server: {e}")
+        return 1
+
+    try:
+        response = client.request('login', username=input("Username: ").strip(), password=input("Password: ").strip())
+        if not response['ok']:
+            print(f"\nError: {response['error']}")
+            print("Authentication failed.")
+            return 1
+        print(f"\nWelcome {response['username']}!, you are logged in as a {response['user_type']}.\n")
+        reports = REPORTS if response['user_type'] == 'manager' else CASHIER_REPORTS
+
+        while True:
+            print("Menu:")
+            print("1. Enter basket checkout")
+            print("2. Run a search or report")
+            print("3. Exit\n")
+            choice = input("Select an option: ")
+            if choice == '1':
+                _client_sale(client)
+            elif choice == '2':
+                print("\nAvailable queries:")
+                for name in reports:
+                    print(f"  {name} {' '.join(REPORTS[name][0])}")
+                response = client.request('query', query=input("\nEnter query: "))
+                if 'result' in response:
+                    write_table([response['result']], sys.stdout)
+                    print()
+                else:
+                    print(f"Error: {response['error']}\n")
+            elif choice == '3':
+                print("\nExiting program")
+                break
+            else:
+                print("\nInvalid selection. Please try again.")
+    except (ConnectionError, OSError) as e:
+        print(f"\nError: Lost connection to the server: {e}")
+        return 1
+    except KeyboardInterrupt:
+        print("\nProgram interrupted. Exiting.")
+    finally:
+        client.close()
+    return 0
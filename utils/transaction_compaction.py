@@ -0,0 +1,242 @@
+import bisect
+import csv
+import io
+import json
+import mmap
+import os
+from utils.file_lock import file_lock
+from utils.ingest_validation import InvalidRecord, Quarantine
+from utils.profiling import profiled
+from utils.transaction_partitions import is_partitioned, list_partitions
+from utils.transaction_store import TRANSACTION_FIELDS, parse_transaction
+
+
+INDEX_SUFFIX = '.idx'
+# Rows left out of a compacted file are added to this file, which loads never rewrite.
+REMOVED_SUFFIX = '.removed'
+INDEX_VERSION = 1
+# One index entry is kept for every INDEX_STRIDE rows of the sorted file.
+INDEX_STRIDE = 256
+# Number of bytes just before the end of the sorted rows that must be unchanged for the
+# index to still describe the file after new sales were appended.
+TAIL_CHECK_BYTES = 64
+
+
+def index_path(transaction_file):
+    """
+    Returns the path of the sparse offset index of a transaction CSV file.
+    """
+    return transaction_file + INDEX_SUFFIX
+
+def _tail(data, offset):
+    return data[max(0, offset - TAIL_CHECK_BYTES):offset].hex()
+
+def _compact_file(transaction_file, dedupe=False):
+    """
+    Rewrites one transaction CSV file sorted, and writes its index.
+    Invalid rows, and with ``dedupe`` exact duplicate rows, are left out and added to
+    '<transaction_file>.removed'.
+    Returns:
+        tuple: (rows kept, duplicates removed), or None if the file could not be compacted.
+    """
+    with file_lock(transaction_file):
+        try:
+            with open(transaction_file, mode='r', newline='') as file:
+                reader = csv.DictReader(file)
+                if reader.fieldnames is not None:
+                    reader.fieldnames = [field.strip() for field in reader.fieldnames]
+                # The rows are gone from the file once it is replaced, so they are kept apart from
+                # the '.rejected' file, which every load rewrites
+                quarantine = Quarantine(transaction_file, TRANSACTION_FIELDS, append=True,
+                                        path=transaction_file + REMOVED_SUFFIX)
+                keyed = []
+                for line_number, row in enumerate(reader, start=2):
+                    try:
+                        keyed.append((parse_transaction(row), [row[field].strip() for field in TRANSACTION_FIELDS],
+                                      line_number))
+                    except InvalidRecord as e:
+                        quarantine.reject(row, e, line_number)
+        except FileNotFoundError:
+            print(f"Error: File '{transaction_file}' not found.")
+            return None
+        except IOError as e:
+            print(f"Error reading file '{transaction_file}': {e}")
+            return None
+
+        # Sort by date and time; rows of the same second keep their arrival order
+        keyed.sort(key=lambda item: item[0][:2])
+        buffer = io.BytesIO()
+        text = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(TRANSACTION_FIELDS)
+        entries = []
+        seen_second, seen_values = None, {}
+        kept = duplicates = 0
+        for values, row, line_number in keyed:
+            if dedupe:
+                # Exact duplicates have the same values, so they fall in the same second
+                if values[:2] != seen_second:
+                    seen_second, seen_values = values[:2], {}
+                if values in seen_values:
+                    quarantine.reject(row, InvalidRecord('row', f"duplicate of line {seen_values[values]}"), line_number)
+                    duplicates += 1
+                    continue
+                seen_values[values] = line_number
+            if kept % INDEX_STRIDE == 0:
+                text.flush()
+                entries.append((values[0], buffer.tell()))
+            writer.writerow(row)
+            kept += 1
+
+        quarantine.accepted = kept
+        quarantine.close()
+        text.flush()
+        data = buffer.getvalue()
+        index = {
+            'version': INDEX_VERSION,
+            'fields': TRANSACTION_FIELDS,
+            'stride': INDEX_STRIDE,
+            'rows': kept,
+            'sorted_size': len(data),
+            'tail': _tail(data, len(data)),
+            'entries': entries,
+        }
+        try:
+            with open(transaction_file + '.tmp', mode='wb') as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            with open(index_path(transaction_file) + '.tmp', mode='w') as file:
+                json.dump(index, file)
+            os.replace(transaction_file + '.tmp', transaction_file)
+            os.replace(index_path(transaction_file) + '.tmp', index_path(transaction_file))
+        except OSError as e:
+            print(f"Error writing '{transaction_file}': {e}")
+            return None
+    return kept, duplicates
+
+@profiled
+def compact_transaction_file(transaction_file, dedupe=False):
+    """
+    Rewrites transaction data sorted by date and time, and writes a sparse offset index
+    next to it ('<transaction_file>.idx').
+    The index records the date and byte offset of every INDEX_STRIDE-th row, so date-range
+    reads can bisect to the first relevant block of the file instead of reading it all.
+    Sales appended afterwards are kept working: they are read from the end of the file
+    until the next compaction. Invalid rows are left out and added to the file
+    '<transaction_file>.removed', so they can still be repaired and restored. The new file is written next to the old one and moved into place under the
+    transaction file lock.
+    Args:
+        transaction_file (str): The path to the CSV file containing transaction data, or to a
+            directory of monthly partitions, each of which is compacted.
+        dedupe (bool, optional): If True, rows identical to an earlier row are also left out
+            and added to '<transaction_file>.removed'. Two sales of the same item and quantity in
+            the same second look the same, so this is only for files known to hold repeated
+            rows, e.g. after a merge. Defaults to False.
+    Returns:
+        tuple: (rows kept, duplicates removed), or None if the compaction failed.
+    """
+    if not is_partitioned(transaction_file):
+        return _compact_file(transaction_file, dedupe)
+
+    kept = duplicates = 0
+    for _, path in list_partitions(transaction_file):
+        result = _compact_file(path, dedupe)
+        if result is None:
+            return None
+        kept += result[0]
+        duplicates += result[1]
+    return kept, duplicates
+
+def read_offset_index(transaction_file, data=None):
+    """
+    Reads the sparse offset index of a transaction file, if it still matches the file.
+    Args:
+        transaction_file (str): The path to the transaction CSV file.
+        data (bytes-like, optional): The contents of the file, e.g. a memory map, used to check
+            that the sorted rows were not changed since the index was written.
+    Returns:
+        dict: The index, or None if there is no valid index for the file.
+    """
+    try:
+        with open(index_path(transaction_file), mode='r') as file:
+            index = json.load(file)
+        if index.get('version') != INDEX_VERSION or index.get('fields') != TRANSACTION_FIELDS:
+            return None
+        sorted_size = index['sorted_size']
+        if data is None:
+            with open(transaction_file, mode='rb') as file:
+                size = file.seek(0, os.SEEK_END)
+                file.seek(max(0, sorted_size - TAIL_CHECK_BYTES))
+                tail = file.read(min(sorted_size, TAIL_CHECK_BYTES)).hex()
+        else:
+            size, tail = len(data), _tail(data, sorted_size)
+        if size < sorted_size or tail != index['tail']:
+            return None
+        return index
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+def _parse_lines(data, start, end):
+    """
+    Yields the parsed values of the transaction lines of data[start:end].
+    """
+    position = start
+    while position < end:
+        newline = data.find(b'\n', position, end)
+        line_end = end if newline == -1 else newline + 1
+        line = data[position:line_end].decode('utf-8').strip()
+        position = line_end
+        if not line:
+            continue
+        row = next(csv.reader([line]))
+        try:
+            yield parse_transaction(dict(zip(TRANSACTION_FIELDS, row)))
+        except InvalidRecord:
+            # Only appended rows can be invalid; the next compaction quarantines them
+            continue
+
+def iter_sorted_range(transaction_file, start_ordinal, end_ordinal):
+    """
+    Reads the transactions dated between two days, both inclusive, from a compacted file.
+    The file is memory-mapped. The sparse index is bisected to find the block holding the
+    first day of the range, the sorted rows are read from there until the first row past
+    the range, and then the sales appended since the compaction are checked.
+    Args:
+        transaction_file (str): The path to a transaction CSV file compacted with compact_transaction_file.
+        start_ordinal (int): The first day ordinal of the range.
+        end_ordinal (int): The last day ordinal of the range.
+    Returns:
+        iterator of tuple: (day ordinal, seconds, grocery ID, quantity, payment in cents) of
+            each matching transaction, or None if the file has no valid index.
+    """
+    try:
+        with open(transaction_file, mode='rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return None
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return None
+    index = read_offset_index(transaction_file, data)
+    if index is None:
+        data.close()
+        return None
+    return _read_range(data, index, start_ordinal, end_ordinal)
+
+def _read_range(data, index, start_ordinal, end_ordinal):
+    try:
+        entries = index['entries']
+        sorted_size = index['sorted_size']
+        if entries:
+            block = max(bisect.bisect_left([ordinal for ordinal, _ in entries], start_ordinal) - 1, 0)
+            for values in _parse_lines(data, entries[block][1], sorted_size):
+                if values[0] > end_ordinal:
+                    break
+                if values[0] >= start_ordinal:
+                    yield values
+        # Sales appended since the compaction are in arrival order
+        for values in _parse_lines(data, sorted_size, len(data)):
+            if start_ordinal <= values[0] <= end_ordinal:
+                yield values
+    finally:
+        data.close()
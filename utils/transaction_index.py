@@ -0,0 +1,147 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class DateIndex:
+    """
+    Sorted date index over the rows of a TransactionStore.
+    Attributes:
+        order (array of int): Row positions sorted by date. Rows on the same day keep their load order.
+        days (array of int): The distinct day ordinals present, in ascending order.
+        offsets (array of int): Where each day starts in ``order``. Day ``days[i]`` covers
+            ``order[offsets[i]:offsets[i + 1]]``, so ``offsets`` has one more item than ``days``.
+    Exact-day and date-range lookups bisect ``days`` and slice ``order``, which costs
+    O(log n + k) instead of a scan over every transaction.
+    """
+
+    def __init__(self, dates):
+        """
+        Builds the index from a column of day ordinals.
+        Args:
+            dates (sequence of int): The date column of a TransactionStore.
+        """
+        self.order = array('l', sorted(range(len(dates)), key=dates.__getitem__))
+        self.days = array('l')
+        self.offsets = array('l', [0])
+        for i, position in enumerate(self.order):
+            ordinal = dates[position]
+            if not self.days or self.days[-1] != ordinal:
+                if self.days:
+                    self.offsets.append(i)
+                self.days.append(ordinal)
+        if self.days:
+            self.offsets.append(len(self.order))
+
+    def add(self, position, ordinal):
+        """
+        Adds a newly appended row to the index.
+        Rows are normally appended in date order, in which case this only touches the
+        end of the index. Back-dated rows are inserted in place.
+        Args:
+            position (int): The row position in the store.
+            ordinal (int): The day ordinal of the row.
+        """
+        i = bisect_left(self.days, ordinal)
+        if i == len(self.days) or self.days[i] != ordinal:
+            self.days.insert(i, ordinal)
+            self.offsets.insert(i + 1, self.offsets[i])
+        self.order.insert(self.offsets[i + 1], position)
+        for j in range(i + 1, len(self.offsets)):
+            self.offsets[j] += 1
+
+    def positions_between(self, start_ordinal, end_ordinal):
+        """
+        Returns the row positions dated between two days, both inclusive.
+        Args:
+            start_ordinal (int): The first day ordinal of the range.
+            end_ordinal (int): The last day ordinal of the range.
+        Returns:
+            array of int: The matching row positions in date order.
+        """
+        lo = bisect_left(self.days, start_ordinal)
+        hi = bisect_right(self.days, end_ordinal)
+        if lo >= hi:
+            return array('l')
+        return self.order[self.offsets[lo]:self.offsets[hi]]
+
+    def days_between(self, start_ordinal, end_ordinal):
+        """
+        Yields the days between two days, both inclusive, together with their row positions.
+        Args:
+            start_ordinal (int): The first day ordinal of the range.
+            end_ordinal (int): The last day ordinal of the range.
+        Yields:
+            tuple: (day ordinal, array of row positions on that day), in date order.
+        """
+        lo = bisect_left(self.days, start_ordinal)
+        hi = bisect_right(self.days, end_ordinal)
+        for i in range(lo, hi):
+            yield self.days[i], self.order[self.offsets[i]:self.offsets[i + 1]]
+
+    def positions_on(self, ordinal):
+        """
+        Returns the row positions dated on a single day.
+        """
+        return self.positions_between(ordinal, ordinal)
+
+
+class ProductIndex:
+    """
+    Per-product postings lists over the rows of a TransactionStore.
+    For every grocery ID the index keeps the row positions of its sales and, in a
+    parallel array, the day ordinal of each of those rows. Both are in date order, so
+    a product's sales in a date range are found by bisecting its own dates.
+    Lookups cost O(log k + m) for a product with k sales, m of them in the range,
+    regardless of the size of the full history.
+    """
+
+    def __init__(self, ids, dates, order):
+        """
+        Builds the postings lists.
+        Args:
+            ids (sequence of int): The grocery ID column of a TransactionStore.
+            dates (sequence of int): The date column of a TransactionStore.
+            order (iterable of int): Row positions in date order, e.g. DateIndex.order.
+        """
+        self.positions = {}
+        self.dates = {}
+        for position in order:
+            grocery_id = ids[position]
+            if grocery_id not in self.positions:
+                self.positions[grocery_id] = array('l')
+                self.dates[grocery_id] = array('l')
+            self.positions[grocery_id].append(position)
+            self.dates[grocery_id].append(dates[position])
+
+    def add(self, position, grocery_id, ordinal):
+        """
+        Adds a newly appended row to the postings list of its grocery.
+        Args:
+            position (int): The row position in the store.
+            grocery_id (int): The grocery ID of the row.
+            ordinal (int): The day ordinal of the row.
+        """
+        if grocery_id not in self.positions:
+            self.positions[grocery_id] = array('l')
+            self.dates[grocery_id] = array('l')
+        i = bisect_right(self.dates[grocery_id], ordinal)
+        self.positions[grocery_id].insert(i, position)
+        self.dates[grocery_id].insert(i, ordinal)
+
+    def positions_for(self, grocery_id, start_ordinal=None, end_ordinal=None):
+        """
+        Returns the row positions of a grocery's sales, optionally limited to a date range.
+        Args:
+            grocery_id (int): The grocery ID.
+            start_ordinal (int, optional): The first day ordinal of the range, inclusive.
+            end_ordinal (int, optional): The last day ordinal of the range, inclusive.
+        Returns:
+            array of int: The matching row positions in date order.
+        """
+        positions = self.positions.get(grocery_id)
+        if positions is None:
+            return array('l')
+        dates = self.dates[grocery_id]
+        lo = 0 if start_ordinal is None else bisect_left(dates, start_ordinal)
+        hi = len(dates) if end_ordinal is None else bisect_right(dates, end_ordinal)
+        return positions[lo:hi]
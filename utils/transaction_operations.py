@@ -1,73 +1,181 @@
-import csv
 from datetime import datetime
-from utils.grocery_operations import save_grocery_data
+from utils.ingest_validation import InvalidRecord
+from utils.profiling import profiled
+from utils.report_cache import bump_data_version
+from utils.storage import storage_backend
+from utils.transaction_store import typed_transaction
 
-def load_transaction_data(transaction_file):
+@profiled
+def load_transaction_data(transaction_file, columnar=False, snapshot=False, start_ordinal=None, end_ordinal=None):
     """
-    Loads transaction data from a CSV file.
+    Loads transaction data from a CSV file, or from a directory of monthly partition files.
     Args:
-        transaction_file (str): The path to the CSV file containing transaction data.
+        transaction_file (str): The path to the CSV file containing transaction data, or to a
+            directory of monthly partitions such as 'transactions/2024-03.csv'.
+        columnar (bool): If True, the rows are parsed once into a typed, array-backed
+            TransactionStore instead of a list of string dictionaries.
+        snapshot (bool): If True, a columnar store is loaded through a binary snapshot kept
+            next to the CSV file, so only rows appended since the last load are parsed.
+            Partitions each have their own snapshot.
+        start_ordinal (int, optional): For a partitioned directory, skip the partitions of
+            months before this day ordinal. Ignored for a single CSV file.
+        end_ordinal (int, optional): For a partitioned directory, skip the partitions of
+            months after this day ordinal. Ignored for a single CSV file.
     Returns:
-        list: A list of dictionaries, where each dictionary represents a transaction.
+        list or TransactionStore: A list of dictionaries, where each dictionary represents a
+            transaction, or a TransactionStore when ``columnar`` or ``snapshot`` is True.
+            Every row is validated once here: the dictionaries have typed values ('quantity'
+            an int, 'payment' a float) and invalid rows are left out and written, with the
+            reason, to the quarantine file '<transaction_file>.rejected'.
+            A path ending in '.db', '.sqlite' or '.sqlite3' is read from the transactions table
+            of that SQLite database instead, limited to the date range if one is given; its
+            TransactionStore leaves the sales reports to SQL aggregation. See utils.storage.
     Raises:
         FileNotFoundError: If the specified file does not exist.
         IOError: If there is an error reading the file.
     """
-    transactions = []
-    try:
-        with open(transaction_file, mode='r') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                transactions.append(row)
-    except FileNotFoundError:
-        print(f"Error: File '{transaction_file}' not found.")
-    except IOError as e:
-        print(f"Error reading file '{transaction_file}': {e}")
-    return transactions
+    return storage_backend(transaction_file).load_transactions(
+        transaction_file, columnar, snapshot, start_ordinal, end_ordinal)
 
+@profiled
 def save_transaction_data(transaction_file, transactions):
     """
     Appends transaction data to a CSV file. If the file is empty, writes the header first.
+    All rows are formatted into one buffer and appended with a single write followed by
+    a single fsync, so a multi-line checkout costs the same I/O as a single sale.
+    If ``transaction_file`` is a partitioned directory, each transaction is appended to
+    the partition file of the month of its date.
 
     Args:
-        transaction_file (str): The path to the CSV file where transaction data will be saved.
+        transaction_file (str): The path to the CSV file where transaction data will be saved,
+                                or to a directory of monthly partitions.
         transactions (list of dict): A list of dictionaries, each containing transaction data with keys 
                                      'date', 'time', 'id', 'quantity', and 'payment'.
 
+    Returns:
+        bool: True if the transactions were written, False otherwise.
+
     Raises:
         IOError: If there is an error writing to the file.
     """
-    try:
-        with open(transaction_file, mode='a', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=['date', 'time', 'id', 'quantity', 'payment'])
-            file_empty = file.tell() == 0
-
-            if file_empty:
-                writer.writeheader()
-            for transaction in transactions:
-                writer.writerow(transaction)
-    except IOError as e:
-        print(f"Error writing to file '{transaction_file}': {e}")
-
-def record_sales_transaction(grocery_data, transaction_file, grocery_file):
+    return storage_backend(transaction_file).save_transactions(transaction_file, transactions)
+
+def _display_grocery_items(grocery_data):
+    print(f"\n{'ID':<10} {'Name':<20} {'Price':<10} {'Stock':<10}")
+    print('-' * 50)
+    for grocery_id, grocery_info in grocery_data.items():
+        print(f"{grocery_id:<10} {grocery_info['name']:<20} {grocery_info['price']:<10.2f} {grocery_info['stock']:<10}")
+    print("\n")
+
+def _build_transaction(grocery_data, grocery_id, quantity, datetime_now):
+    return {
+        'date': datetime_now.split()[0],
+        'time': datetime_now.split()[1] + ' ' + datetime_now.split()[2],
+        'id': grocery_id,
+        'quantity': quantity,
+        'payment': round(quantity * round(grocery_data[grocery_id]['price'], 2), 2)
+    }
+
+def _commit_sale(grocery_data, transaction_file, grocery_file, transactions, transaction_data):
+    """
+    Journals the stock changes of a sale, writes its transaction rows, applies the changes, and
+    adds the rows to the in-memory transaction data.
+    Stock is reserved optimistically: the cashier picks items from the stock loaded
+    earlier, and only while committing is the grocery file locked, the stock changes of
+    other terminals applied, and the stock checked again before anything is written.
+    When the grocery data is kept in a database, its backend does all of this in one
+    database transaction instead.
+    Every row is checked the way the in-memory store checks it first, so a row the store
+    would reject never reaches the transaction file or the stock journal.
+    Returns:
+        bool: True if the sale was committed.
+    """
+    for t in transactions:
+        try:
+            typed_transaction(t)
+        except InvalidRecord as e:
+            print(f"Error: Invalid transaction for grocery ID {t.get('id')}: {e}.")
+            print("Sale not recorded.\n")
+            return False
+
+    quantities = {}
+    for t in transactions:
+        quantities[t['id']] = quantities.get(t['id'], 0) + t['quantity']
+
+    shortages = storage_backend(grocery_file).record_sale(
+        grocery_file, grocery_data, transaction_file, transactions, storage_backend(transaction_file))
+    if shortages is None:
+        return False
+    if shortages:
+        for grocery_id in shortages:
+            in_stock = grocery_data[grocery_id]['stock'] if grocery_id in grocery_data else 0
+            print(f"Error: Insufficient stock for grocery ID {grocery_id} "
+                  f"(requested {quantities[grocery_id]}, in stock {in_stock}). "
+                  "It may have been sold at another terminal.")
+        print("Sale not recorded.\n")
+        return False
+
+    if isinstance(transaction_data, list):
+        transaction_data.extend(transactions)
+    elif transaction_data is not None:
+        for t in transactions:
+            transaction_data.append(t)
+    bump_data_version()
+    return True
+
+@profiled
+def commit_basket(grocery_data, transaction_file, grocery_file, basket, transaction_data=None):
+    """
+    Records a basket of sales without prompting, e.g. for a request from a remote terminal.
+    Args:
+        grocery_data (dict): A dictionary containing grocery items with their details.
+        transaction_file (str): The file path where transaction data will be saved.
+        grocery_file (str): The file path where updated grocery data will be saved.
+        basket (dict): Grocery ID -> quantity sold.
+        transaction_data (TransactionStore or list, optional): The in-memory transaction data to add the sales to.
+    Returns:
+        list of dict: The recorded transaction rows, or None if the basket was not recorded
+                      because of an unknown grocery ID, an invalid quantity or insufficient stock.
+    """
+    if not basket:
+        print("Basket is empty. No transaction recorded.")
+        return None
+    for grocery_id, quantity in basket.items():
+        if grocery_id not in grocery_data:
+            print(f"Error: Grocery ID {grocery_id} not found.")
+            return None
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+            print(f"Error: Quantity for grocery ID {grocery_id} must be a positive integer.")
+            return None
+
+    datetime_now = datetime.now().strftime("%d/%m/%Y %I:%M:%S %p")
+    transactions = [
+        _build_transaction(grocery_data, grocery_id, quantity, datetime_now)
+        for grocery_id, quantity in basket.items()
+    ]
+    if not _commit_sale(grocery_data, transaction_file, grocery_file, transactions, transaction_data):
+        return None
+    return transactions
+
+def record_sales_transaction(grocery_data, transaction_file, grocery_file, transaction_data=None):
     """
     Records a sales transaction for a grocery store.
     This function displays the current grocery items, prompts the user to enter a grocery ID and quantity sold,
-    updates the stock, and records the transaction details in the specified files.
+    updates the stock, and records the transaction details in the specified files. The stock change is
+    appended to the stock journal of the grocery file, which is compacted into the file once it grows large.
     Args:
         grocery_data (dict): A dictionary containing grocery items with their details.
         transaction_file (str): The file path where transaction data will be saved.
         grocery_file (str): The file path where updated grocery data will be saved.
+        transaction_data (TransactionStore or list, optional): The in-memory transaction data to add
+            the sale to. A TransactionStore also updates its indexes and sales rollup incrementally,
+            so searches and reports in the same session include the sale.
     Raises:
         ValueError: If the input for quantity is not a valid integer.
         KeyError: If a required key is missing in the grocery data.
         Exception: For any other unexpected errors.
     """
-    print(f"\n{'ID':<10} {'Name':<20} {'Price':<10} {'Stock':<10}")
-    print('-' * 50)
-    for grocery_id, grocery_info in grocery_data.items():
-        print(f"{grocery_id:<10} {grocery_info['name']:<20} {grocery_info['price']:<10.2f} {grocery_info['stock']:<10}")
-    print("\n")
+    _display_grocery_items(grocery_data)
 
     try:
         grocery_id = input("Enter grocery ID: ")
@@ -76,23 +184,18 @@ def record_sales_transaction(grocery_data, transaction_file, grocery_file):
             return
 
         quantity = int(input("Enter quantity sold: "))
+        if quantity <= 0:
+            print("Error: Quantity must be a positive integer.")
+            return
         if grocery_data[grocery_id]['stock'] < quantity:
             print("Error: Insufficient stock.")
             return
 
         datetime_now = datetime.now().strftime("%d/%m/%Y %I:%M:%S %p")
-        transaction_data = {
-            'date': datetime_now.split()[0],
-            'time': datetime_now.split()[1] + ' ' + datetime_now.split()[2],
-            'id': grocery_id,
-            'quantity': quantity,
-            'payment': quantity * round(grocery_data[grocery_id]['price'], 2)
-        }
-        
-        grocery_data[grocery_id]['stock'] -= quantity
-        save_transaction_data(transaction_file, [transaction_data])
-        save_grocery_data(grocery_file, grocery_data)
-        print("Transaction recorded successfully.\n")
+        transaction = _build_transaction(grocery_data, grocery_id, quantity, datetime_now)
+
+        if _commit_sale(grocery_data, transaction_file, grocery_file, [transaction], transaction_data):
+            print("Transaction recorded successfully.\n")
         
     except ValueError:
         print("\nError: Invalid input for quantity. Please enter a valid integer.")
@@ -100,3 +203,76 @@ def record_sales_transaction(grocery_data, transaction_file, grocery_file):
         print(f"\nData error: Missing key {e} in grocery data.")
     except Exception as e:
         print(f"\nUnexpected error occurred: {e}")
+
+def record_basket_transaction(grocery_data, transaction_file, grocery_file, transaction_data=None):
+    """
+    Records a multi-line checkout (basket) for a grocery store.
+    This function displays the current grocery items and prompts the cashier for one
+    'grocery ID quantity' line per item until an empty line is entered. Lines for the same
+    grocery are combined. Stock is checked for the whole basket before anything is written,
+    so either every line is recorded or none is. All transaction rows are then appended with
+    one write and one fsync, and all stock changes with one stock journal record.
+    Args:
+        grocery_data (dict): A dictionary containing grocery items with their details.
+        transaction_file (str): The file path where transaction data will be saved.
+        grocery_file (str): The file path where updated grocery data will be saved.
+        transaction_data (TransactionStore or list, optional): The in-memory transaction data to add
+            the sales to. A TransactionStore also updates its indexes and sales rollup incrementally,
+            so searches and reports in the same session include them.
+    Raises:
+        KeyError: If a required key is missing in the grocery data.
+        Exception: For any other unexpected errors.
+    """
+    _display_grocery_items(grocery_data)
+
+    try:
+        basket = {}
+        while True:
+            line = input("Enter grocery ID and quantity (e.g. '4 2'), or press Enter to finish: ").strip()
+            if not line:
+                break
+
+            parts = line.replace(',', ' ').split()
+            if len(parts) != 2:
+                print("Error: Please enter a grocery ID and a quantity separated by a space.")
+                continue
+            grocery_id, quantity = parts
+            if grocery_id not in grocery_data:
+                print("Error: Grocery ID not found.")
+                continue
+            try:
+                quantity = int(quantity)
+            except ValueError:
+                print("Error: Invalid input for quantity. Please enter a valid integer.")
+                continue
+            if quantity <= 0:
+                print("Error: Quantity must be a positive integer.")
+                continue
+
+            basket[grocery_id] = basket.get(grocery_id, 0) + quantity
+            print(f"Added {quantity} x {grocery_data[grocery_id]['name']} (basket total: {basket[grocery_id]}).")
+
+        if not basket:
+            print("Basket is empty. No transaction recorded.\n")
+            return
+
+        shortages = [
+            grocery_id for grocery_id, quantity in basket.items()
+            if grocery_data[grocery_id]['stock'] < quantity
+        ]
+        if shortages:
+            for grocery_id in shortages:
+                print(f"Error: Insufficient stock for {grocery_data[grocery_id]['name']} "
+                      f"(requested {basket[grocery_id]}, in stock {grocery_data[grocery_id]['stock']}).")
+            print("Basket not recorded.\n")
+            return
+
+        transactions = commit_basket(grocery_data, transaction_file, grocery_file, basket, transaction_data)
+        if transactions:
+            total = sum(t['payment'] for t in transactions)
+            print(f"Basket of {len(transactions)} item(s) recorded successfully. Total: {total:.2f}\n")
+
+    except KeyError as e:
+        print(f"\nData error: Missing key {e} in grocery data.")
+    except Exception as e:
+        print(f"\nUnexpected error occurred: {e}")
@@ -0,0 +1,152 @@
+import csv
+import os
+import re
+from utils.date_normalization import month_index, month_label, parse_date
+from utils.transaction_store import TRANSACTION_FIELDS
+
+
+# Partition files are named after the month of the sales they hold, e.g. '2024-03.csv'.
+PARTITION_PATTERN = re.compile(r'^(\d{4})-(\d{2})\.csv$')
+# Partition files kept open at once while migrating a transaction file.
+OPEN_PARTITION_LIMIT = 64
+
+
+def is_partitioned(transaction_path):
+    """
+    Returns True if transactions are stored as a directory of monthly partition files
+    rather than as a single CSV file.
+    """
+    return os.path.isdir(transaction_path)
+
+def partition_path(directory, month):
+    """
+    Returns the path of the partition file holding the sales of a month index.
+    """
+    return os.path.join(directory, month_label(month) + '.csv')
+
+def list_partitions(directory, start_ordinal=None, end_ordinal=None):
+    """
+    Lists the partition files of a transaction directory, optionally only those whose
+    month overlaps a date range. Other files in the directory, such as snapshots, are ignored.
+    Args:
+        directory (str): The transaction directory.
+        start_ordinal (int, optional): The first day ordinal of the range, inclusive.
+        end_ordinal (int, optional): The last day ordinal of the range, inclusive.
+    Returns:
+        list of tuple: (month index, path) pairs in month order.
+    """
+    first = None if start_ordinal is None else month_index(start_ordinal)
+    last = None if end_ordinal is None else month_index(end_ordinal)
+    partitions = []
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        print(f"Error: Directory '{directory}' not found.")
+        return partitions
+    for name in names:
+        match = PARTITION_PATTERN.match(name)
+        if match is None:
+            continue
+        month = int(match.group(1)) * 12 + int(match.group(2)) - 1
+        if (first is None or month >= first) and (last is None or month <= last):
+            partitions.append((month, os.path.join(directory, name)))
+    partitions.sort()
+    return partitions
+
+def group_by_partition(transactions):
+    """
+    Groups transaction dictionaries by the month of their date.
+    Args:
+        transactions (iterable of dict): Transactions with a 'date' in DD/MM/YYYY format.
+    Returns:
+        dict: Month index -> list of the transactions of that month, in input order.
+    Raises:
+        ValueError: If a transaction date is not in DD/MM/YYYY format.
+    """
+    partitions = {}
+    for transaction in transactions:
+        month = month_index(parse_date(transaction['date'].strip()))
+        partitions.setdefault(month, []).append(transaction)
+    return partitions
+
+def _open_partition(directory, month, partitions):
+    """
+    Returns the CSV writer of the temporary file of a partition, opening the file if needed.
+    At most OPEN_PARTITION_LIMIT files are kept open; the least recently used one is closed
+    and reopened for appending when its month comes up again.
+    """
+    entry = partitions.pop(month, None)
+    if entry is None or entry[0].closed:
+        path = partition_path(directory, month) + '.tmp'
+        created = entry is None
+        file = open(path, mode='w' if created else 'a', newline='')
+        writer = csv.DictWriter(file, fieldnames=TRANSACTION_FIELDS, extrasaction='ignore')
+        if created:
+            writer.writeheader()
+        entry = (file, writer)
+        open_files = [f for f, _ in partitions.values() if not f.closed]
+        if len(open_files) >= OPEN_PARTITION_LIMIT:
+            _close_partition(open_files[0])
+    # Kept in order of use, least recent first
+    partitions[month] = entry
+    return entry[1]
+
+def _close_partition(file):
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+
+def migrate_to_partitions(transaction_file, directory):
+    """
+    Splits a single transaction CSV file into monthly partition files.
+    Rows are streamed from the source file straight to the partition of their month, so
+    memory use does not grow with the size of the file. The source file is left untouched.
+    Every partition is written to a temporary file and moved into place once all rows are
+    written, so an interrupted migration can simply be run again.
+    Args:
+        transaction_file (str): The path to the CSV file containing transaction data.
+        directory (str): The transaction directory to create. It must not contain partitions yet.
+    Returns:
+        int: The number of transactions migrated, or None if the migration failed.
+    """
+    if is_partitioned(directory) and list_partitions(directory):
+        print(f"Error: Directory '{directory}' already contains transaction partitions.")
+        return None
+
+    # Month index -> (temporary file, CSV writer)
+    partitions = {}
+    migrated = 0
+    try:
+        with open(transaction_file, mode='r', newline='') as source:
+            os.makedirs(directory, exist_ok=True)
+            for row in csv.DictReader(source):
+                try:
+                    month = month_index(parse_date(row['date'].strip()))
+                except (KeyError, ValueError, AttributeError) as e:
+                    print(f"Error: Cannot route a transaction to its month: {e}")
+                    return None
+                _open_partition(directory, month, partitions).writerow(row)
+                migrated += 1
+
+        for file, _ in partitions.values():
+            if not file.closed:
+                _close_partition(file)
+        for month in sorted(partitions):
+            path = partition_path(directory, month)
+            os.replace(path + '.tmp', path)
+        partitions.clear()
+    except FileNotFoundError:
+        print(f"Error: File '{transaction_file}' not found.")
+        return None
+    except OSError as e:
+        print(f"Error migrating '{transaction_file}' to partitions in '{directory}': {e}")
+        return None
+    finally:
+        # Partitions left over after a failure are removed, so a rerun starts from scratch
+        for month, (file, _) in partitions.items():
+            file.close()
+            try:
+                os.remove(partition_path(directory, month) + '.tmp')
+            except OSError:
+                pass
+    return migrated
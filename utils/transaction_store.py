@@ -0,0 +1,241 @@
+import csv
+from array import array
+from utils.date_normalization import format_date, format_time, parse_date, parse_time
+from utils.ingest_validation import InvalidRecord, Quarantine
+from utils.profiling import profiled
+from utils.sales_rollup import build_sales_rollup
+from utils.transaction_index import DateIndex, ProductIndex
+
+
+TRANSACTION_FIELDS = ['date', 'time', 'id', 'quantity', 'payment']
+
+
+def parse_cents(value):
+    """
+    Converts a payment amount (str, int or float) to a whole number of cents.
+    """
+    return int(round(float(value) * 100))
+
+
+def parse_transaction(transaction):
+    """
+    Checks and converts one transaction row to its column values.
+    Args:
+        transaction (dict): A transaction with the keys 'date', 'time', 'id', 'quantity'
+            and 'payment', as read from the CSV file or built by record_sales_transaction.
+    Returns:
+        tuple: (day ordinal, seconds since midnight, grocery ID, quantity, payment in cents).
+    Raises:
+        InvalidRecord: If a field is missing or invalid: an impossible date or time, a grocery
+            ID or quantity that is not a positive whole number, or a negative payment.
+    """
+    fields = []
+    for field in TRANSACTION_FIELDS:
+        value = transaction.get(field)
+        if value is None:
+            raise InvalidRecord(field, f"the {field} is missing")
+        fields.append(value)
+    date_text, time_text, grocery_id, quantity, payment = fields
+    try:
+        ordinal = parse_date(date_text)
+    except (ValueError, AttributeError):
+        raise InvalidRecord('date', f"date '{date_text}' is not a valid dd/mm/yyyy date")
+    try:
+        seconds = parse_time(time_text.strip())
+    except (ValueError, AttributeError):
+        raise InvalidRecord('time', f"time '{time_text}' is not a valid h:mm:ss AM/PM time")
+    try:
+        grocery_id = int(grocery_id)
+        if grocery_id <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise InvalidRecord('id', f"grocery ID '{grocery_id}' is not a positive whole number")
+    try:
+        quantity = int(quantity)
+        if quantity <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        raise InvalidRecord('quantity', f"quantity '{quantity}' is not a positive whole number")
+    try:
+        cents = parse_cents(payment)
+        if cents < 0:
+            raise ValueError
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidRecord('payment', f"payment '{payment}' is not a non-negative amount")
+    return ordinal, seconds, grocery_id, quantity, cents
+
+def typed_transaction(transaction):
+    """
+    Checks a transaction row and returns it with typed values, as TransactionStore.row does.
+    Raises:
+        InvalidRecord: If a field is missing or invalid.
+    """
+    ordinal, seconds, grocery_id, quantity, cents = parse_transaction(transaction)
+    return {
+        'date': transaction['date'].strip(),
+        'time': transaction['time'].strip(),
+        'id': str(grocery_id),
+        'quantity': quantity,
+        'payment': cents / 100,
+    }
+
+
+class TransactionStore:
+    """
+    Column-oriented, in-memory store of sales transactions.
+    Instead of one dictionary of strings per row, every field is kept in its own typed array:
+        - dates (array of int): The day ordinal of each transaction.
+        - times (array of int): The time of each transaction in seconds since midnight.
+        - ids (array of int): The grocery ID of each transaction.
+        - quantities (array of int): The quantity sold in each transaction.
+        - payments (array of int): The payment of each transaction in cents.
+    Row ``i`` of the store is made of the ``i``-th item of every column, so filters and
+    sums run over compact arrays without re-parsing any strings.
+    Once build_indexes has been called, ``date_index`` holds a DateIndex,
+    ``product_index`` a ProductIndex and ``sales_rollup`` a SalesRollup of the sales
+    totals. All three are updated incrementally as rows are appended, so a sale recorded
+    during a session is visible to searches and reports without reloading.
+    """
+
+    def __init__(self):
+        self.dates = array('l')
+        self.times = array('l')
+        self.ids = array('l')
+        self.quantities = array('l')
+        self.payments = array('q')
+        self.date_index = None
+        self.product_index = None
+        self.sales_rollup = None
+
+    def __len__(self):
+        return len(self.dates)
+
+    def append(self, transaction):
+        """
+        Checks a transaction dictionary and appends it to the store.
+        Args:
+            transaction (dict): A transaction with the keys 'date', 'time', 'id', 'quantity'
+                and 'payment', as read from the CSV file or built by record_sales_transaction.
+        Returns:
+            int: The row position of the appended transaction.
+        Raises:
+            InvalidRecord: If a field is missing or invalid. The columns are left unchanged.
+        """
+        values = parse_transaction(transaction)
+        position = len(self.dates)
+        for column, value in zip(self._columns(), values):
+            column.append(value)
+        if self.date_index is not None:
+            self.date_index.add(position, values[0])
+            self.product_index.add(position, values[2], values[0])
+            self.sales_rollup.add(values[0], values[2], values[3], values[4], values[1])
+        return position
+
+    def extend(self, other):
+        """
+        Appends every row of another TransactionStore, e.g. to combine monthly partitions.
+        Indexes are not updated; call build_indexes once all stores have been added.
+        """
+        for column, other_column in zip(self._columns(), other._columns()):
+            column.extend(other_column)
+        self.date_index = self.product_index = self.sales_rollup = None
+
+    @profiled
+    def build_indexes(self):
+        """
+        Builds the lookup indexes and the sales rollup over the rows currently in the store.
+        """
+        self.date_index = DateIndex(self.dates)
+        self.product_index = ProductIndex(self.ids, self.dates, self.date_index.order)
+        self.sales_rollup = build_sales_rollup(self)
+
+    def row(self, position):
+        """
+        Returns the transaction at the given row position as a dictionary.
+        Args:
+            position (int): The row position.
+        Returns:
+            dict: A transaction with 'date' and 'time' as strings, 'id' as a string (matching
+                  the keys of the grocery data), 'quantity' as an int and 'payment' as a float.
+        """
+        return {
+            'date': format_date(self.dates[position]),
+            'time': format_time(self.times[position]),
+            'id': str(self.ids[position]),
+            'quantity': self.quantities[position],
+            'payment': self.payments[position] / 100,
+        }
+
+    def rows(self, positions=None):
+        """
+        Yields transactions as dictionaries.
+        Args:
+            positions (iterable of int, optional): The row positions to yield. Defaults to every row.
+        """
+        if positions is None:
+            positions = range(len(self))
+        for position in positions:
+            yield self.row(position)
+
+    def _columns(self):
+        return (self.dates, self.times, self.ids, self.quantities, self.payments)
+
+
+def build_transaction_store(transactions, quarantine=None):
+    """
+    Builds a TransactionStore from transaction dictionaries.
+    Args:
+        transactions (iterable of dict): Transaction records, e.g. as returned by load_transaction_data.
+        quarantine (Quarantine, optional): Receives the invalid transactions. If None, they are
+            reported one by one. Either way they are skipped.
+    Returns:
+        TransactionStore: The populated and indexed store.
+    """
+    store = TransactionStore()
+    for i, t in enumerate(transactions):
+        try:
+            store.append(t)
+        except InvalidRecord as e:
+            if quarantine is None:
+                print(f"Skipping invalid transaction {i + 1} ({t}): {e}")
+            else:
+                # Line 1 of the file is the header
+                quarantine.reject(t, e, i + 2)
+    if quarantine is not None:
+        quarantine.accepted += len(store)
+    store.build_indexes()
+    return store
+
+def as_transaction_store(transactions):
+    """
+    Returns the given transactions as an indexed TransactionStore, building one if a
+    list of transaction dictionaries is passed.
+    """
+    if isinstance(transactions, TransactionStore):
+        if transactions.date_index is None:
+            transactions.build_indexes()
+        return transactions
+    return build_transaction_store(transactions)
+
+@profiled
+def load_transaction_store(transaction_file):
+    """
+    Loads transaction data from a CSV file straight into a TransactionStore.
+    Invalid rows are written to the quarantine file '<transaction_file>.rejected'.
+    Args:
+        transaction_file (str): The path to the CSV file containing transaction data.
+    Returns:
+        TransactionStore: The populated store. It is empty if the file cannot be read.
+    """
+    store = TransactionStore()
+    try:
+        with open(transaction_file, mode='r') as file:
+            reader = csv.DictReader(file)
+            quarantine = Quarantine(transaction_file, TRANSACTION_FIELDS)
+            store = build_transaction_store(reader, quarantine)
+            quarantine.close()
+    except FileNotFoundError:
+        print(f"Error: File '{transaction_file}' not found.")
+    except IOError as e:
+        print(f"Error reading file '{transaction_file}': {e}")
+    return store
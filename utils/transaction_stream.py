@@ -0,0 +1,162 @@
+from collections import namedtuple
+from contextlib import closing
+from functools import partial
+from utils.date_normalization import month_index, month_start
+from utils.storage import storage_backend
+
+
+# A parsed transaction: date as a day ordinal, time in seconds since midnight, grocery ID
+# and quantity as ints, and payment in cents.
+TransactionRecord = namedtuple('TransactionRecord', ['date', 'time', 'id', 'quantity', 'payment'])
+
+
+def iter_transactions(transaction_file, start_ordinal=None, end_ordinal=None):
+    """
+    Reads a transaction CSV file one row at a time.
+    Only the current row is held in memory, so any file size can be processed. The file
+    is closed as soon as the generator is exhausted or closed, e.g. when a later stage
+    stops early. A SQLite database (see utils.storage) is read through its date index
+    instead, and only the rows within the range are returned, in date order.
+    Args:
+        transaction_file (str): The path to the CSV file containing transaction data, or to a
+            directory of monthly partition files, which are read in month order.
+        start_ordinal (int, optional): For a partitioned directory, skip the partitions of
+            months before this day ordinal. Files compacted with compact_transaction_file
+            are only read from the block holding this day. Otherwise rows are not filtered;
+            use filter_date_range.
+        end_ordinal (int, optional): For a partitioned directory, skip the partitions of
+            months after this day ordinal. Compacted files are read up to this day.
+    Yields:
+        TransactionRecord: The parsed transactions, in file order. Invalid rows are reported and skipped.
+    """
+    records = storage_backend(transaction_file).iter_transaction_range(transaction_file, start_ordinal, end_ordinal)
+    # Closing this generator closes the backend's reader, and with it the file
+    with closing(records):
+        yield from map(TransactionRecord._make, records)
+
+def filter_date_range(records, start_ordinal, end_ordinal, date_sorted=False):
+    """
+    Keeps the records dated between two days, both inclusive.
+    Args:
+        records (iterable of TransactionRecord): The input records.
+        start_ordinal (int): The first day ordinal of the range.
+        end_ordinal (int): The last day ordinal of the range.
+        date_sorted (bool): Set to True when the records arrive in date order. The stage
+            then stops reading as soon as it sees a record past the end of the range.
+    Yields:
+        TransactionRecord: The records within the range.
+    """
+    for record in records:
+        if record.date > end_ordinal:
+            if date_sorted:
+                # Close the upstream reader now rather than when it is garbage collected
+                if hasattr(records, 'close'):
+                    records.close()
+                return
+            continue
+        if record.date >= start_ordinal:
+            yield record
+
+def filter_grocery_ids(records, grocery_ids):
+    """
+    Keeps the records of the given grocery IDs.
+    Args:
+        records (iterable of TransactionRecord): The input records.
+        grocery_ids (collection of int): The grocery IDs to keep.
+    Yields:
+        TransactionRecord: The matching records.
+    """
+    grocery_ids = set(grocery_ids)
+    for record in records:
+        if record.id in grocery_ids:
+            yield record
+
+def aggregate_by_month(records):
+    """
+    Totals records per month.
+    Args:
+        records (iterable of TransactionRecord): The input records.
+    Returns:
+        dict: Month index (year * 12 + month - 1) -> [value in cents, quantity, count].
+    """
+    return _aggregate(records, month_index)
+
+def aggregate_by_product(records):
+    """
+    Totals records per grocery ID.
+    Args:
+        records (iterable of TransactionRecord): The input records.
+    Returns:
+        dict: Grocery ID -> [value in cents, quantity, count].
+    """
+    return _aggregate(records, None)
+
+def _aggregate(records, month_of):
+    totals = {}
+    for record in records:
+        key = record.id if month_of is None else month_of(record.date)
+        total = totals.get(key)
+        if total is None:
+            totals[key] = [record.payment, record.quantity, 1]
+        else:
+            total[0] += record.payment
+            total[1] += record.quantity
+            total[2] += 1
+    return totals
+
+def pipeline(source, *stages):
+    """
+    Chains processing stages over a source of records.
+    Each stage is a callable taking the output of the previous one, e.g. a filter
+    bound with functools.partial or an aggregate function as the last stage.
+    Example:
+        pipeline(
+            iter_transactions('transactions.csv'),
+            partial(filter_date_range, start_ordinal=start, end_ordinal=end, date_sorted=True),
+            aggregate_by_product,
+        )
+    """
+    result = source
+    for stage in stages:
+        result = stage(result)
+    return result
+
+def stream_monthly_totals(transaction_file, start_month, end_month, grocery_id=None, date_sorted=False):
+    """
+    Streams a transaction file into per-month sales totals.
+    Args:
+        transaction_file (str): The path to the CSV file containing transaction data, or to a
+            directory of monthly partitions, of which only those overlapping the range are read.
+        start_month (int): The first month index of the range, inclusive.
+        end_month (int): The last month index of the range, inclusive.
+        grocery_id (int, optional): Only count the sales of this grocery.
+        date_sorted (bool): Whether the file is in date order, allowing the read to stop early.
+    Returns:
+        dict: Month index -> [value in cents, quantity, count], for months with sales.
+    """
+    start_ordinal = month_start(start_month)
+    end_ordinal = month_start(end_month + 1) - 1
+    stages = [partial(filter_date_range, start_ordinal=start_ordinal,
+                      end_ordinal=end_ordinal, date_sorted=date_sorted)]
+    if grocery_id is not None:
+        stages.append(partial(filter_grocery_ids, grocery_ids={grocery_id}))
+    stages.append(aggregate_by_month)
+    return pipeline(iter_transactions(transaction_file, start_ordinal, end_ordinal), *stages)
+
+def stream_product_totals(transaction_file, start_ordinal, end_ordinal, date_sorted=False):
+    """
+    Streams a transaction file into per-grocery sales totals between two days, both inclusive.
+    Args:
+        transaction_file (str): The path to the CSV file containing transaction data, or to a
+            directory of monthly partitions, of which only those overlapping the range are read.
+        start_ordinal (int): The first day ordinal of the range.
+        end_ordinal (int): The last day ordinal of the range.
+        date_sorted (bool): Whether the file is in date order, allowing the read to stop early.
+    Returns:
+        dict: Grocery ID -> [value in cents, quantity, count], for groceries with sales.
+    """
+    return pipeline(
+        iter_transactions(transaction_file, start_ordinal, end_ordinal),
+        partial(filter_date_range, start_ordinal=start_ordinal, end_ordinal=end_ordinal, date_sorted=date_sorted),
+        aggregate_by_product,
+    )